@@ -1,4 +1,5 @@
 import os
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -7,11 +8,33 @@ from flasgger import Swagger
 from dotenv import load_dotenv
 from flask_jwt_extended import JWTManager
 from datetime import timedelta
+from utils.file_utils import get_data_root
 load_dotenv()
 
 db = SQLAlchemy()
 migrate = Migrate()
 
+
+def preload_ai_stack():
+    """
+    Import and initialise the ML / LLM SDKs that are otherwise loaded on the first
+    AI request. Meant for prefork servers (gunicorn --preload) so workers share the
+    loaded pages instead of each paying the import on its first AI call.
+    """
+    import time
+    start = time.perf_counter()
+
+    from database.vector_db import chroma_db_service, embedding_provider
+    from genai.llm_factory import LLMModelFactory
+    import langchain_community.vectorstores  # noqa: F401
+    import langchain_community.document_loaders  # noqa: F401
+
+    chroma_db_service.client
+    LLMModelFactory.get_model_provider('gemini').get_model()
+    LLMModelFactory.get_model_provider('chatgpt').get_model()
+    embedding_provider.warm_up()
+    print(f"AI stack preloaded in {time.perf_counter() - start:.2f}s")
+
 def create_app():
     app = Flask(__name__)
     
@@ -22,8 +45,10 @@ def create_app():
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
     # File upload configuration
-    app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER', './uploads/receipts')
-    app.config['FILES_UPLOAD_FOLDER'] = os.environ.get('FILES_UPLOAD_FOLDER', './uploads/files')
+    # uploads (and the vector store) live under DATA_ROOT, test runs point it at a temp dir
+    app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER', os.path.join(get_data_root(), 'uploads', 'receipts'))
+    app.config['FILES_UPLOAD_FOLDER'] = os.environ.get('FILES_UPLOAD_FOLDER', os.path.join(get_data_root(), 'uploads', 'files'))
+    app.config['POLICY_UPLOAD_FOLDER'] = os.environ.get('POLICY_UPLOAD_FOLDER', os.path.join(get_data_root(), 'uploads', 'documents'))
     app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_SIZE', 10 * 1024 * 1024))  # 10MB default
     
     # Create upload directories if they don't exist
@@ -34,6 +59,19 @@ def create_app():
     app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'changeThisSecret')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=12)
     app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
+
+    # Vector index sync (chroma collections follow table changes)
+    app.config['VECTOR_INDEXING_ENABLED'] = os.environ.get('VECTOR_INDEXING_ENABLED', 'true').lower() == 'true'
+    # Load the embedding model at startup instead of on the first vector request
+    app.config['EMBEDDING_WARMUP'] = os.environ.get('EMBEDDING_WARMUP', 'false').lower() == 'true'
+    # AI SDKs / models load on first AI request unless preloaded (implies embedding warm up)
+    app.config['AI_PRELOAD'] = os.environ.get('AI_PRELOAD', 'false').lower() == 'true'
+    # Where queued AI jobs run: thread (inside this process), process (`flask run-jobs`) or eager (inline)
+    app.config['BACKGROUND_JOB_MODE'] = os.environ.get('BACKGROUND_JOB_MODE', 'thread').lower()
+    # Thread mode: start the workers with the first request a process serves, so jobs queued before a
+    # restart are picked up; cli commands, init_db.py and the parent of `flask run-jobs` never start them
+    default_autostart = 'false' if os.environ.get('FLASK_ENV') == 'testing' else 'true'
+    app.config['BACKGROUND_JOB_AUTOSTART'] = os.environ.get('BACKGROUND_JOB_AUTOSTART', default_autostart).lower() == 'true'
     
     # Initialize extensions with app
     swagger_config = {
@@ -121,7 +159,7 @@ def create_app():
             Role, User, JobPost, Resume, Application, Interview,
             Training, Course, Enrollment, Report, EODReport, ExpenseReport,
             Vacancy, HiringPipelineStage, CandidatePipelineStage, InterviewerAssignment, Scorecard,
-            PerformanceReview, Notification, AuditLog, File
+            PerformanceReview, Notification, AuditLog, File, PolicyDocument
         )
         
         # Register blueprints - ONLY ONCE, HERE
@@ -144,6 +182,7 @@ def create_app():
         from routes.ai_routes import ai_bp
         from routes.file_routes import file_bp
         from routes.task_routes import task_bp
+        from routes.background_job_routes import background_job_bp
 
     
         app.register_blueprint(user_bp, url_prefix='/api/users')
@@ -168,6 +207,82 @@ def create_app():
         app.register_blueprint(training_bp, url_prefix='/api/training')
         app.register_blueprint(file_bp, url_prefix='/api/files')
         app.register_blueprint(task_bp, url_prefix='/api/tasks')
+        app.register_blueprint(background_job_bp, url_prefix='/api/background-jobs')
+
+        # Incremental vector indexing driven by ORM events
+        from database.vector_db.job_post_indexer import job_post_indexer
+        from database.vector_db.course_indexer import course_indexer
+        job_post_indexer.register()
+        course_indexer.register()
+
+        if app.config['BACKGROUND_JOB_MODE'] == 'thread' and app.config['BACKGROUND_JOB_AUTOSTART']:
+            from workers import job_runner
+
+            @app.before_request
+            def start_background_workers():
+                job_runner.start(app)
+
+        if app.config['AI_PRELOAD']:
+            preload_ai_stack()
+        elif app.config['EMBEDDING_WARMUP']:
+            from database.vector_db import embedding_provider
+            print(f"Embedding model warmed up in {embedding_provider.warm_up():.2f}s")
+
+    @app.cli.command('reconcile-job-index')
+    @click.option('--dry-run', is_flag=True, help='Only report the differences')
+    def reconcile_job_index(dry_run):
+        """Diff job_posts against the chroma job_post collection and fix drift."""
+        from database.vector_db.job_post_indexer import job_post_indexer
+        summary = job_post_indexer.reconcile(dry_run=dry_run)
+        print(f"missing: {len(summary['missing'])}, stale: {len(summary['stale'])}, orphaned: {len(summary['orphaned'])}")
+        if not dry_run:
+            print(summary['result'])
+
+    @app.cli.command('reconcile-course-index')
+    @click.option('--dry-run', is_flag=True, help='Only report the differences')
+    def reconcile_course_index(dry_run):
+        """Diff courses against the chroma course collection and fix drift."""
+        from database.vector_db.course_indexer import course_indexer
+        summary = course_indexer.reconcile(dry_run=dry_run)
+        print(f"missing: {len(summary['missing'])}, stale: {len(summary['stale'])}, orphaned: {len(summary['orphaned'])}")
+        if not dry_run:
+            print(summary['result'])
+
+    @app.cli.command('ingest-policies')
+    @click.argument('school_id')
+    @click.argument('path', type=click.Path(exists=True))
+    @click.option('--force', is_flag=True, help='Re-chunk documents even if unchanged')
+    def ingest_policies(school_id, path, force):
+        """Ingest a policy file (or every file in a directory) into the school's chatbot index."""
+        from genai.services.policy_ingestion_service import policy_ingestion_service
+        for result in policy_ingestion_service.ingest_path(school_id, path, force=force):
+            print(f"{result['status']}: {result['path']} (+{result.get('added', 0)} / -{result.get('removed', 0)} chunks)")
+
+    @app.cli.command('run-jobs')
+    @click.option('--processes', default=2, show_default=True, help='Worker processes to start')
+    def run_jobs(processes):
+        """Run background job workers (use with BACKGROUND_JOB_MODE=process on the web servers)."""
+        import multiprocessing
+        from workers import worker_process_main
+
+        # spawn: every worker builds its own app and database connections
+        context = multiprocessing.get_context('spawn')
+        workers = [context.Process(target=worker_process_main, args=(index,), daemon=True) for index in range(processes)]
+        for worker in workers:
+            worker.start()
+        print(f"Started {processes} background job workers, Ctrl+C to stop")
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+
+    @app.cli.command('warmup-embeddings')
+    def warmup_embeddings():
+        """Load the shared embedding model once (downloads it on a fresh machine)."""
+        from database.vector_db import embedding_provider
+        print(f"Embedding model '{embedding_provider.model_name}' ready in {embedding_provider.warm_up():.2f}s")
     # Root routes
     @app.route('/')
     def hello():
@@ -1,13 +1,20 @@
+import os
 from dotenv import dotenv_values
 
 
 _properties = dotenv_values('.env')
 
+
+def _setting(name, default=None):
+    # .env first, then the process environment; missing keys only fail when a provider is used
+    return _properties.get(name) or os.environ.get(name, default)
+
+
 class Config:
-    GEMINI_API_KEY=_properties['GEMINI_API_KEY']
-    LANGCHAIN_API_KEY=_properties['LANGCHAIN_API_KEY']
-    OPENAI_API_KEY=_properties['OPENAI_API_KEY']
-    DATA_ROOT=_properties['DATA_ROOT']
+    GEMINI_API_KEY=_setting('GEMINI_API_KEY')
+    LANGCHAIN_API_KEY=_setting('LANGCHAIN_API_KEY')
+    OPENAI_API_KEY=_setting('OPENAI_API_KEY')
+    DATA_ROOT=_setting('DATA_ROOT', '.')
     ONBOARDING_REQUIRED_DOCS = [
         "id_proof",
         "address_proof",
@@ -1 +1,2 @@
-from .chroma_vector_db import chroma_db_service
\ No newline at end of file
+from .embedding_provider import embedding_provider, HashingEmbeddingProvider
+from .chroma_vector_db import chroma_db_service
@@ -1,26 +1,59 @@
 import os
-import chromadb
-from chromadb.config import Settings
+import time
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Any
-from langchain_community.vectorstores import Chroma
-from langchain_core.documents import Document
-from sentence_transformers import SentenceTransformer
 from utils import TextUtility
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from genai.schema import rag_engine
-from langchain_huggingface import HuggingFaceEmbeddings
-
-Embedding_model = HuggingFaceEmbeddings(model_name='sentence-transformers/all-MiniLM-L6-v2')
+from utils.file_utils import get_data_root
+from genai.schema import rag_engine, vector_index
+from .embedding_provider import EmbeddingProvider, HashingEmbeddingProvider, embedding_provider
 
 class ChromaVectorDBService:
-    def __init__(self, persist_dir: str = './chroma-db' , model_name: str = 'all-MiniLM-L6-v2',):
-        self.client = chromadb.PersistentClient(path="chroma_db")
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, persist_dir: str = './chroma-db' , model_name: str = None,):
+        self._client = None
+        self._client_lock = threading.Lock()
+        # (school_id, persist_dir) -> retriever, bounded by rag_engine.max_cached_retrievers
+        self._retrievers = OrderedDict()
+        self._retrievers_lock = threading.Lock()
+        # shared lazily loaded model unless a different one is asked for ('hashing' = offline stand-in)
+        if model_name is None:
+            self.model = embedding_provider
+        elif model_name == 'hashing':
+            self.model = HashingEmbeddingProvider()
+        else:
+            self.model = EmbeddingProvider(model_name)
+
+    ## chroma client, opened on first use so importing the service stays cheap
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import chromadb
+                    self._client = chromadb.PersistentClient(path=os.path.join(get_data_root(), 'chroma_db'))
+        return self._client
 
     ## Get Embeddings
     def get_embedding(self,text:str) -> List[float]:
         return self.model.encode(text).tolist()
 
+    ## Get Embeddings for many texts - batched, optionally spread over threads
+    def get_embeddings(self, texts: List[str], batch_size: int = None, num_threads: int = None) -> List[List[float]]:
+        batch_size = batch_size or vector_index.embed_batch_size
+        num_threads = num_threads or vector_index.embed_threads
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+        def encode(batch):
+            return self.model.encode(batch, batch_size=batch_size, show_progress_bar=False).tolist()
+
+        if num_threads <= 1 or len(batches) <= 1:
+            encoded = [encode(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=num_threads) as executor:
+                encoded = list(executor.map(encode, batches))
+        return [embedding for batch in encoded for embedding in batch]
+
     ## get_collections
     def get_collection(self,collection_name: str):
         return self.client.get_or_create_collection(name=collection_name)
@@ -107,8 +140,9 @@ class ChromaVectorDBService:
             text=text
         )
     ## search jobs using resume embeddings
-    def search_jobs_for_resume(self,resume_text: str, k=5):
-        embeddings=self.get_embedding(resume_text)
+    def search_jobs_for_resume(self,resume_text: str, k=5, embeddings: List[float] = None):
+        if embeddings is None:
+            embeddings=self.get_embedding(resume_text)
         jobs = self.get_collection("job_post").query(
             query_embeddings=[embeddings],
             n_results=k
@@ -127,12 +161,17 @@ class ChromaVectorDBService:
         return output
 
     ## search resumes for jobs
-    def search_resumes_for_job(self,job_text: str, k=5):
+    def search_resumes_for_job(self,job_text: str, k=5, where: Dict[str, Any] = None, collection_name: str = "resume"):
+        """
+        Args:
+            where: chroma metadata filter, e.g. {"job_id": job_id}
+            collection_name: "resume" (one vector per resume) or "application" (job scoped copies)
+        """
         embeddings=self.get_embedding(job_text)
-        resumes = self.get_collection("resume").query(
-            query_embeddings=[embeddings],
-            n_results=k
-        )
+        query = {"query_embeddings": [embeddings], "n_results": k}
+        if where:
+            query["where"] = where
+        resumes = self.get_collection(collection_name).query(**query)
 
         output=[]
 
@@ -143,7 +182,7 @@ class ChromaVectorDBService:
                 "text": doc,
                 "meta_data": meta,
                 "distance": dist,
-                "collection_name": "resume",
+                "collection_name": collection_name,
             })
         return output
 
@@ -164,51 +203,146 @@ class ChromaVectorDBService:
             "status":"success"
         }
 
-    ### add policy chunks - seperately not aligned with chatbot model
-    def add_school_policy(self, path, school_id):
-        
-        # path=TextUtility.resolve_path(path)
-        # ext = path.suffix.lower()
-        
-        
-        text = TextUtility.extract_text_from_pdf(path)
- 
-        
-        docs = Document(page_content=text)
+    ### insert or replace a single doc
+    def upsert_doc(self, collection_name: str, doc_id: str, text: str, metadata):
+        collection = self.get_collection(collection_name)
+        embeddings = self.get_embedding(text)
+        collection.upsert(documents=[text], embeddings=[embeddings], metadatas=[metadata], ids=[doc_id])
 
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size= rag_engine.chunk_size,
-            chunk_overlap= rag_engine.chunk_overlap,
-            separators=rag_engine.separators,
-            length_function=len
-        )
+        return {
+            "id": doc_id,
+            "collection_name": collection_name,
+            "status":"success"
+        }
 
-        chunks = splitter.split_documents([docs])
+    ### delete docs by id
+    def delete_docs(self, collection_name: str, doc_ids: List[str]):
+        if not doc_ids:
+            return {"status": "success", "deleted_count": 0}
+        collection = self.get_collection(collection_name)
+        collection.delete(ids=list(doc_ids))
+        return {"status": "success", "deleted_count": len(doc_ids)}
 
-        vectorstore = Chroma.from_documents(
-            documents = chunks,
-            embedding=Embedding_model,
-            persist_directory=rag_engine.persist_dir,
-            collection_name=f"school_{school_id}"
+    ### ids -> metadata of everything stored in a collection (optionally filtered)
+    def get_doc_metadata(self, collection_name: str, where: Dict[str, Any] = None) -> Dict[str, Dict[str, Any]]:
+        docs = self.get_collection(collection_name).get(where=where, include=["metadatas"])
+        return {doc_id: (meta or {}) for doc_id, meta in zip(docs["ids"], docs["metadatas"])}
+
+    ### fetch stored docs (document, metadata, embedding) by id
+    def get_docs(self, collection_name: str, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not doc_ids:
+            return {}
+        docs = self.get_collection(collection_name).get(
+            ids=list(doc_ids), include=["documents", "metadatas", "embeddings"]
         )
-        
-        vectorstore.persist()
-        return len(chunks)
-    
-    # retrieval based on school_id
-    def get_retrieval_for_school(self, school_id, persist_dir: str = rag_engine.persist_dir):
+        output = {}
+        for i, doc_id in enumerate(docs["ids"]):
+            output[doc_id] = {
+                "text": docs["documents"][i],
+                "meta_data": docs["metadatas"][i] or {},
+                "embeddings": [float(x) for x in docs["embeddings"][i]],
+            }
+        return output
+
+    ## bulk writes
+    def _write_many(self, mode: str, collection_name: str, doc_ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]],
+                    embeddings: List[List[float]] = None, batch_size: int = None, num_threads: int = None):
+        if not doc_ids:
+            return {"status": "success", "count": 0, "collection_name": collection_name}
+
+        start = time.perf_counter()
+        if embeddings is None:
+            embeddings = self.get_embeddings(texts, batch_size=batch_size, num_threads=num_threads)
+        embed_seconds = time.perf_counter() - start
+
+        collection = self.get_collection(collection_name)
+        write = collection.upsert if mode == 'upsert' else collection.add
+        step = vector_index.upsert_batch_size
+        for i in range(0, len(doc_ids), step):
+            write(
+                ids=[str(doc_id) for doc_id in doc_ids[i:i + step]],
+                documents=list(texts[i:i + step]),
+                metadatas=list(metadatas[i:i + step]),
+                embeddings=list(embeddings[i:i + step])
+            )
+        total_seconds = time.perf_counter() - start
+
+        stats = {
+            "status": "success",
+            "count": len(doc_ids),
+            "collection_name": collection_name,
+            "embed_seconds": round(embed_seconds, 3),
+            "write_seconds": round(total_seconds - embed_seconds, 3),
+            "docs_per_second": round(len(doc_ids) / total_seconds, 1) if total_seconds else None,
+        }
+        print(f"✅ {mode} {stats['count']} docs into '{collection_name}' ({stats['docs_per_second']} docs/s)")
+        return stats
+
+    ## Load many docs into vector store
+    def load_many(self, collection_name: str, doc_ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]],
+                  embeddings: List[List[float]] = None, batch_size: int = None, num_threads: int = None):
+        """
+        Bulk version of load_data: texts are encoded in batches and added in bulk.
+
+        Args:
+            embeddings: precomputed vectors, skips encoding when given
+            batch_size / num_threads: override vector_index defaults
+        Returns:
+            dict with count, embed_seconds, write_seconds and docs_per_second
+        """
+        return self._write_many('add', collection_name, doc_ids, texts, metadatas, embeddings, batch_size, num_threads)
 
-        vs = Chroma(
+    ## insert or replace many docs
+    def upsert_many(self, collection_name: str, doc_ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]],
+                    embeddings: List[List[float]] = None, batch_size: int = None, num_threads: int = None):
+        """Same as load_many but replaces docs that already exist."""
+        return self._write_many('upsert', collection_name, doc_ids, texts, metadatas, embeddings, batch_size, num_threads)
+
+    ### policy chunks for a school - the langchain store the chatbot retrieves from
+    def get_policy_store(self, school_id, persist_dir: str = rag_engine.persist_dir):
+        from langchain_community.vectorstores import Chroma
+
+        return Chroma(
             persist_directory=persist_dir,
-            embedding_function=Embedding_model,
+            embedding_function=self.model,
             collection_name=f"school_{school_id}"
         )
 
-        return vs.as_retriever(
+    ### add policy chunks - goes through the ingestion pipeline (registry + dedup)
+    def add_school_policy(self, path, school_id):
+        from genai.services.policy_ingestion_service import policy_ingestion_service
+
+        result = policy_ingestion_service.ingest(school_id, path)
+        return result.get("chunk_count", 0)
+    
+    # retrieval based on school_id - warm retrievers are reused across questions
+    def get_retrieval_for_school(self, school_id, persist_dir: str = rag_engine.persist_dir):
+        key = (str(school_id), persist_dir)
+        with self._retrievers_lock:
+            retriever = self._retrievers.get(key)
+            if retriever is not None:
+                self._retrievers.move_to_end(key)
+                return retriever
+
+        vs = self.get_policy_store(school_id, persist_dir)
+        retriever = vs.as_retriever(
             search_type = rag_engine.search_type,
             search_kwargs = {"k":rag_engine.k}
         )
 
+        with self._retrievers_lock:
+            self._retrievers[key] = retriever
+            self._retrievers.move_to_end(key)
+            while len(self._retrievers) > rag_engine.max_cached_retrievers:
+                self._retrievers.popitem(last=False)
+        return retriever
+
+    # drop a school's cached retriever, called when its policy corpus changes
+    def invalidate_school_retriever(self, school_id):
+        with self._retrievers_lock:
+            for key in [key for key in self._retrievers if key[0] == str(school_id)]:
+                del self._retrievers[key]
+
 
     # testing purpose not part of rag chain
     def get_context_for_school(self, school_id: str, question: str):
@@ -0,0 +1,55 @@
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import object_session
+
+from models import Course, Training
+from .model_indexer import ModelVectorIndexer
+
+
+class CourseIndexer(ModelVectorIndexer):
+    """
+    Course docs embed the course and its training title, so renaming a training
+    re-indexes the training's courses as well.
+    """
+    model = Course
+    collection_name = 'course'
+
+    def register(self):
+        with self._lock:
+            registered = self._registered
+        super().register()
+        if not registered:
+            event.listen(Training, 'after_update', self._on_training_update)
+
+    @staticmethod
+    def training_title(course, connection=None) -> str:
+        if connection is None:
+            return course.training.title if course.training else ""
+        # no lazy loads inside a flush, the (already flushed) training row is read on its connection
+        title = connection.execute(select(Training.title).where(Training.id == course.training_id)).scalar()
+        return title or ""
+
+    def document_for(self, course: Course, connection=None) -> str:
+        return f"{course.title}\n{self.training_title(course, connection)}".strip()
+
+    def metadata_for(self, course: Course):
+        return {
+            "course_id": course.id,
+            "title": course.title,
+            "training_id": course.training_id or "",
+            "content_url": course.content_url or "",
+            "duration_mins": course.duration_mins or 0
+        }
+
+    def _on_training_update(self, mapper, connection, target):
+        session = object_session(target)
+        if session is None or not inspect(target).attrs.title.history.has_changes():
+            return
+        # plain rows of the courses table, they carry every column metadata_for reads
+        courses = connection.execute(select(Course.__table__).where(Course.training_id == target.id)).all()
+        pending = self._pending(session)
+        for course in courses:
+            doc_id, text, metadata = self.build_entry(course, connection)
+            pending[doc_id] = ('upsert', text, metadata)
+
+
+course_indexer = CourseIndexer()
@@ -0,0 +1,112 @@
+import re
+import time
+import hashlib
+import threading
+from typing import List
+
+from genai.schema import vector_index
+
+
+class EmbeddingProvider:
+    """
+    Process wide sentence-transformers model, loaded on first use.
+
+    The raw chroma paths call `encode()` (same signature as SentenceTransformer)
+    and the LangChain `Chroma` vector stores use it as their `Embeddings`, so
+    every worker holds a single copy of the model. It follows the langchain
+    Embeddings protocol (embed_documents / embed_query) without importing it.
+    """
+
+    def __init__(self, model_name: str = None):
+        self.model_name = model_name or vector_index.embedding_model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    start = time.perf_counter()
+                    self._model = SentenceTransformer(self.model_name)
+                    print(f"✅ Loaded embedding model '{self.model_name}' in {time.perf_counter() - start:.2f}s")
+        return self._model
+
+    def warm_up(self) -> float:
+        """Load the model (and run one encode) ahead of the first request, returns seconds spent."""
+        start = time.perf_counter()
+        self.model.encode("warm up", show_progress_bar=False)
+        return time.perf_counter() - start
+
+    ## sentence-transformers interface
+    def encode(self, texts, **kwargs):
+        return self.model.encode(texts, **kwargs)
+
+    ## langchain Embeddings interface
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.encode(
+            list(texts), batch_size=vector_index.embed_batch_size, show_progress_bar=False
+        ).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.encode(text, show_progress_bar=False).tolist()
+
+
+class HashingEmbeddingProvider:
+    """
+    Deterministic offline stand-in for EmbeddingProvider (EMBEDDING_BACKEND=hashing).
+
+    Word unigrams and bigrams are hashed into `dimensions` signed buckets and the
+    vector is L2 normalised, so texts sharing words land close together. No model
+    download or torch, a few microseconds per text - meant for load tests of the
+    vector paths, not for retrieval quality.
+    """
+
+    def __init__(self, dimensions: int = None):
+        self.dimensions = dimensions or vector_index.hashing_dimensions
+        self.model_name = f"hashing-{self.dimensions}"
+
+    @property
+    def is_loaded(self) -> bool:
+        return True
+
+    @property
+    def model(self):
+        return self
+
+    def warm_up(self) -> float:
+        return 0.0
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        words = re.findall(r"\w+", str(text).lower())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = sum(value * value for value in vector) ** 0.5
+        return [value / norm for value in vector] if norm else vector
+
+    ## sentence-transformers interface
+    def encode(self, texts, **kwargs):
+        import numpy as np
+
+        if isinstance(texts, str):
+            return np.array(self._vector(texts), dtype=np.float32)
+        return np.array([self._vector(text) for text in texts], dtype=np.float32).reshape(-1, self.dimensions)
+
+    ## langchain Embeddings interface
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+embedding_provider = HashingEmbeddingProvider() if vector_index.embedding_backend == 'hashing' else EmbeddingProvider()
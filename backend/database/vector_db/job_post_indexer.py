@@ -0,0 +1,23 @@
+from models import JobPost
+from .model_indexer import ModelVectorIndexer
+
+
+class JobPostIndexer(ModelVectorIndexer):
+    model = JobPost
+    collection_name = 'job_post'
+
+    def document_for(self, job: JobPost, connection=None) -> str:
+        return f"{job.title}\n{job.description}\n{job.requirements}"
+
+    def metadata_for(self, job: JobPost):
+        return {
+            "job_id": job.id,
+            "title": job.title,
+            "description": job.description or "",
+            "requirements": job.requirements or "",
+            "status": job.status or "",
+            "created_at": job.created_at.isoformat() if job.created_at else ""
+        }
+
+
+job_post_indexer = JobPostIndexer()
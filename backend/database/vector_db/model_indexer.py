@@ -0,0 +1,148 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+# one background writer keeps chroma writes ordered and off the request thread
+_index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vector-indexer')
+
+
+class ModelVectorIndexer:
+    """
+    Keeps a Chroma collection in sync with a SQLAlchemy model.
+
+    after_insert / after_update / after_delete events record the changed rows on
+    the session; once the session commits only those rows are embedded (or
+    removed) in the background. Rolled back changes are discarded.
+    `reconcile()` diffs the table against the collection to repair any drift.
+    """
+
+    model = None
+    collection_name: str = None
+
+    def __init__(self):
+        self._registered = False
+        self._lock = threading.Lock()
+
+    ## override in subclasses
+    def document_for(self, target, connection=None) -> str:
+        """
+        Text embedded for `target`. Inside flush events `connection` is the flush
+        connection, related rows must be read through it instead of lazy loading.
+        """
+        raise NotImplementedError("Error: document_for not defined")
+
+    def metadata_for(self, target) -> Dict[str, Any]:
+        raise NotImplementedError("Error: metadata_for not defined")
+
+    def build_entry(self, target, connection=None):
+        text = self.document_for(target, connection)
+        metadata = self.metadata_for(target)
+        metadata["content_hash"] = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return str(target.id), text, metadata
+
+    ## orm events
+    def register(self):
+        with self._lock:
+            if self._registered:
+                return
+            event.listen(self.model, 'after_insert', self._on_upsert)
+            event.listen(self.model, 'after_update', self._on_upsert)
+            event.listen(self.model, 'after_delete', self._on_delete)
+            event.listen(Session, 'after_commit', self._on_commit)
+            event.listen(Session, 'after_rollback', self._on_rollback)
+            self._registered = True
+
+    def _pending(self, session):
+        return session.info.setdefault(f'vector_index:{self.collection_name}', {})
+
+    def _on_upsert(self, mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            doc_id, text, metadata = self.build_entry(target, connection)
+            self._pending(session)[doc_id] = ('upsert', text, metadata)
+
+    def _on_delete(self, mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            self._pending(session)[str(target.id)] = ('delete', None, None)
+
+    def _on_rollback(self, session):
+        session.info.pop(f'vector_index:{self.collection_name}', None)
+
+    def _on_commit(self, session):
+        ops = session.info.pop(f'vector_index:{self.collection_name}', None)
+        if ops and self.is_enabled():
+            _index_executor.submit(self.apply, ops)
+
+    @staticmethod
+    def is_enabled() -> bool:
+        if has_app_context():
+            return current_app.config.get('VECTOR_INDEXING_ENABLED', True)
+        return True
+
+    ## chroma writes
+    def apply(self, ops: Dict[str, tuple]):
+        from database.vector_db import chroma_db_service
+
+        try:
+            deleted = [doc_id for doc_id, (op, _, _) in ops.items() if op == 'delete']
+            chroma_db_service.delete_docs(self.collection_name, deleted)
+            upserts = [(doc_id, text, metadata) for doc_id, (op, text, metadata) in ops.items() if op == 'upsert']
+            stats = chroma_db_service.upsert_many(
+                self.collection_name,
+                doc_ids=[doc_id for doc_id, _, _ in upserts],
+                texts=[text for _, text, _ in upserts],
+                metadatas=[metadata for _, _, metadata in upserts]
+            )
+            return {
+                "status": "success",
+                "upserted": len(upserts),
+                "deleted": len(deleted),
+                "docs_per_second": stats.get("docs_per_second"),
+            }
+        except Exception as e:
+            print(f"❌ Error indexing '{self.collection_name}': {str(e)}")
+            return {"status": "error", "message": str(e)}
+
+    def reconcile(self, dry_run: bool = False):
+        """
+        Diff the table against the Chroma collection and fix the differences.
+
+        Returns:
+            dict with the missing, stale and orphaned ids
+        """
+        from database.vector_db import chroma_db_service
+
+        expected = {}
+        for row in self.model.query.all():
+            doc_id, text, metadata = self.build_entry(row)
+            expected[doc_id] = (text, metadata)
+
+        indexed = chroma_db_service.get_doc_metadata(self.collection_name)
+
+        missing = [doc_id for doc_id in expected if doc_id not in indexed]
+        stale = [
+            doc_id for doc_id in expected
+            if doc_id in indexed and indexed[doc_id].get("content_hash") != expected[doc_id][1]["content_hash"]
+        ]
+        orphaned = [doc_id for doc_id in indexed if doc_id not in expected]
+
+        summary = {
+            "collection_name": self.collection_name,
+            "missing": missing,
+            "stale": stale,
+            "orphaned": orphaned,
+            "dry_run": dry_run,
+        }
+        if dry_run:
+            return summary
+
+        ops = {doc_id: ('upsert', *expected[doc_id]) for doc_id in missing + stale}
+        ops.update({doc_id: ('delete', None, None) for doc_id in orphaned})
+        summary["result"] = self.apply(ops) if ops else {"status": "success", "upserted": 0, "deleted": 0}
+        return summary
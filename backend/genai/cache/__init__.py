@@ -0,0 +1,2 @@
+from .llm_response_cache import LLMResponseCache, llm_response_cache
+from .semantic_answer_cache import SemanticAnswerCache, semantic_answer_cache
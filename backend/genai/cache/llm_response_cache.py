@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional
+
+from flask import current_app, has_app_context
+
+from utils.single_flight import single_flight
+from ..schema import llm_cache
+
+
+def _warn(message: str):
+    # the cache is also used by worker threads without an app context
+    if has_app_context():
+        current_app.logger.warning(message)
+    else:
+        print(message)
+
+
+class LLMResponseCache:
+    """
+    Two tier (memory LRU + on-disk SQLite) cache for LLM text responses.
+    The disk tier is off with `disk_enabled` false (test runs).
+
+    Entries are content addressed by provider, model name, prompt hash and
+    generation params, so identical prompts built by PromptManager are only
+    sent to the provider once per TTL window. Concurrent misses for the same
+    key are coalesced by `single_flight`.
+    """
+
+    def __init__(self, config=llm_cache):
+        self.config = config
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db_ready = False
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        self._template_stats: Dict[str, Dict[str, int]] = {}
+
+    ## build cache key
+    @staticmethod
+    def make_key(provider_name: str, model_name: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        raw = json.dumps([provider_name, model_name, prompt_hash, params or {}], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    ## sqlite tier
+    def _connect(self):
+        if not self._db_ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.config.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.config.db_path, timeout=5)
+        if not self._db_ready:
+            with self._db_lock:
+                if not self._db_ready:
+                    conn.execute(
+                        """CREATE TABLE IF NOT EXISTS llm_response_cache (
+                            key TEXT PRIMARY KEY,
+                            template TEXT,
+                            response TEXT NOT NULL,
+                            created_at REAL NOT NULL,
+                            expires_at REAL NOT NULL
+                        )"""
+                    )
+                    conn.commit()
+                    self._db_ready = True
+        return conn
+
+    def _disk_get(self, key: str):
+        if not self.config.disk_enabled:
+            return None
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT response, expires_at FROM llm_response_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] < time.time():
+                    conn.execute("DELETE FROM llm_response_cache WHERE key = ?", (key,))
+                    conn.commit()
+                    return None
+                return row
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            _warn(f"LLM cache disk read failed: {e}")
+            return None
+
+    def _disk_set(self, key: str, template: Optional[str], response: str, expires_at: float):
+        if not self.config.disk_enabled:
+            return
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_response_cache (key, template, response, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, template, response, time.time(), expires_at)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            _warn(f"LLM cache disk write failed: {e}")
+
+    ## memory tier
+    def _memory_get(self, key: str):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return entry[0]
+
+    def _memory_set(self, key: str, response: str, expires_at: float):
+        with self._lock:
+            self._memory[key] = (response, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.config.memory_max_entries:
+                self._memory.popitem(last=False)
+
+    def _count(self, counter: str, template: Optional[str]):
+        with self._lock:
+            self._stats[counter] += 1
+            per_template = self._template_stats.setdefault(template or 'default', {"hits": 0, "misses": 0})
+            if counter == 'misses':
+                per_template["misses"] += 1
+            elif counter in ('memory_hits', 'disk_hits'):
+                per_template["hits"] += 1
+
+    def get(self, key: str, template: Optional[str] = None) -> Optional[str]:
+        response = self._memory_get(key)
+        if response is not None:
+            self._count('memory_hits', template)
+            return response
+
+        row = self._disk_get(key)
+        if row is not None:
+            self._memory_set(key, row[0], row[1])
+            self._count('disk_hits', template)
+            return row[0]
+
+        self._count('misses', template)
+        return None
+
+    def peek(self, key: str) -> Optional[str]:
+        """Lookup without touching the hit / miss counters."""
+        response = self._memory_get(key)
+        if response is None:
+            row = self._disk_get(key)
+            if row is not None:
+                self._memory_set(key, row[0], row[1])
+                response = row[0]
+        return response
+
+    def set(self, key: str, response: str, template: Optional[str] = None):
+        ttl = self.config.ttl_for(template)
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        self._memory_set(key, response, expires_at)
+        self._disk_set(key, template, response, expires_at)
+        with self._lock:
+            self._stats["stores"] += 1
+
+    def get_or_generate(self, provider, prompt: str, generate, template: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Return the cached response for this prompt or call `generate()` and cache it.
+
+        Args:
+            provider: BaseLLMModel instance (used for provider/model name in the key)
+            prompt: the full prompt text
+            generate: zero-arg callable performing the provider call, returns text
+            template: PromptManager template name, selects the TTL
+            params: generation params that change the output
+        """
+        key = self.make_key(provider.provider_name, provider.model_name, prompt, params)
+        if not self.config.enabled or self.config.ttl_for(template) <= 0:
+            # still share a response between identical calls that are in flight together
+            return single_flight.do(key, generate)
+
+        cached = self.get(key, template)
+        if cached is not None:
+            return cached
+
+        def generate_and_store():
+            response = generate()
+            # never cache empty / failed generations, nor another provider's answer under this provider's key
+            answered_by = getattr(response, 'provider_name', None) or provider.provider_name
+            if response and answered_by == provider.provider_name:
+                self.set(key, response, template)
+            return response
+
+        # identical concurrent misses (threads or worker processes) make one provider call
+        return single_flight.do(key, generate_and_store, recheck=lambda: self.peek(key))
+
+    def get_or_stream(self, provider, prompt: str, stream, template: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Streaming counterpart of get_or_generate: yields the cached response as a
+        single chunk, or the chunks of `stream()`. An answer that was read to the
+        end is stored, one the consumer stopped reading early is not.
+        """
+        key = self.make_key(provider.provider_name, provider.model_name, prompt, params)
+        cacheable = self.config.enabled and self.config.ttl_for(template) > 0
+        cached = self.get(key, template) if cacheable else None
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        answered_by = provider.provider_name
+        for chunk in stream():
+            answered_by = getattr(chunk, 'provider_name', None) or answered_by
+            chunks.append(chunk)
+            yield chunk
+        response = ''.join(chunks)
+        if cacheable and response and answered_by == provider.provider_name:
+            self.set(key, response, template)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if not self.config.disk_enabled:
+            return
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM llm_response_cache")
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            _warn(f"LLM cache clear failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            return {
+                **self._stats,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "templates": {name: dict(counts) for name, counts in self._template_stats.items()},
+            }
+
+
+llm_response_cache = LLMResponseCache()
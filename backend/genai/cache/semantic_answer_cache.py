@@ -0,0 +1,130 @@
+import json
+import time
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from database.vector_db import chroma_db_service
+from ..schema import chatbot_cache
+
+
+class SemanticAnswerCache:
+    """
+    Answers of the policy chatbot keyed by the meaning of the question.
+
+    Every answered question is stored, with its embedding, in a per-school chroma
+    collection (`<collection_prefix><school_id>`, cosine space). A new question is
+    embedded and its nearest stored question looked up; when the similarity is at
+    least `similarity_threshold` the stored answer is returned without retrieval or
+    an LLM call. The collection is dropped whenever the school's policy corpus
+    changes (see PolicyIngestionService), so answers never outlive their sources.
+    """
+
+    def __init__(self, config=chatbot_cache, vector_db=chroma_db_service):
+        self.config = config
+        self.vector_db = vector_db
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0, "lookup_seconds": 0.0}
+
+    def collection_name(self, school_id) -> str:
+        return f"{self.config.collection_prefix}{school_id}"
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        return " ".join(question.lower().split())
+
+    def _collection(self, school_id):
+        return self.vector_db.client.get_or_create_collection(
+            name=self.collection_name(school_id), metadata={"hnsw:space": "cosine"}
+        )
+
+    def _count(self, counter: str, value=1):
+        with self._lock:
+            self._stats[counter] += value
+
+    def lookup(self, school_id, question: str) -> Tuple[Optional[Dict[str, Any]], Optional[List[float]]]:
+        """
+        Returns:
+            tuple: (hit dict with answer / sources / similarity / question, or None;
+                    the question embedding to pass to store())
+        """
+        if not self.config.enabled:
+            return None, None
+
+        start = time.perf_counter()
+        embedding = None
+        try:
+            embedding = self.vector_db.model.embed_query(self.normalize(question))
+            collection = self._collection(school_id)
+            if collection.count() == 0:
+                self._count('misses')
+                return None, embedding
+
+            result = collection.query(query_embeddings=[embedding], n_results=1, include=["metadatas", "distances", "documents"])
+            if not result["ids"][0]:
+                self._count('misses')
+                return None, embedding
+
+            similarity = 1.0 - result["distances"][0][0]
+            metadata = result["metadatas"][0][0]
+            if similarity < self.config.similarity_threshold:
+                self._count('misses')
+                return None, embedding
+            if metadata.get("created_at", 0) + self.config.ttl < time.time():
+                collection.delete(ids=[result["ids"][0][0]])
+                self._count('misses')
+                return None, embedding
+
+            self._count('hits')
+            return {
+                "answer": metadata["answer"],
+                "sources": json.loads(metadata.get("sources") or "[]"),
+                "similarity": round(similarity, 4),
+                "question": result["documents"][0][0],
+            }, embedding
+        except Exception as e:
+            # the cache must never break the chatbot
+            print(f"Chatbot answer cache lookup failed: {e}")
+            self._count('misses')
+            return None, embedding
+        finally:
+            self._count('lookup_seconds', time.perf_counter() - start)
+
+    def store(self, school_id, question: str, answer: str, sources: List[Dict[str, Any]] = None, embedding: List[float] = None):
+        if not self.config.enabled or not answer:
+            return
+        try:
+            normalized = self.normalize(question)
+            if embedding is None:
+                embedding = self.vector_db.model.embed_query(normalized)
+            self._collection(school_id).upsert(
+                ids=[hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:32]],
+                embeddings=[embedding],
+                documents=[question],
+                metadatas=[{"answer": answer, "sources": json.dumps(sources or []), "created_at": time.time()}]
+            )
+            self._count('stores')
+        except Exception as e:
+            print(f"Chatbot answer cache store failed: {e}")
+
+    def invalidate(self, school_id):
+        """Drop every cached answer of a school (its policy documents changed)."""
+        try:
+            self.vector_db.client.delete_collection(name=self.collection_name(school_id))
+        except Exception:
+            # nothing cached yet
+            pass
+        self._count('invalidations')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **{name: value for name, value in self._stats.items() if name != 'lookup_seconds'},
+                "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "avg_lookup_ms": round(1000 * self._stats["lookup_seconds"] / lookups, 2) if lookups else 0.0,
+                "similarity_threshold": self.config.similarity_threshold,
+            }
+
+
+semantic_answer_cache = SemanticAnswerCache()
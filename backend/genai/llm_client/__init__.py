@@ -0,0 +1,3 @@
+from .llm_dispatcher import LLMDispatcher, LLMQueueTimeout, llm_dispatcher, llm_priority, current_priority, with_priority_context
+from .llm_client import LLMClient, TokenBucket, CircuitBreaker, LLMDeadlineExceeded, CircuitOpenError, llm_client
+from .llm_router import LLMRouter, RoutedResponse, llm_router
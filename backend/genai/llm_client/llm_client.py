@@ -0,0 +1,432 @@
+import re
+import time
+import random
+import threading
+from collections import deque
+from typing import Any, Dict, Iterator, Optional
+
+from ..schema import llm_client_config
+from .llm_dispatcher import LLMDispatcher, LLMQueueTimeout, llm_dispatcher
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """The call could not finish (queueing + retries) before its deadline."""
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider's circuit breaker is open, the call was not attempted."""
+
+
+class CircuitBreaker:
+    """
+    Per provider breaker over the attempts of the last `breaker_window` seconds.
+
+    closed -> open when at least `breaker_min_calls` attempts were made and the
+    error rate or the share of attempts slower than `breaker_slow_call_seconds`
+    reaches its threshold. open -> half_open after `breaker_open_seconds`; one
+    probe attempt is then let through, closing the breaker on success and
+    opening it again on failure. Rate limited attempts are not counted, the
+    client already backs off on those.
+    """
+
+    def __init__(self, config, clock=time.monotonic):
+        self.config = config
+        self.clock = clock
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._outcomes = deque()  # (time, ok, latency)
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.config.breaker_window:
+            self._outcomes.popleft()
+
+    def _update_state(self, now: float):
+        if self.state == 'open' and now - self.opened_at >= self.config.breaker_open_seconds:
+            self.state = 'half_open'
+            self._probe_in_flight = False
+
+    def available(self) -> bool:
+        """True if a call would currently be let through (without claiming a probe)."""
+        if not self.config.breaker_enabled:
+            return True
+        with self._lock:
+            self._update_state(self.clock())
+            return self.state == 'closed' or (self.state == 'half_open' and not self._probe_in_flight)
+
+    def allow(self) -> bool:
+        """Claim permission for one attempt."""
+        if not self.config.breaker_enabled:
+            return True
+        with self._lock:
+            self._update_state(self.clock())
+            if self.state == 'closed':
+                return True
+            if self.state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def release(self):
+        """Give back a claimed attempt without an outcome (e.g. rate limited)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _open(self, now: float):
+        self.state = 'open'
+        self.opened_at = now
+        self.times_opened += 1
+        self._probe_in_flight = False
+
+    def record(self, ok: bool, latency: float):
+        if not self.config.breaker_enabled:
+            return
+        with self._lock:
+            now = self.clock()
+            self._outcomes.append((now, ok, latency))
+            self._trim(now)
+
+            if self.state == 'half_open':
+                if ok and latency < self.config.breaker_slow_call_seconds:
+                    self.state = 'closed'
+                    self._outcomes.clear()
+                else:
+                    self._open(now)
+                self._probe_in_flight = False
+                return
+
+            if self.state == 'closed' and len(self._outcomes) >= self.config.breaker_min_calls:
+                calls = len(self._outcomes)
+                errors = sum(1 for _, success, _ in self._outcomes if not success)
+                slow = sum(1 for _, _, duration in self._outcomes if duration >= self.config.breaker_slow_call_seconds)
+                if errors / calls >= self.config.breaker_error_rate or slow / calls >= self.config.breaker_slow_rate:
+                    self._open(now)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = self.clock()
+            self._update_state(now)
+            self._trim(now)
+            calls = len(self._outcomes)
+            errors = sum(1 for _, success, _ in self._outcomes if not success)
+            slow = sum(1 for _, _, duration in self._outcomes if duration >= self.config.breaker_slow_call_seconds)
+            return {
+                'state': self.state,
+                'window_calls': calls,
+                'error_rate': round(errors / calls, 3) if calls else 0.0,
+                'slow_rate': round(slow / calls, 3) if calls else 0.0,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected,
+                'retry_in': round(max(0.0, self.opened_at + self.config.breaker_open_seconds - now), 1) if self.state == 'open' else 0.0,
+            }
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `capacity` units, refilled continuously at
+    `capacity / 60` units per second. `acquire` blocks until enough units are
+    available, or raises LLMDeadlineExceeded when that would pass the deadline.
+    """
+
+    def __init__(self, per_minute: int, clock=time.monotonic, sleep=time.sleep):
+        self.capacity = float(max(1, per_minute))
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def pause(self, seconds: float):
+        """Hold every caller for `seconds` (provider told us to back off)."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+            self.tokens = 0.0
+
+    def acquire(self, amount: float = 1, deadline: Optional[float] = None) -> float:
+        """Take `amount` units, returns the seconds spent waiting."""
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                wait = max(self.blocked_until - now, (amount - self.tokens) / self.rate)
+
+            if deadline is not None and self.clock() + wait > deadline:
+                raise LLMDeadlineExceeded(f"rate limit queue wait of {wait:.1f}s exceeds the call deadline")
+            self.sleep(wait)
+            waited += wait
+
+
+class LLMClient:
+    """
+    Single entry point for provider calls made by BaseLLMModel.generate().
+
+    - process wide token buckets per provider (requests/min and tokens/min), so
+      concurrent callers queue briefly instead of stampeding the provider
+    - jittered exponential backoff on rate limit / transient errors, honouring
+      Retry-After; a 429 pauses the provider's bucket for everyone
+    - a per-call deadline covering queueing, retries and the provider timeout
+    - a circuit breaker per provider fed by every attempt; an open breaker fails
+      calls (and pending retries) fast with CircuitOpenError, see LLMRouter for failover
+    - priority classes (interactive / normal / batch) admitted by an LLMDispatcher
+      before each attempt, so batch work cannot starve interactive calls
+    - per provider metrics (see `stats()`)
+
+    `stream()` is the streaming counterpart: the same buckets, breaker and
+    metrics, a slot only until the first chunk arrives, and no retries once
+    text has been handed to the caller.
+    """
+
+    _rate_limit_pattern = re.compile(r'\b429\b|resource[ _]exhausted|rate limit|quota', re.IGNORECASE)
+    _transient_pattern = re.compile(r'\b50[0234]\b|unavailable|timed out|timeout|connection|overloaded', re.IGNORECASE)
+
+    def __init__(self, config=llm_client_config, clock=time.monotonic, sleep=time.sleep, dispatcher=None):
+        self.config = config
+        self.clock = clock
+        self.sleep = sleep
+        self.dispatcher = dispatcher or LLMDispatcher()
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    ## limiter
+    def _buckets_for(self, provider_name: str) -> Dict[str, TokenBucket]:
+        with self._lock:
+            if provider_name not in self._buckets:
+                limits = self.config.limits_for(provider_name)
+                self._buckets[provider_name] = {
+                    'requests': TokenBucket(limits['requests_per_minute'], self.clock, self.sleep),
+                    'tokens': TokenBucket(limits['tokens_per_minute'], self.clock, self.sleep),
+                }
+            return self._buckets[provider_name]
+
+    def breaker(self, provider_name: str) -> CircuitBreaker:
+        with self._lock:
+            if provider_name not in self._breakers:
+                self._breakers[provider_name] = CircuitBreaker(self.config, self.clock)
+            return self._breakers[provider_name]
+
+    def estimate_tokens(self, prompt: str, params: Dict[str, Any]) -> int:
+        # ~4 characters per token plus the expected output
+        output_tokens = params.get('max_tokens') or params.get('max_output_tokens') or self.config.default_output_tokens
+        return len(prompt) // 4 + int(output_tokens)
+
+    ## error classification
+    def is_rate_limited(self, error: Exception) -> bool:
+        status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+        if status == 429:
+            return True
+        return bool(self._rate_limit_pattern.search(str(error)))
+
+    def is_transient(self, error: Exception) -> bool:
+        if isinstance(error, (TimeoutError, ConnectionError)) and not isinstance(error, LLMDeadlineExceeded):
+            return True
+        status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+        if status in (500, 502, 503, 504):
+            return True
+        return bool(self._transient_pattern.search(str(error)))
+
+    @staticmethod
+    def retry_after(error: Exception) -> Optional[float]:
+        """Seconds the provider asked us to wait, from headers or the error text."""
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        try:
+            value = headers.get('retry-after') or headers.get('Retry-After')
+            if value is not None:
+                return float(value)
+        except (TypeError, ValueError, AttributeError):
+            pass
+
+        msg = str(error)
+        for pattern in (r'retry[- ]after[:\s]+([\d.]+)', r'retry in ([\d.]+)\s*s', r'retry_delay\s*\{\s*seconds:\s*(\d+)'):
+            match = re.search(pattern, msg, re.IGNORECASE)
+            if match:
+                return float(match.group(1))
+        return None
+
+    def backoff(self, attempt: int) -> float:
+        # full jitter: random in [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.config.max_backoff, self.config.base_backoff * (2 ** attempt)))
+
+    ## metrics
+    def _record(self, provider_name: str, **counters):
+        with self._lock:
+            metrics = self._metrics.setdefault(provider_name, {
+                'calls': 0, 'successes': 0, 'failures': 0, 'retries': 0, 'rate_limited': 0,
+                'deadline_exceeded': 0, 'queue_seconds': 0.0, 'latencies': deque(maxlen=500),
+            })
+            latency = counters.pop('latency', None)
+            if latency is not None:
+                metrics['latencies'].append(latency)
+            for name, value in counters.items():
+                metrics[name] += value
+
+    def latency_percentile(self, provider_name: str, percentile: float, min_samples: int = 1) -> Optional[float]:
+        """Provider call latency at `percentile` (0-1) over recent successes, None below `min_samples`."""
+        with self._lock:
+            metrics = self._metrics.get(provider_name)
+            latencies = sorted(metrics['latencies']) if metrics else []
+        if len(latencies) < max(1, min_samples):
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile))]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            output = {}
+            for provider_name, metrics in self._metrics.items():
+                latencies = sorted(metrics['latencies'])
+                output[provider_name] = {
+                    **{name: value for name, value in metrics.items() if name != 'latencies'},
+                    'queue_seconds': round(metrics['queue_seconds'], 3),
+                    'latency_p50': round(latencies[len(latencies) // 2], 3) if latencies else None,
+                    'latency_p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3) if latencies else None,
+                }
+            breakers = dict(self._breakers)
+        for provider_name, breaker in breakers.items():
+            output.setdefault(provider_name, {})['breaker'] = breaker.snapshot()
+        return output
+
+    ## call
+    def call(self, provider, prompt: str, timeout: Optional[float] = None, **params) -> str:
+        """
+        Run `provider.generate_text(prompt, **params)` under the provider's rate
+        limit, retrying rate limit / transient errors until `timeout` seconds
+        (default `default_deadline`) have passed.
+        """
+        provider_name = provider.provider_name
+        deadline = self.clock() + (timeout or self.config.default_deadline)
+        buckets = self._buckets_for(provider_name)
+        breaker = self.breaker(provider_name)
+        self._record(provider_name, calls=1)
+
+        attempt = 0
+        while True:
+            try:
+                # the slot is held for one attempt, not across the backoff sleeps
+                with self.dispatcher.slot(provider_name, timeout=deadline - self.clock()):
+                    queued = buckets['requests'].acquire(1, deadline)
+                    queued += buckets['tokens'].acquire(self.estimate_tokens(prompt, params), deadline)
+                    self._record(provider_name, queue_seconds=queued)
+
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        raise LLMDeadlineExceeded("deadline passed before the provider call")
+                    if not breaker.allow():
+                        raise CircuitOpenError(f"{provider_name} circuit breaker is open")
+
+                    start = self.clock()
+                    try:
+                        response = provider.generate_text(prompt, timeout=remaining, **params)
+                    except Exception as e:
+                        if self.is_rate_limited(e):
+                            # quota backpressure, handled by the buckets and Retry-After, not a provider fault
+                            breaker.release()
+                        else:
+                            breaker.record(False, self.clock() - start)
+                        raise
+                    latency = self.clock() - start
+                    breaker.record(True, latency)
+                    self._record(provider_name, successes=1, latency=latency)
+                    return response
+
+            except LLMQueueTimeout as e:
+                self._record(provider_name, failures=1, deadline_exceeded=1)
+                raise LLMDeadlineExceeded(str(e)) from e
+            except (LLMDeadlineExceeded, CircuitOpenError) as e:
+                self._record(provider_name, failures=1, deadline_exceeded=int(isinstance(e, LLMDeadlineExceeded)))
+                raise
+            except Exception as e:
+                rate_limited = self.is_rate_limited(e)
+                if not (rate_limited or self.is_transient(e)) or attempt >= self.config.max_retries:
+                    self._record(provider_name, failures=1, rate_limited=int(rate_limited))
+                    raise
+
+                wait = self.retry_after(e)
+                if wait is None:
+                    wait = self.backoff(attempt)
+                if rate_limited:
+                    # everyone waits, not just this caller
+                    buckets['requests'].pause(wait)
+
+                if self.clock() + wait > deadline:
+                    self._record(provider_name, failures=1, rate_limited=int(rate_limited), deadline_exceeded=1)
+                    raise LLMDeadlineExceeded(f"{provider_name} still failing, retry in {wait:.1f}s exceeds the call deadline: {e}") from e
+
+                attempt += 1
+                self._record(provider_name, retries=1, rate_limited=int(rate_limited))
+                print(f"LLM {provider_name} call failed ({e}), retry {attempt} in {wait:.1f}s")
+                if not rate_limited:
+                    self.sleep(wait)
+
+    def stream(self, provider, prompt: str, timeout: Optional[float] = None, priority: str = None, **params) -> Iterator[str]:
+        """
+        Yield the text chunks of `provider.stream_text(prompt, **params)`.
+
+        Admission is the same as for `call()` (dispatcher slot, both token
+        buckets, circuit breaker), but the slot is given back once the first
+        chunk arrived so a long answer does not hold it while it is read out.
+        Failures are not retried, the caller may already have shown text.
+        """
+        provider_name = provider.provider_name
+        deadline = self.clock() + (timeout or self.config.default_deadline)
+        buckets = self._buckets_for(provider_name)
+        breaker = self.breaker(provider_name)
+        self._record(provider_name, calls=1)
+
+        start = None
+        try:
+            with self.dispatcher.slot(provider_name, priority=priority, timeout=deadline - self.clock()):
+                queued = buckets['requests'].acquire(1, deadline)
+                queued += buckets['tokens'].acquire(self.estimate_tokens(prompt, params), deadline)
+                self._record(provider_name, queue_seconds=queued)
+
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    raise LLMDeadlineExceeded("deadline passed before the provider call")
+                if not breaker.allow():
+                    raise CircuitOpenError(f"{provider_name} circuit breaker is open")
+
+                start = self.clock()
+                chunks = iter(provider.stream_text(prompt, timeout=remaining, **params))
+                first = next(chunks, None)
+            # time to first chunk is what the breaker and the hedging percentiles care about
+            latency = self.clock() - start
+            breaker.record(True, latency)
+            start = None
+            if first is not None:
+                yield first
+            yield from chunks
+            self._record(provider_name, successes=1, latency=latency)
+        except LLMQueueTimeout as e:
+            self._record(provider_name, failures=1, deadline_exceeded=1)
+            raise LLMDeadlineExceeded(str(e)) from e
+        except Exception as e:
+            if start is not None:
+                if self.is_rate_limited(e):
+                    breaker.release()
+                else:
+                    breaker.record(False, self.clock() - start)
+            self._record(
+                provider_name, failures=1, rate_limited=int(self.is_rate_limited(e)),
+                deadline_exceeded=int(isinstance(e, LLMDeadlineExceeded))
+            )
+            raise
+
+
+llm_client = LLMClient(dispatcher=llm_dispatcher)
@@ -0,0 +1,230 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from ..schema import llm_dispatcher_config
+
+PRIORITIES = ('interactive', 'normal', 'batch')
+
+_priority = contextvars.ContextVar('llm_priority', default=None)
+
+
+@contextmanager
+def llm_priority(priority: str):
+    """Run the enclosed LLM calls (of this thread / task) in the given priority class."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> Optional[str]:
+    return _priority.get()
+
+
+def with_priority_context(func: Callable) -> Callable:
+    """Wrap `func` to run in a copy of the caller's context, for work handed to a thread pool."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(func, *args, **kwargs)
+
+
+class LLMQueueTimeout(TimeoutError):
+    """The call was not admitted to its provider before its deadline."""
+
+
+class _Waiter:
+    __slots__ = ('priority', 'enqueued_at', 'admitted', 'deferred')
+
+    def __init__(self, priority: str, enqueued_at: float):
+        self.priority = priority
+        self.enqueued_at = enqueued_at
+        self.admitted = False
+        self.deferred = False
+
+
+class LLMDispatcher:
+    """
+    Priority aware admission of LLM calls to a provider.
+
+    Every call takes one of the provider's `max_in_flight` slots. Waiting calls
+    queue per priority class (interactive, normal, batch); free slots go to the
+    classes in proportion to their weights (stride scheduling), so batch work
+    still progresses but cannot starve the chatbot. Batch calls are held back
+    altogether while interactive calls are waiting or the recent p95 queue wait of
+    interactive calls is above `interactive_wait_target`, and never hold more
+    than `batch_max_share` of the slots. Calls already running are not interrupted.
+
+    The class comes from `llm_priority()` (set by the job runner per job type)
+    or the `priority` argument of `slot()`, else `default_priority`.
+    """
+
+    def __init__(self, config=llm_dispatcher_config, clock=time.monotonic):
+        self.config = config
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Dict[str, deque]] = {}
+        self._in_flight: Dict[str, Dict[str, int]] = {}
+        self._passes: Dict[str, Dict[str, float]] = {}
+        self._interactive_waits: Dict[str, deque] = {}
+        self._metrics = {
+            priority: {'admitted': 0, 'timed_out': 0, 'deferred': 0, 'max_queue_depth': 0, 'waits': deque(maxlen=500)}
+            for priority in PRIORITIES
+        }
+
+    def priority_of(self, priority: Optional[str] = None) -> str:
+        priority = (priority or current_priority() or self.config.default_priority).lower()
+        return priority if priority in PRIORITIES else self.config.default_priority
+
+    @contextmanager
+    def slot(self, provider_name: str, priority: str = None, timeout: Optional[float] = None):
+        """
+        Hold one of the provider's slots for the enclosed call.
+
+        Args:
+            provider_name: provider whose slots are used (variants share them)
+            priority: class of the call, defaults to the current llm_priority()
+            timeout: seconds the call may wait for a slot, LLMQueueTimeout after that
+        """
+        if not self.config.enabled:
+            yield
+            return
+
+        provider_name = str(provider_name)
+        priority = self.priority_of(priority)
+        self._enter(provider_name, priority, timeout)
+        try:
+            yield
+        finally:
+            self._leave(provider_name, priority)
+
+    ## admission
+    def _provider(self, provider_name: str):
+        if provider_name not in self._queues:
+            self._queues[provider_name] = {priority: deque() for priority in PRIORITIES}
+            self._in_flight[provider_name] = {priority: 0 for priority in PRIORITIES}
+            self._passes[provider_name] = {priority: 0.0 for priority in PRIORITIES}
+            self._interactive_waits[provider_name] = deque(maxlen=500)
+        return self._queues[provider_name]
+
+    def _enter(self, provider_name: str, priority: str, timeout: Optional[float]):
+        with self._cond:
+            queues = self._provider(provider_name)
+            start = self.clock()
+            waiter = _Waiter(priority, start)
+            if not queues[priority]:
+                # a class that was idle does not get credit for the time it was idle
+                active = [self._passes[provider_name][name] for name in PRIORITIES if queues[name]]
+                current = min(active) if active else max(self._passes[provider_name].values())
+                self._passes[provider_name][priority] = max(self._passes[provider_name][priority], current)
+            queues[priority].append(waiter)
+            metrics = self._metrics[priority]
+            metrics['max_queue_depth'] = max(metrics['max_queue_depth'], len(queues[priority]))
+            self._dispatch(provider_name)
+
+            while not waiter.admitted:
+                remaining = None if timeout is None else start + timeout - self.clock()
+                if remaining is not None and remaining <= 0:
+                    queues[priority].remove(waiter)
+                    metrics['timed_out'] += 1
+                    self._dispatch(provider_name)
+                    raise LLMQueueTimeout(f"{provider_name} {priority} call waited {timeout:.1f}s for a slot")
+                self._cond.wait(1.0 if remaining is None else min(remaining, 1.0))
+                if not waiter.admitted:
+                    # held batch work is released once the interactive window has aged out
+                    self._dispatch(provider_name)
+
+            waited = self.clock() - start
+            metrics['waits'].append(waited)
+            if priority == 'interactive':
+                self._interactive_waits[provider_name].append((self.clock(), waited))
+
+    def _leave(self, provider_name: str, priority: str):
+        with self._cond:
+            self._in_flight[provider_name][priority] -= 1
+            self._dispatch(provider_name)
+
+    def _interactive_wait_p95(self, provider_name: str) -> Optional[float]:
+        waits = self._interactive_waits[provider_name]
+        cutoff = self.clock() - self.config.wait_window
+        while waits and waits[0][0] < cutoff:
+            waits.popleft()
+        if not waits:
+            return None
+        durations = sorted(seconds for _, seconds in waits)
+        return durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+
+    def _batch_held(self, provider_name: str) -> bool:
+        if self._queues[provider_name]['interactive']:
+            return True
+        p95 = self._interactive_wait_p95(provider_name)
+        if p95 is not None and p95 > self.config.interactive_wait_target:
+            return True
+        batch_slots = max(1, int(self.config.max_in_flight * self.config.batch_max_share))
+        return self._in_flight[provider_name]['batch'] >= batch_slots
+
+    def _dispatch(self, provider_name: str):
+        """Hand free slots to waiting calls, called with the condition held."""
+        queues = self._queues[provider_name]
+        in_flight = self._in_flight[provider_name]
+        passes = self._passes[provider_name]
+        admitted = False
+
+        while sum(in_flight.values()) < self.config.max_in_flight:
+            eligible = [priority for priority in PRIORITIES if queues[priority]]
+            if 'batch' in eligible and self._batch_held(provider_name):
+                eligible.remove('batch')
+                for waiter in queues['batch']:
+                    if not waiter.deferred:
+                        waiter.deferred = True
+                        self._metrics['batch']['deferred'] += 1
+            if not eligible:
+                break
+
+            priority = min(eligible, key=lambda name: (passes[name], PRIORITIES.index(name)))
+            passes[priority] += 1.0 / max(self.config.weights.get(priority, 1), 1)
+            waiter = queues[priority].popleft()
+            waiter.admitted = True
+            in_flight[priority] += 1
+            self._metrics[priority]['admitted'] += 1
+            admitted = True
+
+        if admitted:
+            self._cond.notify_all()
+
+    ## metrics
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            classes = {}
+            for priority, metrics in self._metrics.items():
+                waits = sorted(metrics['waits'])
+                classes[priority] = {
+                    'weight': self.config.weights.get(priority, 1),
+                    'queue_depth': sum(len(queues[priority]) for queues in self._queues.values()),
+                    'in_flight': sum(in_flight[priority] for in_flight in self._in_flight.values()),
+                    **{name: value for name, value in metrics.items() if name != 'waits'},
+                    'wait_avg': round(sum(waits) / len(waits), 3) if waits else None,
+                    'wait_p50': round(waits[len(waits) // 2], 3) if waits else None,
+                    'wait_p95': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else None,
+                }
+            providers = {}
+            for provider_name, queues in self._queues.items():
+                p95 = self._interactive_wait_p95(provider_name)
+                providers[provider_name] = {
+                    'queue_depth': {priority: len(queue) for priority, queue in queues.items()},
+                    'in_flight': dict(self._in_flight[provider_name]),
+                    'interactive_wait_p95': round(p95, 3) if p95 is not None else None,
+                    'batch_held': self._batch_held(provider_name),
+                }
+            return {
+                'enabled': self.config.enabled,
+                'max_in_flight': self.config.max_in_flight,
+                'classes': classes,
+                'providers': providers,
+            }
+
+
+llm_dispatcher = LLMDispatcher()
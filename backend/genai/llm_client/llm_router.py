@@ -0,0 +1,192 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from .llm_client import LLMDeadlineExceeded, llm_client
+from .llm_dispatcher import with_priority_context
+from ..schema import llm_router_config
+
+
+class RoutedResponse(str):
+    """Answer text tagged with the provider (and model) that produced it."""
+    provider_name: str = None
+    model_name: str = None
+
+    @classmethod
+    def of(cls, candidate, text):
+        if not isinstance(text, str):
+            return text
+        response = cls(text)
+        response.provider_name = candidate.provider_name
+        response.model_name = getattr(candidate, 'model_name', None)
+        return response
+
+
+class LLMRouter:
+    """
+    Provider failover on top of the LLM client.
+
+    A call goes to the requested provider unless its circuit breaker is open,
+    in which case it goes straight to the first healthy fallback (see
+    LLMRouterConfig.failover). While a fallback is available the first provider
+    gets at most `failover_timeout` seconds, the rest of the deadline is left for
+    the fallback (unless the caller passed its own timeout). With hedging enabled
+    the fallback is also fired when the first provider has not answered within its
+    p95 latency; the first answer wins.
+
+    Fallback calls get a template appropriate output limit (`fallback_max_tokens`),
+    answers come back as RoutedResponse so callers can tell which provider answered.
+    """
+
+    def __init__(self, client=llm_client, config=llm_router_config, resolve=None):
+        self.client = client
+        self.config = config
+        self._resolve = resolve
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = {'failovers': 0, 'short_circuited': 0, 'hedges_fired': 0, 'hedge_wins': 0}
+
+    def resolve(self, variant: str):
+        if self._resolve is None:
+            # imported lazily, the factory imports the models which import this module
+            from ..llm_factory import LLMModelFactory
+            self._resolve = LLMModelFactory.get_model_provider
+        return self._resolve(variant)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.config.hedge_workers, thread_name_prefix='llm-hedge')
+        return self._executor
+
+    def _count(self, name: str, value: int = 1):
+        with self._lock:
+            self._stats[name] += value
+
+    def candidates(self, provider) -> List[Any]:
+        """The provider followed by its fallbacks, one per distinct provider."""
+        candidates = [provider]
+        if not self.config.failover_enabled:
+            return candidates
+        for variant in self.config.failover.get(provider.provider_name, []):
+            try:
+                fallback = self.resolve(variant)
+            except ValueError as e:
+                print(f"LLM failover variant skipped: {e}")
+                continue
+            # with a provider override every variant is the same provider
+            if fallback.provider_name not in {candidate.provider_name for candidate in candidates}:
+                candidates.append(fallback)
+        return candidates
+
+    def hedge_delay(self, provider) -> Optional[float]:
+        latency = self.client.latency_percentile(
+            provider.provider_name, self.config.hedge_percentile, self.config.hedge_min_samples
+        )
+        if latency is None:
+            return None
+        return min(max(latency, self.config.hedge_min_delay), self.config.hedge_max_delay)
+
+    def params_for(self, candidate, provider, template: Optional[str], params: Dict[str, Any]) -> Dict[str, Any]:
+        """Generation params of one candidate: fallbacks get an output limit fit for the template."""
+        param = getattr(candidate, 'output_token_param', None)
+        if candidate is provider or not param or param in params:
+            return params
+        return {**params, param: self.config.max_tokens_for(template)}
+
+    ## call
+    def call(self, provider, prompt: str, timeout: Optional[float] = None, template: Optional[str] = None, **params) -> str:
+        """Same contract as LLMClient.call, failing over to healthy providers."""
+        candidates = self.candidates(provider)
+        healthy = [candidate for candidate in candidates if self.client.breaker(candidate.provider_name).available()]
+        if not healthy:
+            # let the client raise CircuitOpenError for the requested provider
+            healthy = candidates[:1]
+        elif healthy[0] is not provider:
+            self._count('short_circuited')
+            print(f"LLM {provider.provider_name} circuit open, routing to {healthy[0].provider_name}")
+
+        deadline = self.client.clock() + (timeout or self.client.config.default_deadline)
+        calls = [(candidate, self.params_for(candidate, provider, template, params)) for candidate in healthy]
+        # a caller's own timeout is theirs to spend on the requested provider
+        capped = timeout is None
+        if self.config.hedging_enabled and len(calls) > 1:
+            delay = self.hedge_delay(healthy[0])
+            if delay is not None:
+                return self._hedged_call(calls, prompt, deadline, delay, capped)
+        return self._failover_call(calls, prompt, deadline, capped)
+
+    def _budget(self, deadline: float, has_fallback: bool, capped: bool = True) -> float:
+        remaining = deadline - self.client.clock()
+        return min(remaining, self.config.failover_timeout) if has_fallback and capped else remaining
+
+    def _failover_call(self, calls: List[Any], prompt: str, deadline: float, capped: bool = True) -> str:
+        error = None
+        candidates = [candidate for candidate, _ in calls]
+        for index, (candidate, params) in enumerate(calls):
+            budget = self._budget(deadline, index < len(calls) - 1, capped)
+            if error is not None and budget <= 0:
+                break
+            try:
+                return RoutedResponse.of(candidate, self.client.call(candidate, prompt, timeout=budget, **params))
+            except Exception as e:
+                error = e
+                if index < len(candidates) - 1:
+                    self._count('failovers')
+                    print(f"LLM {candidate.provider_name} failed ({e}), failing over to {candidates[index + 1].provider_name}")
+        raise error
+
+    def _hedged_call(self, calls: List[Any], prompt: str, deadline: float, delay: float, capped: bool = True) -> str:
+        (primary, primary_params), (hedge, hedge_params) = calls[0], calls[1]
+        # hedge threads keep the caller's priority class
+        primary_future = self.executor.submit(
+            with_priority_context(self.client.call), primary, prompt, timeout=self._budget(deadline, True, capped), **primary_params
+        )
+        done, _ = wait([primary_future], timeout=delay)
+        if done:
+            try:
+                return RoutedResponse.of(primary, primary_future.result())
+            except Exception as e:
+                self._count('failovers')
+                print(f"LLM {primary.provider_name} failed ({e}), failing over to {hedge.provider_name}")
+                return self._failover_call(calls[1:], prompt, deadline, capped)
+
+        self._count('hedges_fired')
+        hedge_future = self.executor.submit(
+            with_priority_context(self.client.call), hedge, prompt, timeout=self._budget(deadline, len(calls) > 2, capped), **hedge_params
+        )
+        pending = {primary_future, hedge_future}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - self.client.clock(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                # the slower call keeps running in the background, its answer is dropped
+                if future is hedge_future:
+                    self._count('hedge_wins')
+                return RoutedResponse.of(hedge if future is hedge_future else primary, result)
+
+        if len(calls) > 2 and deadline > self.client.clock():
+            return self._failover_call(calls[2:], prompt, deadline, capped)
+        raise error or LLMDeadlineExceeded("no provider answered before the deadline")
+
+    ## metrics
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        return {
+            'failover_enabled': self.config.failover_enabled,
+            'hedging_enabled': self.config.hedging_enabled,
+            **stats,
+        }
+
+
+llm_router = LLMRouter()
@@ -1,17 +1,50 @@
-from ..llm_models.llm_model_implementation import gemini_model,BaseLLMModel,chatgpt_model
+import threading
+from typing import Dict
+
+from ..llm_models.llm_model_implementation import GeminiModel, BaseLLMModel, ChatGPTModel
+from ..llm_models.local_model import LocalModel
+from ..schema import llm_provider_config
 
 class LLMModelFactory:
+    """
+    Providers are built on first use, one per model variant (see
+    LLMProviderConfig.model_variants), and reused for the life of the process.
+    Variants of a provider share its pooled client and rate limit buckets.
+    With LLM_PROVIDER_OVERRIDE set (e.g. 'local') every variant is served by
+    that provider, so load tests run the real code paths without provider keys.
+    """
 
-    _supported_model_providers = {
-        "gemini": gemini_model,
-        "chatgpt": chatgpt_model
+    _provider_classes = {
+        "gemini": GeminiModel,
+        "chatgpt": ChatGPTModel,
+        "local": LocalModel
     }
+    _providers: Dict[str, BaseLLMModel] = {}
+    _lock = threading.Lock()
 
     @staticmethod
     def get_model_provider(model_provider_name: str):
         model_provider_name=model_provider_name.lower()
 
-        if model_provider_name in LLMModelFactory._supported_model_providers:
-            return LLMModelFactory._supported_model_providers[model_provider_name]
-        else:
-            raise ValueError(f"Unsupported model provider: {model_provider_name}")
\ No newline at end of file
+        provider = LLMModelFactory._providers.get(model_provider_name)
+        if provider is not None:
+            return provider
+
+        variant = llm_provider_config.model_variants.get(model_provider_name)
+        if variant is None or variant['provider'] not in LLMModelFactory._provider_classes:
+            raise ValueError(f"Unsupported model provider: {model_provider_name}")
+
+        provider_class = LLMModelFactory._provider_classes[variant['provider']]
+        if llm_provider_config.provider_override:
+            provider_class = LLMModelFactory._provider_classes[llm_provider_config.provider_override]
+
+        with LLMModelFactory._lock:
+            provider = LLMModelFactory._providers.get(model_provider_name)
+            if provider is None:
+                provider = provider_class(model_name=variant['model'])
+                LLMModelFactory._providers[model_provider_name] = provider
+        return provider
+
+    @staticmethod
+    def variants() -> Dict[str, Dict[str, str]]:
+        return {name: dict(variant) for name, variant in llm_provider_config.model_variants.items()}
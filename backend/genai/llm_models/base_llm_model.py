@@ -1,13 +1,74 @@
 import os 
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from ..cache import llm_response_cache
+from ..llm_client import llm_client, llm_router
 
 class BaseLLMModel:
     local_models_dir='./saved_models/'
+    provider_name: str = 'base'
+    model_name: str = ''
+    # generation param limiting the answer length, set by the router on fallback calls
+    output_token_param: str = None
 
     def get_model(self):
         raise NotImplementedError("Error: Model not defined")
 
+    def generate_text(self, prompt: str, timeout: float = None, **params) -> str:
+        raise NotImplementedError("Error: Text generation not defined")
+
+    def stream_text(self, prompt: str, timeout: float = None, **params):
+        raise NotImplementedError("Error: Streaming text generation not defined")
+
+    def chat_model(self):
+        raise NotImplementedError("Error: LangChain chat model not defined")
+
+    def generate(self, prompt: str, template: str = None, timeout: float = None, **params) -> str:
+        """
+        Generate text for a prompt, served from the shared response cache when possible.
+        Provider calls go through the shared LLM client (rate limit, retries, deadline,
+        circuit breaker) via the router, which fails over to a healthy provider.
+
+        Args:
+            prompt: prompt text built by PromptManager
+            template: PromptManager template name (selects the cache TTL)
+            timeout: seconds the call may take including queueing and retries
+            params: provider generation params, part of the cache key
+        """
+        return llm_response_cache.get_or_generate(
+            self,
+            prompt,
+            lambda: llm_router.call(self, prompt, timeout=timeout, template=template, **params),
+            template=template,
+            params=params
+        )
+
+    def stream(self, prompt: str, template: str = None, timeout: float = None, **params):
+        """
+        Same as generate() but yields the answer in text chunks as the provider
+        produces them (LLMClient.stream). A cached answer comes as one chunk; if
+        the stream fails before its first chunk the router's answer (with
+        failover) is yielded whole instead.
+        """
+        return llm_response_cache.get_or_stream(
+            self,
+            prompt,
+            lambda: self._stream(prompt, template, timeout, params),
+            template=template,
+            params=params
+        )
+
+    def _stream(self, prompt: str, template: str, timeout: float, params):
+        chunks = llm_client.stream(self, prompt, timeout=timeout, **params)
+        try:
+            first = next(chunks, None)
+        except Exception as e:
+            # nothing was handed out yet, another provider may still answer
+            print(f"LLM {self.provider_name} stream failed ({e}), answering through the router")
+            yield llm_router.call(self, prompt, timeout=timeout, template=template, **params)
+            return
+        if first is not None:
+            yield first
+        yield from chunks
+
     def get_tokenizer(self):
         raise NotImplementedError("Error: Tokenizer not defined")
     
@@ -29,6 +90,8 @@ class BaseLLMModel:
            
             if os.path.exists(path) and os.path.isdir(path):
                 try:
+                    import torch
+                    from transformers import AutoModelForCausalLM, AutoTokenizer
                     tokenizer=AutoTokenizer.from_pretrained(path)
                     model=AutoModelForCausalLM.from_pretrained(path,torch_dtype=torch.float16,device_map="auto",low_cpu_mem_usage=True)    
                 except Exception as e:
@@ -1,47 +1,148 @@
+import threading
+
 from .base_llm_model import BaseLLMModel
+from ..schema import llm_provider_config
 from config import Config
-import google.generativeai as genai
-from openai import OpenAI
 
 class GeminiModel(BaseLLMModel):
-    def __init__(self):
-        genai.configure(api_key=Config.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel("gemini-2.0-flash")
-        # client = genai.Client(api_key=Config.GEMINI_API_KEY)
-        # self.model = client.models.generate_content(model="gemini-2.0-flash")
+    provider_name = 'gemini'
+    output_token_param = 'max_output_tokens'
+    # genai.configure sets up one process wide client (and its gRPC channel) shared by every variant
+    _configured = False
+    _configure_lock = threading.Lock()
+
+    def __init__(self, model_name: str = 'gemini-2.0-flash'):
+        self.model_name = model_name
+        self._model = None
+
+    @classmethod
+    def configure(cls):
+        if not cls._configured:
+            with cls._configure_lock:
+                if not cls._configured:
+                    import google.generativeai as genai
+                    genai.configure(api_key=Config.GEMINI_API_KEY)
+                    cls._configured = True
+
+    # the google sdk is imported and configured on first use, not at app start
+    @property
+    def model(self):
+        if self._model is None:
+            import google.generativeai as genai
+            self.configure()
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
 
     def get_model(self):
         return self.model
-    
+
     def get_tokenizer(self):
         return None
 
+    def generate_text(self, prompt, timeout=None, **params):
+        response = self.model.generate_content(
+            prompt,
+            generation_config=params or None,
+            request_options={"timeout": timeout} if timeout else None
+        )
+        return response.text
+
+    def stream_text(self, prompt, timeout=None, **params):
+        response = self.model.generate_content(
+            prompt,
+            generation_config=params or None,
+            request_options={"timeout": timeout} if timeout else None,
+            stream=True
+        )
+        for chunk in response:
+            text = getattr(chunk, 'text', '')
+            if text:
+                yield text
+
 
 class ChatGPTModel(BaseLLMModel):
+    provider_name = 'chatgpt'
+    output_token_param = 'max_tokens'
+    # one pooled keep-alive http client (and OpenAI client) per process, shared by every variant
+    _http_client = None
+    _client = None
+    _client_lock = threading.Lock()
+
+    def __init__(self, model_name: str = 'gpt-4o-mini'):
+        self.model_name = model_name
+        self._chat_model = None
+
+    @classmethod
+    def http_client(cls):
+        if cls._http_client is None:
+            with cls._client_lock:
+                if cls._http_client is None:
+                    import httpx
+                    cls._http_client = httpx.Client(
+                        limits=httpx.Limits(
+                            max_connections=llm_provider_config.max_connections,
+                            max_keepalive_connections=llm_provider_config.max_keepalive_connections,
+                            keepalive_expiry=llm_provider_config.keepalive_expiry
+                        ),
+                        timeout=httpx.Timeout(None, connect=llm_provider_config.connect_timeout)
+                    )
+        return cls._http_client
+
+    @property
+    def client(self):
+        cls = type(self)
+        if cls._client is None:
+            http_client = cls.http_client()
+            with cls._client_lock:
+                if cls._client is None:
+                    from openai import OpenAI
+                    cls._client = OpenAI(api_key=Config.OPENAI_API_KEY, http_client=http_client)
+        return cls._client
+
+    def chat_model(self):
+        """LangChain chat model of this variant, reusing the pooled http client."""
+        if self._chat_model is None:
+            from langchain_openai import ChatOpenAI
+            self._chat_model = ChatOpenAI(
+                model_name=self.model_name,
+                temperature=0,
+                api_key=Config.OPENAI_API_KEY,
+                http_client=self.http_client()
+            )
+        return self._chat_model
 
-    def __init__(self):
-        self.model_name = 'gpt-4o-mini'
-        self.client=OpenAI(api_key=Config.OPENAI_API_KEY)
-    
     def get_model(self):
         return self.client
-    
+
     def get_tokenizer(self):
         return None
 
-    def generate_content(self, prompt, model_name=None, max_tokens=500):
+    def generate_content(self, prompt, model_name=None, max_tokens=500, timeout=None):
         if model_name is None:
             model_name = self.model_name
-        
-        response=self.client.response.create(
+
+        response=self.client.chat.completions.create(
             model=model_name,
-            prompt=prompt,
+            messages=[{"role": "user", "content": prompt}],
             max_tokens=max_tokens,
-            temperature=0
+            temperature=0,
+            timeout=timeout
         )
         return response.choices[0].message.content
-    
 
+    def generate_text(self, prompt, timeout=None, **params):
+        return self.generate_content(prompt, max_tokens=params.get('max_tokens', 500), timeout=timeout)
 
-gemini_model = GeminiModel()
-chatgpt_model = ChatGPTModel()
\ No newline at end of file
+    def stream_text(self, prompt, timeout=None, **params):
+        stream = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=params.get('max_tokens', 500),
+            temperature=0,
+            timeout=timeout,
+            stream=True
+        )
+        for chunk in stream:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                yield text
@@ -0,0 +1,334 @@
+import re
+import ast
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+from types import SimpleNamespace
+
+from .base_llm_model import BaseLLMModel
+from ..schema import local_llm_config
+
+# first distinctive phrase of each prompt -> template name (PromptManager, expense service, chatbot)
+TEMPLATE_FINGERPRINTS = [
+    ('HR data extraction assistant', 'get_structure_json_resume'),
+    ('performance review summarizer', 'performance_review_prompt'),
+    ('AI assistant for interview tasks', 'mock_interview_prompt'),
+    ('course recommendation tasks', 'course_recommendation_prompt'),
+    ('expert carrer coach', 'skill_gap_suggest_upskill_prompt'),
+    ('resume tailoring tasks', 'tailor_resume_prompt'),
+    ('resume shortlisting tasks', 'resume_shortlisting_prompt'),
+    ('Score this candidate against the job requirements', 'score_candidate_prompt'),
+    ('creating comprehensive job descriptions', 'job_description_generation_prompt'),
+    ('making Job Descriptions based on Job title', 'make_JD_prompt'),
+    ('expert expense auditor', 'expense_verification'),
+    ('policy compliance expert', 'expense_policy_compliance'),
+    ('expense categorization expert', 'expense_categorization'),
+    ('duplicate expense detection', 'expense_duplicate_detection'),
+    ('You are a financial analyst', 'expense_summary'),
+    ('cost optimization consultant', 'expense_optimization'),
+    ('helpful HR assistant', 'chatbot'),
+]
+
+SKILL_VOCABULARY = [
+    'python', 'java', 'javascript', 'typescript', 'react', 'flask', 'django', 'sql', 'aws', 'docker',
+    'kubernetes', 'machine learning', 'data analysis', 'communication', 'leadership', 'excel',
+]
+
+
+class LocalRateLimitError(Exception):
+    """Injected 429, shaped like the provider SDK errors the llm client classifies."""
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"429 rate limit exceeded (local stand-in), retry after {retry_after}s")
+        self.response = SimpleNamespace(headers={'retry-after': str(retry_after)})
+
+
+class LocalGenerativeModel:
+    """Gemini style `generate_content` for the callers that use `get_model()` directly."""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if stream:
+            return (SimpleNamespace(text=text) for text in self.provider.stream_text(prompt))
+        return SimpleNamespace(text=self.provider.generate_text(prompt))
+
+
+class LocalModel(BaseLLMModel):
+    """
+    Offline stand-in provider for load tests: no network, no keys.
+
+    The template is recognised from the prompt text and answered with canned,
+    schema shaped JSON (scores derived from a hash of the prompt, so the same
+    prompt always gets the same answer). Each call sleeps for a latency drawn
+    from the configured distribution and a configurable share of calls fails
+    with a 429 carrying Retry-After, so rate limiting, retries, caching and
+    coalescing can be measured end to end. Random draws come from a seeded
+    generator.
+    """
+    provider_name = 'local'
+
+    def __init__(self, model_name: str = 'local-canned', config=local_llm_config, sleep=time.sleep):
+        self.model_name = model_name
+        self.config = config
+        self.sleep = sleep
+        self._random = random.Random(config.seed)
+        self._lock = threading.Lock()
+
+    def get_model(self):
+        return LocalGenerativeModel(self)
+
+    def get_tokenizer(self):
+        return None
+
+    def chat_model(self):
+        """LangChain runnable for the JD chain, going through the shared llm client."""
+        from langchain_core.runnables import RunnableLambda
+        from ..llm_client import llm_client
+
+        return RunnableLambda(lambda prompt_value: llm_client.call(self, prompt_value.to_string()))
+
+    ## simulation
+    @staticmethod
+    def template_for(prompt: str) -> str:
+        for phrase, template in TEMPLATE_FINGERPRINTS:
+            if phrase in prompt:
+                return template
+        return 'unknown'
+
+    def latency(self, template: str) -> float:
+        config = self.config
+        mean = config.template_latency_mean.get(template, config.latency_mean)
+        with self._lock:
+            if config.latency_distribution == 'fixed':
+                value = mean
+            elif config.latency_distribution == 'uniform':
+                value = self._random.uniform(max(0.0, mean - config.latency_stddev), mean + config.latency_stddev)
+            elif config.latency_distribution == 'normal':
+                value = self._random.gauss(mean, config.latency_stddev)
+            elif mean > 0:
+                # lognormal with the configured mean / stddev, gives the long tail real providers have
+                sigma2 = math.log(1 + (config.latency_stddev / mean) ** 2)
+                value = self._random.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+            else:
+                value = 0.0
+        return max(0.0, value)
+
+    def _rate_limited(self) -> bool:
+        if self.config.rate_limit_rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < self.config.rate_limit_rate
+
+    def generate_text(self, prompt, timeout=None, **params):
+        template = self.template_for(prompt)
+        if self._rate_limited():
+            raise LocalRateLimitError(self.config.retry_after)
+
+        delay = self.latency(template)
+        if timeout is not None and delay > timeout:
+            self.sleep(timeout)
+            raise TimeoutError(f"local model timed out after {timeout:.1f}s")
+        self.sleep(delay)
+        return self.response_for(template, prompt)
+
+    def stream_text(self, prompt, timeout=None, **params):
+        template = self.template_for(prompt)
+        if self._rate_limited():
+            raise LocalRateLimitError(self.config.retry_after)
+
+        text = self.response_for(template, prompt)
+        size = max(1, self.config.stream_chunk_chars)
+        chunks = [text[i:i + size] for i in range(0, len(text), size)] or ['']
+        delay = self.latency(template) / len(chunks)
+        for chunk in chunks:
+            self.sleep(delay)
+            yield chunk
+
+    ## canned answers
+    @staticmethod
+    def _score(prompt: str, low: int = 55, high: int = 95) -> int:
+        return low + int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16) % (high - low + 1)
+
+    @staticmethod
+    def _field(prompt: str, label: str, default: str = '') -> str:
+        match = re.search(rf'{re.escape(label)}:?[ \t]*(.+)', prompt)
+        return match.group(1).strip() if match else default
+
+    @staticmethod
+    def _courses(prompt: str):
+        try:
+            courses = ast.literal_eval(LocalModel._field(prompt, '- Courses', '[]'))
+            return [course for course in courses if isinstance(course, (list, tuple)) and course]
+        except (ValueError, SyntaxError):
+            return []
+
+    def response_for(self, template: str, prompt: str) -> str:
+        builder = getattr(self, f'_answer_{template}', None)
+        if builder is None:
+            return json.dumps({"response": "Local model response", "template": template})
+        answer = builder(prompt)
+        return answer if isinstance(answer, str) else json.dumps(answer)
+
+    def _answer_get_structure_json_resume(self, prompt):
+        resume = prompt.lower()
+        return {
+            "location": "Chennai, India",
+            "skills": [skill.title() for skill in SKILL_VOCABULARY if skill in resume] or ["Communication"],
+            "total_experience": f"{self._score(prompt, 1, 12)} years",
+            "work_experience": [{
+                "title": "Software Engineer", "company": "Acme Corp", "position": "Software Engineer",
+                "start_date": "2019-01", "end_date": "2024-06",
+                "description": "Built and maintained web services."
+            }],
+            "education": [{
+                "degree": "B.Tech", "institute": "Anna University", "field_of_study": "Computer Science",
+                "start_date": "2015", "end_date": "2019"
+            }],
+            "certifications": [],
+            "projects": [],
+            "interests": [],
+        }
+
+    def _answer_performance_review_prompt(self, prompt):
+        return {
+            "Strengths": "Delivers on time and communicates clearly.",
+            "Weaknesses": "Limited ownership of cross team work.",
+            "Improvements": "Lead one cross team initiative next quarter.",
+            "Actionable_step": "Take a stakeholder management course.",
+            "Comments": "Solid performer with clear growth areas."
+        }
+
+    def _answer_mock_interview_prompt(self, prompt):
+        job_title = self._field(prompt, '- Job Title', 'the role')
+        output = {}
+        for level in ('easy', 'medium', 'hard'):
+            count = int(self._field(prompt, f'- Number of {level} questions', '3') or 3)
+            output[level] = [
+                {"question": f"{level.title()} question {i + 1} about {job_title}?"} for i in range(count)
+            ]
+        return output
+
+    def _answer_course_recommendation_prompt(self, prompt):
+        courses = self._courses(prompt)
+        return [
+            {"Course_title": str(course[0]), "reason": "Closes a skill gap for the target job."}
+            for course in courses[:2]
+        ]
+
+    def _answer_skill_gap_suggest_upskill_prompt(self, prompt):
+        courses = self._courses(prompt)
+        return {
+            "missing_skill": ["System Design", "Cloud Deployment"],
+            "course_upskilling_path": [
+                {
+                    "course_id": str(course[0]),
+                    "step": str(step),
+                    "course_title": str(course[1]) if len(course) > 1 else "",
+                    "estimated_time": f"{max(1, round((course[2] if len(course) > 2 and isinstance(course[2], int) else 60) / 60))} hours",
+                    "reason": "Covers a missing skill for the role."
+                }
+                for step, course in enumerate(courses[:3], start=1)
+            ]
+        }
+
+    def _answer_tailor_resume_prompt(self, prompt):
+        return {
+            "section": "Work Experience",
+            "mistakes": ["Bullets describe duties instead of results"],
+            "suggested_change": ["Start each bullet with an action verb and a measurable result"],
+            "reasons": "Results oriented bullets match what recruiters screen for."
+        }
+
+    def _answer_resume_shortlisting_prompt(self, prompt):
+        resume_id = re.search(r"'id': '([^']+)'", prompt)
+        user_id = re.search(r"'user_id': '([^']+)'", prompt)
+        return {
+            "score": str(self._score(prompt)),
+            "key_metrics": ["3+ years of experience", "Relevant skills"],
+            "reason": ["Experience matches the job requirements"],
+            "resume_id": resume_id.group(1) if resume_id else "",
+            "user_id": user_id.group(1) if user_id else ""
+        }
+
+    def _answer_score_candidate_prompt(self, prompt):
+        score = self._score(prompt)
+        return {
+            "overall_score": score,
+            "category_scores": {
+                "skills_match": self._score(prompt + 'skills'),
+                "experience_match": self._score(prompt + 'experience'),
+                "education_match": self._score(prompt + 'education'),
+                "location_match": self._score(prompt + 'location'),
+            },
+            "strengths": ["Relevant technical skills"],
+            "weaknesses": ["Limited leadership experience"],
+            "recommendation": "strong_fit" if score >= 80 else "potential_fit",
+            "summary": "Candidate scored by the local stand-in model."
+        }
+
+    def _answer_job_description_generation_prompt(self, prompt):
+        title = self._field(prompt, '- Job Title', 'Software Engineer')
+        return {
+            "title": title,
+            "description": f"We are hiring a {title} to join our team.",
+            "key_responsibilities": ["Design features", "Write tested code", "Review pull requests",
+                                     "Collaborate with product", "Improve reliability"],
+            "required_qualifications": ["Bachelor's degree", "3+ years of experience", "Strong fundamentals",
+                                        "Clear communication"],
+            "preferred_qualifications": ["Cloud experience", "Open source contributions", "Mentoring"],
+            "skills_required": ["Python", "SQL", "APIs", "Testing", "Teamwork", "Problem solving"],
+            "benefits": ["Health insurance", "Paid leave", "Learning budget", "Flexible hours"],
+            "employment_type": "full-time",
+            "experience_level": self._field(prompt, '- Level', 'mid') or 'mid'
+        }
+
+    def _answer_make_JD_prompt(self, prompt):
+        title = self._field(prompt, 'Inputs', 'Software Engineer')
+        return (
+            f"### Job Title\n{title}\n\n### Company\nSE Team 18 Company\n\n### Location\nChennai, Tamil Nadu\n\n"
+            f"### About Us\nWe build HR software.\n\n### Job Summary\nWe are hiring a {title}.\n\n"
+            "### Responsibilities\n- Deliver features\n- Collaborate with the team\n\n"
+            "### Qualifications\n- Relevant experience\n- Clear communication"
+        )
+
+    def _answer_expense_verification(self, prompt):
+        amount = self._field(prompt, '- Amount', '$0').lstrip('$')
+        try:
+            amount = float(amount)
+        except ValueError:
+            amount = 0.0
+        return {
+            "extracted_amount": amount, "extracted_vendor": "Local Vendor", "extracted_date": "2024-01-01",
+            "extracted_items": [], "matches_claimed_amount": True, "confidence_score": 0.9,
+            "discrepancy": 0.0, "flags": [], "recommendation": "approve"
+        }
+
+    def _answer_expense_policy_compliance(self, prompt):
+        return {"is_compliant": True, "violations": [], "warnings": [],
+                "approval_recommendation": "approve", "reasoning": "Within policy limits."}
+
+    def _answer_expense_categorization(self, prompt):
+        return {"category": "travel", "subcategory": "local transport", "confidence": 0.8,
+                "reasoning": "Looks like a transport expense."}
+
+    def _answer_expense_duplicate_detection(self, prompt):
+        return {"is_duplicate": False, "duplicate_probability": 0.1, "matching_expenses": [],
+                "recommendation": "No similar expense found.", "action": "approve"}
+
+    def _answer_expense_summary(self, prompt):
+        return {"total_amount": 0.0, "expense_count": 0, "category_breakdown": {}, "key_insights": [],
+                "trends": [], "outliers": [], "recommendations": [], "executive_summary": "No notable spend."}
+
+    def _answer_expense_optimization(self, prompt):
+        return {"total_potential_savings": 0.0, "optimization_opportunities": [],
+                "best_practices": ["Book travel early"], "priority_actions": []}
+
+    def _answer_chatbot(self, prompt):
+        question = self._field(prompt, 'User Question', 'your question')
+        return f"According to the policy documents, here is the answer to \"{question}\": please follow the documented process."
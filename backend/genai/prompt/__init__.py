@@ -1 +1,2 @@
-from .prompt_manager import PromptManager
\ No newline at end of file
+from .prompt_manager import PromptManager
+from .prompt_budget import PromptBudget, prompt_budget
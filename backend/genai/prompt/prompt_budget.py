@@ -0,0 +1,155 @@
+import re
+import threading
+from typing import Any, Callable, Dict
+
+from ..schema import prompt_budget_config
+
+# resume headings, a low value section runs until the next one of these
+SECTION_HEADINGS = {
+    'summary', 'profile', 'objective', 'career objective', 'professional summary', 'about me',
+    'experience', 'work experience', 'professional experience', 'employment history', 'internships',
+    'education', 'academic details', 'qualifications', 'skills', 'technical skills', 'key skills',
+    'projects', 'academic projects', 'certifications', 'certificates', 'achievements', 'awards',
+    'publications', 'courses', 'trainings', 'contact', 'contact details',
+}
+
+TRUNCATION_MARKER = "\n[... truncated to fit the prompt budget ...]"
+
+
+class PromptBudget:
+    """
+    Keeps prompts of the large-input templates within a per-template token budget.
+
+    Tokens are estimated as characters / 4 (as the llm client does for rate
+    limiting). Every input has its whitespace collapsed. Only if the prompt is
+    over budget are repeated lines (page headers / footers of extracted pdfs)
+    removed, then low value resume sections (references, hobbies, ...) dropped
+    and finally the text cut to what is left of the budget. At least
+    `min_text_share` of the budget is left to the text, however large the rest
+    of the prompt is. Course catalogs are not reduced here, callers pass the
+    `max_courses` nearest courses from the course index.
+    """
+
+    def __init__(self, config=prompt_budget_config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        return len(text or '') // 4
+
+    ## text compaction
+    @staticmethod
+    def compact_text(text: str) -> str:
+        """Collapse runs of spaces and blank lines."""
+        lines = []
+        for line in str(text or '').splitlines():
+            line = re.sub(r'[ \t\u00a0]+', ' ', line).strip()
+            if not line and (not lines or lines[-1] == ''):
+                continue
+            lines.append(line)
+        return "\n".join(lines).strip()
+
+    @staticmethod
+    def drop_repeated_lines(text: str) -> str:
+        """Drop every repetition of a non-empty line, e.g. page headers / footers."""
+        seen = set()
+        lines = []
+        for line in text.splitlines():
+            key = line.lower()
+            if key in seen:
+                continue
+            if key:
+                seen.add(key)
+            lines.append(line)
+        return "\n".join(lines).strip()
+
+    @staticmethod
+    def _heading(line: str) -> str:
+        return line.strip().rstrip(':').strip().lower()
+
+    def drop_low_value_sections(self, text: str) -> str:
+        low_value = set(self.config.low_value_sections)
+        kept = []
+        dropping = False
+        for line in text.splitlines():
+            heading = self._heading(line)
+            if heading in low_value:
+                dropping = True
+                continue
+            if heading in SECTION_HEADINGS:
+                dropping = False
+            if not dropping:
+                kept.append(line)
+        return "\n".join(kept).strip()
+
+    @staticmethod
+    def truncate(text: str, max_tokens: int) -> str:
+        max_chars = max(max_tokens, 0) * 4
+        if len(text) <= max_chars:
+            return text
+        cut = text[:max(max_chars - len(TRUNCATION_MARKER), 0)]
+        # do not end in the middle of a line when avoidable
+        if '\n' in cut[len(cut) // 2:]:
+            cut = cut[:cut.rfind('\n')]
+        return cut + TRUNCATION_MARKER
+
+    def fit_text(self, template: str, text: str, build: Callable[[str], str]) -> str:
+        """
+        Compact `text` so that `build(text)` (the full prompt) fits the template budget.
+
+        Args:
+            template: prompt template name, key of config.template_budgets
+            text: the large input (usually resume text)
+            build: renders the prompt around a given text, used to size the fixed part
+        """
+        if not self.config.enabled or not text:
+            return text
+
+        text = str(text)
+        compacted = self.compact_text(text)
+        budget = self.config.template_budgets.get(template)
+        if budget:
+            fixed = self.estimate_tokens(build(''))
+            available = budget - fixed
+            minimum = int(budget * self.config.min_text_share)
+            if available < minimum:
+                # a long job description must not crowd the candidate out of the prompt
+                print(
+                    f"Prompt budget [{template}]: the prompt around the text takes {fixed} of {budget} tokens, "
+                    f"keeping {minimum} tokens for the text"
+                )
+                available = minimum
+            for step in (self.drop_repeated_lines, self.drop_low_value_sections):
+                if self.estimate_tokens(compacted) <= available:
+                    break
+                compacted = step(compacted)
+            if self.estimate_tokens(compacted) > available:
+                compacted = self.truncate(compacted, available)
+
+        self._record(template, self.estimate_tokens(text), self.estimate_tokens(compacted))
+        return compacted
+
+    ## metrics
+    def _record(self, template: str, before: int, after: int):
+        saved = before - after
+        with self._lock:
+            stats = self._stats.setdefault(template, {"inputs": 0, "tokens_before": 0, "tokens_after": 0, "tokens_saved": 0})
+            stats["inputs"] += 1
+            stats["tokens_before"] += before
+            stats["tokens_after"] += after
+            stats["tokens_saved"] += saved
+        if saved > 0:
+            print(f"Prompt budget [{template}]: {before} -> {after} tokens ({saved} saved)")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.config.enabled,
+                "templates": {template: dict(values) for template, values in self._stats.items()},
+                "tokens_saved": sum(values["tokens_saved"] for values in self._stats.values()),
+            }
+
+
+prompt_budget = PromptBudget()
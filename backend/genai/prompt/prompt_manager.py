@@ -1,10 +1,24 @@
 
 
 
+from .prompt_budget import prompt_budget
+
+
 class PromptManager:
+    # bump whenever get_structure_json_resume changes so persisted parses are rebuilt
+    RESUME_STRUCTURE_PROMPT_VERSION = '2'
+    # bump whenever mock_interview_prompt changes so interview question banks are regenerated
+    MOCK_INTERVIEW_PROMPT_VERSION = '1'
 
     @staticmethod
     def get_structure_json_resume(resume_text):
+        resume_text = prompt_budget.fit_text(
+            'get_structure_json_resume', resume_text, PromptManager._structure_json_resume_prompt
+        )
+        return PromptManager._structure_json_resume_prompt(resume_text)
+
+    @staticmethod
+    def _structure_json_resume_prompt(resume_text):
         prompt = f"""
         You are an expert HR data extraction assistant.
         You will be provided with a resume and a job description.
@@ -120,6 +134,14 @@ class PromptManager:
 
     @staticmethod
     def course_recommendation_prompt(resume_text, job_title, courses):
+        resume_text = prompt_budget.fit_text(
+            'course_recommendation_prompt', resume_text,
+            lambda text: PromptManager._course_recommendation_prompt(text, job_title, courses)
+        )
+        return PromptManager._course_recommendation_prompt(resume_text, job_title, courses)
+
+    @staticmethod
+    def _course_recommendation_prompt(resume_text, job_title, courses):
         prompt = f"""
         You are an expert AI assistant for course recommendation tasks.
         You will be given a candidates resume and a job title and a list of courses with the id, title and duration minutes.
@@ -150,6 +172,14 @@ class PromptManager:
 
     @staticmethod
     def skill_gap_suggest_upskill_prompt(resume_text, job_description, job_title, courses):
+        resume_text = prompt_budget.fit_text(
+            'skill_gap_suggest_upskill_prompt', resume_text,
+            lambda text: PromptManager._skill_gap_suggest_upskill_prompt(text, job_description, job_title, courses)
+        )
+        return PromptManager._skill_gap_suggest_upskill_prompt(resume_text, job_description, job_title, courses)
+
+    @staticmethod
+    def _skill_gap_suggest_upskill_prompt(resume_text, job_description, job_title, courses):
         prompt = f"""
         You are an expert carrer coach.
         Your Job is to compare the candidate and target Job and suggest ways to upskill the candidate to match the job.
@@ -231,6 +261,23 @@ class PromptManager:
 
     @staticmethod
     def resume_shortlisting_prompt(resume_text, job_title, job_description, job_requirements):
+        # resume_text is either plain text or a similarity search hit (id / text / metadata / distance)
+        if isinstance(resume_text, dict):
+            resume = resume_text
+            text = prompt_budget.fit_text(
+                'resume_shortlisting_prompt', resume.get('text'),
+                lambda text: PromptManager._resume_shortlisting_prompt({**resume, 'text': text}, job_title, job_description, job_requirements)
+            )
+            resume_text = {**resume, 'text': text}
+        else:
+            resume_text = prompt_budget.fit_text(
+                'resume_shortlisting_prompt', resume_text,
+                lambda text: PromptManager._resume_shortlisting_prompt(text, job_title, job_description, job_requirements)
+            )
+        return PromptManager._resume_shortlisting_prompt(resume_text, job_title, job_description, job_requirements)
+
+    @staticmethod
+    def _resume_shortlisting_prompt(resume_text, job_title, job_description, job_requirements):
         prompt = f"""
         You are an expert AI assistant for resume shortlisting tasks.
         You will be given a collection of resumes with the id, text and metadata that is return from embeddings and similarity search.
@@ -264,9 +311,40 @@ class PromptManager:
 
         
     """
-        
+
         return prompt
-    
+
+    @staticmethod
+    def score_candidate_prompt(job_description, resume_text):
+        prompt = f"""
+        You are an expert HR recruiter. Score this candidate against the job requirements.
+        Provide a detailed analysis and score from 0-100.
+
+        Respond only in valid JSON format:
+        {{
+            "overall_score": 85,
+            "category_scores": {{
+                "skills_match": 90,
+                "experience_match": 80,
+                "education_match": 85,
+                "location_match": 95
+            }},
+            "strengths": ["Strong technical skills", "Relevant experience"],
+            "weaknesses": ["Limited leadership experience"],
+            "recommendation": "strong_fit",
+            "summary": "Excellent candidate with strong technical background"
+        }}
+
+        Job Details:
+        {job_description}
+
+        Candidate Resume:
+        {resume_text}
+
+        Score this candidate comprehensively considering skills, experience, education, and overall fit.
+        """
+        return prompt
+
     @staticmethod
     def job_description_generation_prompt(job_title, level, location):
         prompt = f"""
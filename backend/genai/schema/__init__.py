@@ -1,6 +1,7 @@
 from .schema_manager import (
-    rag_engine, PerformanceReviewRequest, PerformanceReviewResponse,
+    rag_engine, llm_cache, prompt_budget_config, chatbot_cache, vector_index, llm_client_config, llm_provider_config, llm_router_config, llm_dispatcher_config, local_llm_config, resume_processing, question_bank, PerformanceReviewRequest, PerformanceReviewResponse,
     ErrorResponse, ChatbotRequest,
     JobDescriptionRequest, JobDescriptionResponse, UpskillingPathRequest, UpskillingPathResponse,
-    InterviewQuestionsQuery, InterviewQuestionsResponse, ProfileEnhancementRequest, ProfileEnhancementResponse
+    InterviewQuestionsQuery, InterviewQuestionsResponse, ProfileEnhancementRequest, ProfileEnhancementResponse,
+    StructuredResume, InterviewQuestionSet
     )
\ No newline at end of file
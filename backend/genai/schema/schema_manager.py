@@ -1,7 +1,7 @@
 import os
 from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, RootModel, validator
 from typing import Optional, List
 from datetime import datetime
 
@@ -17,8 +17,257 @@ class RAGEngine:
     chunk_overlap: int = 50
     glob: str = '**/*'
     separators: str = " "
+    # warm per-school retrievers kept in memory (LRU by school)
+    max_cached_retrievers: int = int(os.environ.get('RAG_MAX_CACHED_RETRIEVERS', 32))
 
 
+@dataclass
+class LLMCacheConfig:
+    enabled: bool = os.environ.get('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+    # the sqlite tier; test runs keep their answers in memory
+    disk_enabled: bool = os.environ.get(
+        'LLM_CACHE_DISK_ENABLED', 'false' if os.environ.get('FLASK_ENV') == 'testing' else 'true'
+    ).lower() == 'true'
+    db_path: str = os.environ.get('LLM_CACHE_DB_PATH', os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..', '..', 'instance', 'llm_cache.db')
+    ))
+    memory_max_entries: int = int(os.environ.get('LLM_CACHE_MEMORY_MAX_ENTRIES', 512))
+    default_ttl: int = 60 * 60
+    # seconds; 0 disables caching for that template
+    template_ttls: Dict[str, int] = field(default_factory=lambda: {
+        'get_structure_json_resume': 7 * 24 * 60 * 60,
+        'resume_shortlisting_prompt': 60 * 60,
+        'score_candidate_prompt': 60 * 60,
+        'mock_interview_prompt': 24 * 60 * 60,
+        'course_recommendation_prompt': 24 * 60 * 60,
+        'skill_gap_suggest_upskill_prompt': 24 * 60 * 60,
+        'tailor_resume_prompt': 24 * 60 * 60,
+        # a new review is asked for to get a different wording, never serve the previous one
+        'performance_review_prompt': 0,
+        'expense_verification': 60 * 60,
+        'expense_policy_compliance': 60 * 60,
+        'expense_categorization': 24 * 60 * 60,
+        'expense_duplicate_detection': 10 * 60,
+        'expense_summary': 60 * 60,
+        'expense_optimization': 60 * 60,
+    })
+
+    def ttl_for(self, template: Optional[str]) -> int:
+        if template is None:
+            return self.default_ttl
+        return self.template_ttls.get(template, self.default_ttl)
+
+
+@dataclass
+class PromptBudgetConfig:
+    enabled: bool = os.environ.get('PROMPT_BUDGET_ENABLED', 'true').lower() == 'true'
+    # estimated tokens (~4 chars each) a whole prompt of that template may use
+    template_budgets: Dict[str, int] = field(default_factory=lambda: {
+        'get_structure_json_resume': 3000,
+        'resume_shortlisting_prompt': 2500,
+        'course_recommendation_prompt': 2500,
+        'skill_gap_suggest_upskill_prompt': 3000,
+    })
+    # share of a template budget always left to the resume, however long the job description
+    min_text_share: float = float(os.environ.get('PROMPT_MIN_TEXT_SHARE', 0.4))
+    # courses sent to the LLM, preselected by embedding similarity to resume + job
+    max_courses: int = int(os.environ.get('PROMPT_MAX_COURSES', 15))
+    # seconds between queued full (content hash) checks of the course collection against the table
+    course_reconcile_seconds: int = int(os.environ.get('COURSE_RECONCILE_SECONDS', 300))
+    # resume sections dropped first when a resume does not fit
+    low_value_sections: List[str] = field(default_factory=lambda: [
+        'references', 'hobbies', 'interests', 'declaration', 'personal details', 'personal information',
+        'languages known', 'extracurricular', 'activities',
+    ])
+
+
+@dataclass
+class ChatbotCacheConfig:
+    # semantic answer cache of the policy chatbot, one chroma collection per school
+    enabled: bool = os.environ.get('CHATBOT_CACHE_ENABLED', 'true').lower() == 'true'
+    # cosine similarity to a previous question above which its answer is reused
+    similarity_threshold: float = float(os.environ.get('CHATBOT_CACHE_SIMILARITY', 0.92))
+    ttl: int = int(os.environ.get('CHATBOT_CACHE_TTL', 7 * 24 * 60 * 60))
+    collection_prefix: str = 'chatbot_answers_'
+
+
+@dataclass
+class LLMClientConfig:
+    # per provider quota; requests and (estimated) tokens per minute
+    provider_limits: Dict[str, Dict[str, int]] = field(default_factory=lambda: {
+        'gemini': {
+            'requests_per_minute': int(os.environ.get('GEMINI_REQUESTS_PER_MINUTE', 60)),
+            'tokens_per_minute': int(os.environ.get('GEMINI_TOKENS_PER_MINUTE', 1000000)),
+        },
+        'chatgpt': {
+            'requests_per_minute': int(os.environ.get('OPENAI_REQUESTS_PER_MINUTE', 60)),
+            'tokens_per_minute': int(os.environ.get('OPENAI_TOKENS_PER_MINUTE', 200000)),
+        },
+        'local': {
+            'requests_per_minute': int(os.environ.get('LOCAL_LLM_REQUESTS_PER_MINUTE', 600)),
+            'tokens_per_minute': int(os.environ.get('LOCAL_LLM_TOKENS_PER_MINUTE', 2000000)),
+        },
+    })
+    default_limits: Dict[str, int] = field(default_factory=lambda: {'requests_per_minute': 60, 'tokens_per_minute': 200000})
+    max_retries: int = int(os.environ.get('LLM_MAX_RETRIES', 4))
+    base_backoff: float = 1.0
+    max_backoff: float = 30.0
+    # seconds a single generate() may take including queueing and retries
+    default_deadline: float = float(os.environ.get('LLM_DEFAULT_DEADLINE', 90))
+    # output tokens assumed when the call does not set max_tokens
+    default_output_tokens: int = 512
+    # circuit breaker per provider, over the attempts of the last `breaker_window` seconds
+    breaker_enabled: bool = os.environ.get('LLM_BREAKER_ENABLED', 'true').lower() == 'true'
+    breaker_window: float = float(os.environ.get('LLM_BREAKER_WINDOW', 60))
+    breaker_min_calls: int = int(os.environ.get('LLM_BREAKER_MIN_CALLS', 10))
+    breaker_error_rate: float = float(os.environ.get('LLM_BREAKER_ERROR_RATE', 0.5))
+    # attempts slower than this count as slow; open when `breaker_slow_rate` of them are
+    breaker_slow_call_seconds: float = float(os.environ.get('LLM_BREAKER_SLOW_CALL_SECONDS', 20))
+    breaker_slow_rate: float = float(os.environ.get('LLM_BREAKER_SLOW_RATE', 0.8))
+    # seconds an open breaker rejects calls before letting a probe through
+    breaker_open_seconds: float = float(os.environ.get('LLM_BREAKER_OPEN_SECONDS', 30))
+
+    def limits_for(self, provider_name: str) -> Dict[str, int]:
+        return self.provider_limits.get(provider_name, self.default_limits)
+
+
+@dataclass
+class LLMDispatcherConfig:
+    # priority classes of LLM work, admitted to a provider in proportion to their weights
+    enabled: bool = os.environ.get('LLM_DISPATCHER_ENABLED', 'true').lower() == 'true'
+    weights: Dict[str, int] = field(default_factory=lambda: {
+        'interactive': int(os.environ.get('LLM_WEIGHT_INTERACTIVE', 8)),
+        'normal': int(os.environ.get('LLM_WEIGHT_NORMAL', 3)),
+        'batch': int(os.environ.get('LLM_WEIGHT_BATCH', 1)),
+    })
+    default_priority: str = 'normal'
+    # concurrent calls per provider across all classes
+    max_in_flight: int = int(os.environ.get('LLM_MAX_IN_FLIGHT', 8))
+    # batch work is held back while interactive calls wait, or their p95 queue wait
+    # over the last `wait_window` seconds is above the target
+    interactive_wait_target: float = float(os.environ.get('LLM_INTERACTIVE_WAIT_TARGET', 2))
+    wait_window: float = 60.0
+    # share of the provider slots batch work may hold at most
+    batch_max_share: float = float(os.environ.get('LLM_BATCH_MAX_SHARE', 0.5))
+
+
+@dataclass
+class LLMProviderConfig:
+    # model variants selectable by name; variants of one provider share its client and rate limit
+    model_variants: Dict[str, Dict[str, str]] = field(default_factory=lambda: {
+        'gemini': {'provider': 'gemini', 'model': os.environ.get('GEMINI_MODEL', 'gemini-2.0-flash')},
+        'gemini-flash': {'provider': 'gemini', 'model': os.environ.get('GEMINI_FLASH_MODEL', 'gemini-2.0-flash')},
+        'gemini-pro': {'provider': 'gemini', 'model': os.environ.get('GEMINI_PRO_MODEL', 'gemini-2.5-pro')},
+        # policy chatbot, interactive answers streamed to the user
+        'gemini-chat': {'provider': 'gemini', 'model': os.environ.get('GEMINI_CHAT_MODEL', 'gemini-2.5-flash')},
+        'chatgpt': {'provider': 'chatgpt', 'model': os.environ.get('OPENAI_MODEL', 'gpt-4o-mini')},
+        'chatgpt-quality': {'provider': 'chatgpt', 'model': os.environ.get('OPENAI_QUALITY_MODEL', 'gpt-4o')},
+        'local': {'provider': 'local', 'model': 'local-canned'},
+    })
+    # pooled keep-alive http connections of the process wide provider clients
+    max_connections: int = int(os.environ.get('LLM_HTTP_MAX_CONNECTIONS', 20))
+    max_keepalive_connections: int = int(os.environ.get('LLM_HTTP_MAX_KEEPALIVE', 10))
+    keepalive_expiry: float = float(os.environ.get('LLM_HTTP_KEEPALIVE_EXPIRY', 60))
+    connect_timeout: float = 10.0
+    # serve every variant from this provider instead, e.g. 'local' for offline load tests
+    provider_override: str = os.environ.get('LLM_PROVIDER_OVERRIDE', '')
+
+
+@dataclass
+class LLMRouterConfig:
+    # provider failover: variant used when a provider fails or its breaker is open
+    failover_enabled: bool = os.environ.get('LLM_FAILOVER_ENABLED', 'true').lower() == 'true'
+    failover: Dict[str, List[str]] = field(default_factory=lambda: {
+        'gemini': ['chatgpt'],
+        'chatgpt': ['gemini'],
+    })
+    # seconds the first provider may take (queueing and retries) while a fallback is waiting,
+    # only for calls without their own timeout
+    failover_timeout: float = float(os.environ.get('LLM_FAILOVER_TIMEOUT', 20))
+    # output tokens a fallback may generate per template, callers rarely pass a limit and
+    # provider defaults (chatgpt: 500) truncate structured answers
+    fallback_max_tokens: Dict[str, int] = field(default_factory=lambda: {
+        'get_structure_json_resume': 4096,
+        'mock_interview_prompt': 8192,
+        'course_recommendation_prompt': 4096,
+        'skill_gap_suggest_upskill_prompt': 4096,
+        'tailor_resume_prompt': 4096,
+    })
+    default_fallback_max_tokens: int = int(os.environ.get('LLM_FALLBACK_MAX_TOKENS', 2048))
+    # hedging: fire the fallback too when the first provider is slower than its p95
+    hedging_enabled: bool = os.environ.get('LLM_HEDGING_ENABLED', 'false').lower() == 'true'
+    hedge_percentile: float = 0.95
+    hedge_min_samples: int = 20
+    hedge_min_delay: float = float(os.environ.get('LLM_HEDGE_MIN_DELAY', 2))
+    hedge_max_delay: float = float(os.environ.get('LLM_HEDGE_MAX_DELAY', 15))
+    hedge_workers: int = int(os.environ.get('LLM_HEDGE_WORKERS', 32))
+
+    def max_tokens_for(self, template: Optional[str]) -> int:
+        return self.fallback_max_tokens.get(template, self.default_fallback_max_tokens)
+
+
+@dataclass
+class LocalLLMConfig:
+    # offline stand-in provider: canned JSON per PromptManager template after a simulated latency
+    latency_distribution: str = os.environ.get('LOCAL_LLM_LATENCY_DISTRIBUTION', 'lognormal')  # fixed | uniform | normal | lognormal
+    latency_mean: float = float(os.environ.get('LOCAL_LLM_LATENCY_MEAN', 0.8))
+    latency_stddev: float = float(os.environ.get('LOCAL_LLM_LATENCY_STDDEV', 0.3))
+    # mean latency of the slower templates, seconds
+    template_latency_mean: Dict[str, float] = field(default_factory=lambda: {
+        'get_structure_json_resume': 2.0,
+        'resume_shortlisting_prompt': 1.5,
+        'score_candidate_prompt': 1.2,
+        'skill_gap_suggest_upskill_prompt': 1.5,
+    })
+    # share of calls answered with an injected 429, and the Retry-After it carries
+    rate_limit_rate: float = float(os.environ.get('LOCAL_LLM_429_RATE', 0.0))
+    retry_after: float = float(os.environ.get('LOCAL_LLM_RETRY_AFTER', 1.0))
+    seed: int = int(os.environ.get('LOCAL_LLM_SEED', 0))
+    # characters per chunk when streaming
+    stream_chunk_chars: int = 40
+
+
+@dataclass
+class ResumeProcessingConfig:
+    # resumes structured by the LLM in parallel per request (still under the llm client rate limit)
+    parse_workers: int = int(os.environ.get('RESUME_PARSE_WORKERS', 8))
+    # seconds a scoring request may spend parsing; resumes not done by then are skipped
+    match_time_budget: float = float(os.environ.get('RESUME_MATCH_TIME_BUDGET', 120))
+    # candidates scored in parallel by a bulk-score job
+    score_workers: int = int(os.environ.get('RESUME_SCORE_WORKERS', 8))
+    # Application.score updates written per commit while a bulk-score job runs
+    score_commit_batch: int = int(os.environ.get('RESUME_SCORE_COMMIT_BATCH', 25))
+    # uploads queue the extract / structure / embed / index pipeline in the background
+    pipeline_on_upload: bool = os.environ.get('RESUME_PIPELINE_ON_UPLOAD', 'true').lower() == 'true'
+    pipeline_model: str = os.environ.get('RESUME_PIPELINE_MODEL', 'gemini')
+    # seconds the structuring llm call of one pipeline run may take
+    pipeline_llm_timeout: float = float(os.environ.get('RESUME_PIPELINE_LLM_TIMEOUT', 120))
+
+
+@dataclass
+class QuestionBankConfig:
+    # questions per difficulty served to each candidate
+    interview_mix: Dict[str, int] = field(default_factory=lambda: {'easy': 3, 'medium': 3, 'hard': 10})
+    test_mix: Dict[str, int] = field(default_factory=lambda: {'easy': 3, 'medium': 3, 'hard': 4})
+    # the bank holds this many generated questions per requested one, candidates get a random sample
+    pool_multiplier: float = float(os.environ.get('QUESTION_BANK_POOL_MULTIPLIER', 2))
+    max_pool_per_level: int = int(os.environ.get('QUESTION_BANK_MAX_POOL_PER_LEVEL', 20))
+
+
+@dataclass
+class VectorIndexConfig:
+    # one shared model for the raw chroma and langchain Chroma paths
+    embedding_model_name: str = os.environ.get('EMBEDDING_MODEL_NAME', 'sentence-transformers/all-MiniLM-L6-v2')
+    # 'hashing' swaps the model for a deterministic offline stand-in (load tests, no model download)
+    embedding_backend: str = os.environ.get('EMBEDDING_BACKEND', 'sentence-transformers')
+    hashing_dimensions: int = int(os.environ.get('HASHING_EMBEDDING_DIMENSIONS', 384))
+    # texts per SentenceTransformer.encode call
+    embed_batch_size: int = int(os.environ.get('VECTOR_EMBED_BATCH_SIZE', 64))
+    # encode batches in parallel; torch already uses several cores per batch so keep this small
+    embed_threads: int = int(os.environ.get('VECTOR_EMBED_THREADS', max(1, min(4, (os.cpu_count() or 2) // 2))))
+    # docs per chroma add / upsert call
+    upsert_batch_size: int = int(os.environ.get('VECTOR_UPSERT_BATCH_SIZE', 1000))
+
 
 # data validation class
 class PerformanceReviewRequest(BaseModel):
@@ -126,4 +375,52 @@ class ErrorResponse(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 
-rag_engine=RAGEngine()
\ No newline at end of file
+# LLM output models, validated by the streaming JSON extractor; lenient since the LLM fills them
+class ResumeWorkExperience(BaseModel):
+    model_config = ConfigDict(extra='allow')
+    title: Optional[str] = ''
+    company: Optional[str] = ''
+    position: Optional[str] = ''
+    start_date: Optional[str] = ''
+    end_date: Optional[str] = ''
+    description: Optional[str] = ''
+
+class ResumeEducation(BaseModel):
+    model_config = ConfigDict(extra='allow')
+    degree: Optional[str] = ''
+    institute: Optional[str] = ''
+    field_of_study: Optional[str] = ''
+    start_date: Optional[str] = ''
+    end_date: Optional[str] = ''
+
+class StructuredResume(BaseModel):
+    model_config = ConfigDict(extra='allow', coerce_numbers_to_str=True)
+    location: Optional[str] = ''
+    skills: List[Any] = []
+    total_experience: Optional[str] = ''
+    work_experience: List[ResumeWorkExperience] = []
+    education: List[ResumeEducation] = []
+    certifications: List[Any] = []
+    projects: List[Any] = []
+    interests: List[Any] = []
+
+class InterviewQuestion(BaseModel):
+    model_config = ConfigDict(extra='allow')
+    question: str
+
+class InterviewQuestionSet(RootModel[Dict[str, List[InterviewQuestion]]]):
+    pass
+
+
+rag_engine=RAGEngine()
+llm_cache=LLMCacheConfig()
+prompt_budget_config=PromptBudgetConfig()
+chatbot_cache=ChatbotCacheConfig()
+vector_index=VectorIndexConfig()
+llm_client_config=LLMClientConfig()
+llm_provider_config=LLMProviderConfig()
+llm_router_config=LLMRouterConfig()
+llm_dispatcher_config=LLMDispatcherConfig()
+local_llm_config=LocalLLMConfig()
+resume_processing=ResumeProcessingConfig()
+question_bank=QuestionBankConfig()
\ No newline at end of file
@@ -1,4 +1,8 @@
-from .resume_service import JobService, ResumeService, ResumeMatch, ParseResume
+from .resume_service import JobService, ResumeService, ResumeMatch, ParseResume, ResumeIndexService
 from .ai_review_service import AIPerformanceReview
-from .chatbot_service import ChatbotService
-from .recommendation_service import RecommendationService, InterviewService, ProfileEnhancementService, JobDescriptionService, UpskillingPathService
+from .chatbot_service import ChatbotService, chatbot_service
+from .recommendation_service import RecommendationService, InterviewService, ProfileEnhancementService, JobDescriptionService, UpskillingPathService, CourseRetrievalService, course_retrieval_service
+from .policy_ingestion_service import PolicyIngestionService, policy_ingestion_service
+from .screening_service import CandidateScoringService
+from .question_bank_service import QuestionBankService, question_bank_service
+from .resume_pipeline_service import ResumePipelineService, resume_pipeline_service
@@ -16,14 +16,14 @@ class AIPerformanceReview:
         prompt=PromptManager.performance_review_prompt(employee_review, manager_view)
 
         # Load Model
-        model=LLMModelFactory.get_model_provider(self.model_name).get_model()
+        model=LLMModelFactory.get_model_provider(self.model_name)
         try:
-            response=model.generate_content(prompt)
-            if not response or not response.text:
+            response_text=model.generate(prompt, template='performance_review_prompt')
+            if not response_text:
                 raise ValueError("No response from LLM")
         except Exception as e:
             raise RuntimeError(f"Failed to generate performance review: {e}")
         
-        output = TextUtility.remove_json_marker(response.text)
+        output = TextUtility.remove_json_marker(response_text)
         return output
         
\ No newline at end of file
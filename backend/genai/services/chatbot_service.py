@@ -8,31 +8,58 @@ from pathlib import Path
 
 
 from database.vector_db import chroma_db_service
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough, RunnableParallel
-from langchain_core.output_parsers import StrOutputParser
-import google.generativeai as genai
+from ..cache import semantic_answer_cache
+from ..llm_client import llm_client, llm_priority
 from dotenv import load_dotenv
-from config import Config
 
 load_dotenv()
 
 class ChatbotService:
 
-    def __init__(self, model_name: str = 'gemini'):
+    def __init__(self, model_name: str = 'gemini-chat'):
         self.model_name = model_name
-        # Configure Gemini
-        genai.configure(api_key=Config.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel("gemini-2.5-flash")
+        # policy documents are loaded by PolicyIngestionService (admin endpoint / `flask ingest-policies`)
+
+    # built (and the provider sdk configured) by the factory on the first question
+    @property
+    def provider(self):
+        return LLMModelFactory.get_model_provider(self.model_name)
+
+    @property
+    def provider_name(self) -> str:
+        return self.provider.provider_name
+
+    def generate(self, prompt: str) -> str:
+        # the chatbot is interactive, it is admitted before queued batch work
+        with llm_priority('interactive'):
+            return self.provider.generate(prompt, template='chatbot')
+
+    def retrieve(self, school_id: str, question: str):
+        """Relevant policy chunks for the question from the school's warm retriever"""
+        retriever = chroma_db_service.get_retrieval_for_school(school_id=school_id)
+        return retriever.invoke(question)
+
+    @staticmethod
+    def build_prompt(relevant_docs, question: str) -> str:
+        # Combine retrieved documents into context
+        context = "\n\n".join([doc.page_content for doc in relevant_docs])
         
-        # Add school policy document to vector store
-        try:
-            self.add_doc_embedding = chroma_db_service.add_school_policy(
-                path='./uploads/documents\knowledge_doc.pdf', 
-                school_id=1
-            )
-        except Exception as e:
-            print(f"Warning: Could not load policy document: {e}")
+        # Create the prompt
+        system_instruction = (
+            "You are a helpful HR assistant that answers questions about company policies, "
+            "leave requests, benefits, and general HR questions. "
+            "Use only the provided context. If you don't know the answer, just say that you don't know. "
+            "Don't try to make up an answer. Your tone should be professional and concise."
+        )
+        
+        return f"""System: {system_instruction}
+
+Context:
+{context}
+
+User Question: {question}
+
+Assistant Answer:"""
 
     def chat(self, school_id: str, question: str):
         """
@@ -45,35 +72,23 @@ class ChatbotService:
         Returns:
             str: AI-generated answer based on context
         """
+        # paraphrases of an already answered question are served from the semantic cache
+        cached, question_embedding = semantic_answer_cache.lookup(school_id, question)
+        if cached is not None:
+            return cached['answer']
+
         try:
             # Get relevant context from vector database
-            retriever = chroma_db_service.get_retrieval_for_school(school_id=1)
-            relevant_docs = retriever.invoke(question)
-            
-            # Combine retrieved documents into context
-            context = "\n\n".join([doc.page_content for doc in relevant_docs])
-            
-            # Create the prompt
-            system_instruction = (
-                "You are a helpful HR assistant that answers questions about company policies, "
-                "leave requests, benefits, and general HR questions. "
-                "Use only the provided context. If you don't know the answer, just say that you don't know. "
-                "Don't try to make up an answer. Your tone should be professional and concise."
-            )
-            
-            prompt = f"""System: {system_instruction}
-
-Context:
-{context}
-
-User Question: {question}
-
-Assistant Answer:"""
+            relevant_docs = self.retrieve(school_id, question)
+            prompt = self.build_prompt(relevant_docs, question)
             
             # Generate response using Gemini
-            response = self.model.generate_content(prompt)
+            answer = self.generate(prompt)
             
-            return response.text
+            # only answers grounded in retrieved policy text are worth reusing
+            if relevant_docs:
+                semantic_answer_cache.store(school_id, question, answer, self.sources(relevant_docs), question_embedding)
+            return answer
             
         except Exception as e:
             print(f"Error in chatbot: {str(e)}")
@@ -85,9 +100,62 @@ User Question: {question}
 
 Please provide a helpful answer:"""
                 
-                response = self.model.generate_content(fallback_prompt)
-                return response.text
+                return self.generate(fallback_prompt)
             except Exception as fallback_error:
                 return "I apologize, but I'm having trouble processing your request. Please try again or contact HR directly."
 
-        
\ No newline at end of file
+    @staticmethod
+    def sources(relevant_docs):
+        return [
+            {
+                'document_id': doc.metadata.get('document_id'),
+                'source': doc.metadata.get('source'),
+                'preview': doc.page_content[:200]
+            }
+            for doc in relevant_docs
+        ]
+
+    def stream_chat(self, school_id: str, question: str):
+        """
+        Same as chat() but yields events as soon as they are available:
+        the retrieved sources first, then answer text chunks from Gemini's
+        streaming API (through the shared llm client), then a final done (or error) event. A semantic cache
+        hit is sent as a single token event.
+
+        Yields:
+            tuple: (event name, payload dict)
+        """
+        cached, question_embedding = semantic_answer_cache.lookup(school_id, question)
+        if cached is not None:
+            yield 'context', {'school_id': school_id, 'sources': cached['sources'], 'cached': True}
+            yield 'token', {'text': cached['answer']}
+            yield 'done', {'answer': cached['answer'], 'cached': True}
+            return
+
+        try:
+            relevant_docs = self.retrieve(school_id, question)
+        except Exception as e:
+            print(f"Error in chatbot retrieval: {str(e)}")
+            relevant_docs = []
+
+        sources = self.sources(relevant_docs)
+        yield 'context', {'school_id': school_id, 'sources': sources}
+
+        try:
+            answer = []
+            # rate limited and admitted like any other call, the slot is freed after the first chunk
+            for text in llm_client.stream(self.provider, self.build_prompt(relevant_docs, question), priority='interactive'):
+                answer.append(text)
+                yield 'token', {'text': text}
+            answer = ''.join(answer)
+            # only answers grounded in retrieved policy text are worth reusing
+            if relevant_docs:
+                semantic_answer_cache.store(school_id, question, answer, sources, question_embedding)
+            yield 'done', {'answer': answer}
+        except Exception as e:
+            print(f"Error in chatbot stream: {str(e)}")
+            yield 'error', {'error': "I apologize, but I'm having trouble processing your request. Please try again or contact HR directly."}
+
+
+# long lived, shared by every chatbot request
+chatbot_service = ChatbotService()
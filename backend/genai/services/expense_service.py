@@ -1,6 +1,6 @@
 from ..prompt import PromptManager
 from ..llm_factory import LLMModelFactory
-from ...utils import TextUtility
+from utils import TextUtility
 import json
 
 
@@ -51,15 +51,10 @@ class ExpenseService:
         """
         
         try:
-            if self.model_name == "gemini":
-                model = LLMModelFactory.get_model_provider('gemini').get_model()
-                response = model.generate_content(prompt)
-                result = response.text
-            elif self.model_name == "chatgpt":
-                model = LLMModelFactory.get_model_provider('chatgpt').get_model()
-                result = model.generate_content(prompt)
-            else:
+            if self.model_name not in ("gemini", "chatgpt"):
                 raise ValueError(f"Unsupported model: {self.model_name}")
+            model = LLMModelFactory.get_model_provider(self.model_name)
+            result = model.generate(prompt, template='expense_verification')
             
             # Clean and parse JSON response
             result = TextUtility.remove_json_marker(result)
@@ -112,15 +107,10 @@ class ExpenseService:
         """
         
         try:
-            if self.model_name == "gemini":
-                model = LLMModelFactory.get_model_provider('gemini').get_model()
-                response = model.generate_content(prompt)
-                result = response.text
-            elif self.model_name == "chatgpt":
-                model = LLMModelFactory.get_model_provider('chatgpt').get_model()
-                result = model.generate_content(prompt)
-            else:
+            if self.model_name not in ("gemini", "chatgpt"):
                 raise ValueError(f"Unsupported model: {self.model_name}")
+            model = LLMModelFactory.get_model_provider(self.model_name)
+            result = model.generate(prompt, template='expense_policy_compliance')
             
             result = TextUtility.remove_json_marker(result)
             return result
@@ -168,15 +158,10 @@ class ExpenseService:
         """
         
         try:
-            if self.model_name == "gemini":
-                model = LLMModelFactory.get_model_provider('gemini').get_model()
-                response = model.generate_content(prompt)
-                result = response.text
-            elif self.model_name == "chatgpt":
-                model = LLMModelFactory.get_model_provider('chatgpt').get_model()
-                result = model.generate_content(prompt)
-            else:
+            if self.model_name not in ("gemini", "chatgpt"):
                 raise ValueError(f"Unsupported model: {self.model_name}")
+            model = LLMModelFactory.get_model_provider(self.model_name)
+            result = model.generate(prompt, template='expense_categorization')
             
             result = TextUtility.remove_json_marker(result)
             return result
@@ -232,15 +217,10 @@ class ExpenseService:
         """
         
         try:
-            if self.model_name == "gemini":
-                model = LLMModelFactory.get_model_provider('gemini').get_model()
-                response = model.generate_content(prompt)
-                result = response.text
-            elif self.model_name == "chatgpt":
-                model = LLMModelFactory.get_model_provider('chatgpt').get_model()
-                result = model.generate_content(prompt)
-            else:
+            if self.model_name not in ("gemini", "chatgpt"):
                 raise ValueError(f"Unsupported model: {self.model_name}")
+            model = LLMModelFactory.get_model_provider(self.model_name)
+            result = model.generate(prompt, template='expense_duplicate_detection')
             
             result = TextUtility.remove_json_marker(result)
             return result
@@ -291,15 +271,10 @@ class ExpenseService:
         """
         
         try:
-            if self.model_name == "gemini":
-                model = LLMModelFactory.get_model_provider('gemini').get_model()
-                response = model.generate_content(prompt)
-                result = response.text
-            elif self.model_name == "chatgpt":
-                model = LLMModelFactory.get_model_provider('chatgpt').get_model()
-                result = model.generate_content(prompt)
-            else:
+            if self.model_name not in ("gemini", "chatgpt"):
                 raise ValueError(f"Unsupported model: {self.model_name}")
+            model = LLMModelFactory.get_model_provider(self.model_name)
+            result = model.generate(prompt, template='expense_summary')
             
             result = TextUtility.remove_json_marker(result)
             return result
@@ -351,15 +326,10 @@ class ExpenseService:
         """
         
         try:
-            if self.model_name == "gemini":
-                model = LLMModelFactory.get_model_provider('gemini').get_model()
-                response = model.generate_content(prompt)
-                result = response.text
-            elif self.model_name == "chatgpt":
-                model = LLMModelFactory.get_model_provider('chatgpt').get_model()
-                result = model.generate_content(prompt)
-            else:
+            if self.model_name not in ("gemini", "chatgpt"):
                 raise ValueError(f"Unsupported model: {self.model_name}")
+            model = LLMModelFactory.get_model_provider(self.model_name)
+            result = model.generate(prompt, template='expense_optimization')
             
             result = TextUtility.remove_json_marker(result)
             return result
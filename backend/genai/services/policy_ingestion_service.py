@@ -0,0 +1,170 @@
+import os
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, List
+
+from models import PolicyDocument, db
+from database.vector_db import chroma_db_service
+from utils import TextUtility
+from ..schema import rag_engine
+from ..cache import semantic_answer_cache
+
+
+class PolicyIngestionService:
+    """
+    Loads school policy documents into the chatbot's per-school Chroma collection.
+
+    Every document is tracked in the `policy_documents` registry with the hash of
+    the ingested file, so an unchanged file is never re-read or re-embedded. When a
+    file changes only chunks whose text is new are embedded; chunks that disappeared
+    from the document are deleted. Chunk ids are `<document id>:<chunk hash>`.
+    """
+
+    supported_extensions = ('.pdf', '.docx', '.txt')
+
+    ## text extraction / chunking
+    @staticmethod
+    def extract_text(path: str) -> str:
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.pdf':
+            return TextUtility.extract_text_from_pdf(path)
+        if ext == '.docx':
+            return TextUtility.extract_text_from_docx(path)
+        if ext == '.txt':
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                return f.read()
+        raise ValueError(f"Unsupported policy document type: {ext}")
+
+    @staticmethod
+    def split_text(text: str) -> List[str]:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=rag_engine.chunk_size,
+            chunk_overlap=rag_engine.chunk_overlap,
+            separators=rag_engine.separators,
+            length_function=len
+        )
+        return [chunk for chunk in splitter.split_text(text) if chunk.strip()]
+
+    @staticmethod
+    def chunk_id(document_id: str, chunk: str) -> str:
+        return f"{document_id}:{hashlib.sha256(chunk.encode('utf-8')).hexdigest()[:32]}"
+
+    @staticmethod
+    def corpus_changed(school_id):
+        """Drop everything derived from the school's old chunks: warm retriever and cached answers."""
+        chroma_db_service.invalidate_school_retriever(school_id)
+        semantic_answer_cache.invalidate(school_id)
+
+    ## registry
+    @staticmethod
+    def list_documents(school_id) -> List[PolicyDocument]:
+        return PolicyDocument.query.filter_by(school_id=str(school_id)).order_by(PolicyDocument.created_at).all()
+
+    def ingest(self, school_id, path: str, force: bool = False) -> Dict[str, Any]:
+        """
+        Ingest (or refresh) one policy document for a school.
+
+        Args:
+            school_id: school the policy belongs to, selects the `school_<id>` collection
+            path: file on disk (.pdf, .docx, .txt)
+            force: re-chunk even if the file hash did not change
+        Returns:
+            dict with status (ingested / skipped / failed), document_id, added, removed, chunk_count
+        """
+        school_id = str(school_id)
+        source_path = os.path.normpath(path)
+        content_hash = TextUtility.file_content_hash(source_path)
+        if content_hash is None:
+            raise FileNotFoundError(f"Policy document not found: {source_path}")
+
+        document = PolicyDocument.query.filter_by(school_id=school_id, source_path=source_path).first()
+        if document is None:
+            document = PolicyDocument(school_id=school_id, source_path=source_path, filename=os.path.basename(source_path))
+            db.session.add(document)
+            db.session.flush()
+        elif not force and document.status == 'ingested' and document.content_hash == content_hash:
+            return {"status": "skipped", "document_id": document.id, "added": 0, "removed": 0, "chunk_count": document.chunk_count}
+
+        try:
+            chunks = self.split_text(self.extract_text(source_path))
+            wanted = {self.chunk_id(document.id, chunk): chunk for chunk in chunks}
+
+            store = chroma_db_service.get_policy_store(school_id)
+            existing = set(store.get(where={"document_id": document.id}, include=[])["ids"])
+            added = [chunk_id for chunk_id in wanted if chunk_id not in existing]
+            removed = [chunk_id for chunk_id in existing if chunk_id not in wanted]
+
+            if added:
+                store.add_texts(
+                    texts=[wanted[chunk_id] for chunk_id in added],
+                    metadatas=[
+                        {"school_id": school_id, "document_id": document.id, "source": document.filename}
+                        for _ in added
+                    ],
+                    ids=added
+                )
+            if removed:
+                store.delete(ids=removed)
+            if added or removed:
+                self.corpus_changed(school_id)
+        except Exception as e:
+            document.status = 'failed'
+            document.error = str(e)
+            db.session.commit()
+            print(f"❌ Error ingesting policy '{source_path}' for school {school_id}: {str(e)}")
+            return {"status": "failed", "document_id": document.id, "error": str(e)}
+
+        document.content_hash = content_hash
+        document.chunk_count = len(wanted)
+        document.status = 'ingested'
+        document.error = None
+        document.ingested_at = datetime.utcnow()
+        db.session.commit()
+        print(f"✅ Ingested '{document.filename}' for school {school_id}: +{len(added)} / -{len(removed)} chunks")
+
+        return {
+            "status": "ingested",
+            "document_id": document.id,
+            "added": len(added),
+            "removed": len(removed),
+            "chunk_count": len(wanted)
+        }
+
+    def ingest_path(self, school_id, path: str, force: bool = False) -> List[Dict[str, Any]]:
+        """Ingest a single file or every supported file under a directory."""
+        if not os.path.isdir(path):
+            return [{"path": path, **self.ingest(school_id, path, force)}]
+
+        results = []
+        for root, _, files in os.walk(path):
+            for filename in sorted(files):
+                if filename.lower().endswith(self.supported_extensions):
+                    file_path = os.path.join(root, filename)
+                    results.append({"path": file_path, **self.ingest(school_id, file_path, force)})
+        return results
+
+    def reingest_school(self, school_id, force: bool = False) -> List[Dict[str, Any]]:
+        """Refresh every registered document of a school (unchanged files are skipped)."""
+        results = []
+        for document in self.list_documents(school_id):
+            try:
+                results.append({"path": document.source_path, **self.ingest(school_id, document.source_path, force)})
+            except FileNotFoundError as e:
+                results.append({"path": document.source_path, "status": "failed", "document_id": document.id, "error": str(e)})
+        return results
+
+    def remove(self, document: PolicyDocument) -> int:
+        """Delete a document's chunks and its registry entry, returns the number of chunks removed."""
+        store = chroma_db_service.get_policy_store(document.school_id)
+        chunk_ids = store.get(where={"document_id": document.id}, include=[])["ids"]
+        if chunk_ids:
+            store.delete(ids=chunk_ids)
+            self.corpus_changed(document.school_id)
+        db.session.delete(document)
+        db.session.commit()
+        return len(chunk_ids)
+
+
+policy_ingestion_service = PolicyIngestionService()
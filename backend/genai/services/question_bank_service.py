@@ -0,0 +1,169 @@
+import math
+import random
+import hashlib
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from models import InterviewQuestionBank, JobPost, db
+from workers import job_runner, JobFailed
+from ..prompt import PromptManager
+from ..schema import question_bank
+from .recommendation_service import InterviewService
+
+LEVELS = ('easy', 'medium', 'hard')
+
+
+class QuestionBankService:
+    """
+    Per job post pools of generated interview questions.
+
+    A bank is generated once per (job post, difficulty mix, mock interview prompt
+    version) with `pool_multiplier` times the requested questions, stored in
+    `interview_question_banks` and sampled per candidate. When the job's title,
+    description or requirements change the bank is stale: it keeps being served
+    while a 'question_bank_refresh' background job regenerates it.
+    """
+
+    def __init__(self, config=question_bank):
+        self.config = config
+
+    @staticmethod
+    def mix_key(mix: Dict[str, int]) -> str:
+        return ",".join(f"{level}={int(mix.get(level, 0))}" for level in LEVELS)
+
+    @staticmethod
+    def parse_mix(key: str) -> Dict[str, int]:
+        return {level: int(count) for level, count in (part.split('=') for part in key.split(','))}
+
+    @staticmethod
+    def content_hash(job_post: JobPost) -> str:
+        content = "\n".join([job_post.title or '', job_post.description or '', job_post.requirements or ''])
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def level_of(key: str) -> Optional[str]:
+        # the llm names the lists "easy", "easy_questions", "Easy Questions", ...
+        return next((level for level in LEVELS if level in key.lower()), None)
+
+    def pool_mix(self, mix: Dict[str, int]) -> Dict[str, int]:
+        return {
+            level: min(max(count, math.ceil(count * self.config.pool_multiplier)), self.config.max_pool_per_level)
+            for level, count in ((level, int(mix.get(level, 0))) for level in LEVELS)
+        }
+
+    def find_bank(self, job_id: str, mix: Dict[str, int]) -> Optional[InterviewQuestionBank]:
+        return InterviewQuestionBank.query.filter_by(
+            job_id=job_id, mix=self.mix_key(mix), prompt_version=PromptManager.MOCK_INTERVIEW_PROMPT_VERSION
+        ).first()
+
+    def is_stale(self, bank: InterviewQuestionBank, job_post: JobPost) -> bool:
+        return bank.job_content_hash != self.content_hash(job_post)
+
+    ## generation
+    def generate(self, job_post: JobPost, mix: Dict[str, int], generator=None) -> InterviewQuestionBank:
+        """One LLM call for the whole pool, stored (or replacing the stale bank) and committed."""
+        generator = generator or InterviewService()
+        pool = self.pool_mix(mix)
+        content_hash = self.content_hash(job_post)
+        questions = generator.generate_mock_interview(
+            job_post.title, job_post.description, job_post.requirements, pool['easy'], pool['medium'], pool['hard']
+        )
+        if not isinstance(questions, dict) or not questions:
+            raise ValueError('Failed to generate interview questions')
+
+        bank = self.find_bank(job_post.id, mix)
+        if bank is None:
+            bank = InterviewQuestionBank(
+                job_id=job_post.id, mix=self.mix_key(mix), prompt_version=PromptManager.MOCK_INTERVIEW_PROMPT_VERSION
+            )
+            db.session.add(bank)
+        bank.set_questions(questions)
+        bank.job_content_hash = content_hash
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # another worker stored the bank first, use theirs
+            db.session.rollback()
+            bank = self.find_bank(job_post.id, mix)
+        return bank
+
+    def schedule_refresh(self, job_id: str, mix: Dict[str, int], created_by_id: str = None):
+        return job_runner.submit('question_bank_refresh', {'job_post_id': job_id, 'mix': self.mix_key(mix)},
+                                 created_by_id=created_by_id, coalesce=True)
+
+    def refresh_stale_banks(self, job_post: JobPost):
+        """Queue regeneration of the job's banks built from an older job description."""
+        banks = InterviewQuestionBank.query.filter_by(
+            job_id=job_post.id, prompt_version=PromptManager.MOCK_INTERVIEW_PROMPT_VERSION
+        ).all()
+        return [self.schedule_refresh(job_post.id, self.parse_mix(bank.mix)) for bank in banks if self.is_stale(bank, job_post)]
+
+    ## sampling
+    def sample(self, bank: InterviewQuestionBank, mix: Dict[str, int], seed: Any = None) -> Dict[str, Any]:
+        """Random `mix` questions per difficulty from the bank; the caller commits the sample count."""
+        rng = random.Random(seed)
+        sampled = {}
+        for key, questions in bank.get_questions().items():
+            level = self.level_of(key)
+            if level is None or not isinstance(questions, list):
+                sampled[key] = questions
+                continue
+            count = min(int(mix.get(level, 0)), len(questions))
+            # keep the bank order, it usually goes from simpler to harder
+            sampled[key] = [questions[i] for i in sorted(rng.sample(range(len(questions)), count))]
+        bank.times_sampled = (bank.times_sampled or 0) + 1
+        return sampled
+
+    def questions_for(self, job_post: JobPost, mix: Dict[str, int] = None, seed: Any = None, generator=None,
+                      created_by_id: str = None) -> Dict[str, Any]:
+        """
+        Sampled questions, generating the bank if there is none yet (an LLM call,
+        meant for background jobs). A stale bank is served and refreshed in the
+        background, the refresh job belongs to `created_by_id`.
+        """
+        mix = mix or self.config.interview_mix
+        bank = self.find_bank(job_post.id, mix)
+        if bank is None:
+            bank = self.generate(job_post, mix, generator)
+        elif self.is_stale(bank, job_post):
+            self.schedule_refresh(job_post.id, mix, created_by_id)
+        return self.sample(bank, mix, seed)
+
+    def stored_questions_for(self, job_post: JobPost, candidate_id: str, mix: Dict[str, int] = None,
+                             created_by_id: str = None) -> Tuple[Optional[Dict[str, Any]], Any]:
+        """
+        Database only: (sampled questions, None) from the bank, or (None, refresh job)
+        when the bank still has to be generated in the background; the job belongs to
+        `created_by_id` so they can poll it. Each candidate gets their own sample of the pool.
+        """
+        mix = mix or self.config.test_mix
+        bank = self.find_bank(job_post.id, mix)
+        if bank is None:
+            job = self.schedule_refresh(job_post.id, mix, created_by_id)
+            # eager job mode (tests) built it already
+            bank = self.find_bank(job_post.id, mix)
+            if bank is None:
+                return None, job
+        elif self.is_stale(bank, job_post):
+            self.schedule_refresh(job_post.id, mix, created_by_id)
+        return self.sample(bank, mix, seed=f"{bank.id}:{bank.job_content_hash}:{candidate_id}"), None
+
+
+question_bank_service = QuestionBankService()
+
+
+@job_runner.handler('question_bank_refresh', priority='batch')
+def run_question_bank_refresh(job, payload):
+    job_post = JobPost.query.get(payload['job_post_id'])
+    if not job_post:
+        raise JobFailed('Job post not found')
+    mix = question_bank_service.parse_mix(payload['mix'])
+
+    bank = question_bank_service.find_bank(job_post.id, mix)
+    if bank is None or question_bank_service.is_stale(bank, job_post):
+        try:
+            bank = question_bank_service.generate(job_post, mix)
+        except ValueError as e:
+            raise JobFailed(str(e))
+    return bank.to_dict()
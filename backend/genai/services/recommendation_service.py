@@ -1,9 +1,14 @@
+import time
+import threading
+
 from ..prompt import PromptManager
 from ..llm_factory import LLMModelFactory
+from ..schema import prompt_budget_config, InterviewQuestionSet
 from utils import TextUtility
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate, FewShotChatMessagePromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from utils.json_stream import iter_json
+from database.vector_db import chroma_db_service
+from database.vector_db.course_indexer import course_indexer
+from workers import job_runner
 
 from .resume_service import ParseResume
 
@@ -25,30 +30,17 @@ class RecommendationService:
         # get the prompts
         prompt=PromptManager.course_recommendation_prompt(resume_text, job_title, courses)
         # load gemini model
-        llm=LLMModelFactory.get_model_provider(self.model_name).get_model()
+        llm=LLMModelFactory.get_model_provider(self.model_name)
 
         # generate content
         try:
-            attempt = 0
-            max_attempts = 3
-            while True:
-                try:
-                    response = llm.generate_content(prompt)
-                    if not response or not response.text:
-                        raise ValueError("Empty response from LLM")
-                    break
-                except Exception as e:
-                    attempt += 1
-                    msg = str(e).lower()
-                    if ("429" in msg or "resource exhausted" in msg or "rate limit" in msg) and attempt < max_attempts:
-                        import time
-                        time.sleep(1 * (2 ** (attempt - 1)))
-                        continue
-                    raise
+            response_text = llm.generate(prompt, template='course_recommendation_prompt')
+            if not response_text:
+                raise ValueError("Empty response from LLM")
         except Exception as e:
             raise RuntimeError(f"Error generating course recommendations: {e}")
 
-        output=TextUtility.remove_json_marker(response.text)
+        output=TextUtility.remove_json_marker(response_text)
         return output
 
 
@@ -72,31 +64,20 @@ class InterviewService:
         prompt=PromptManager.mock_interview_prompt(job_title, job_description, requirements, n_easy_questions, n_medium_questions, n_hard_questions)
 
         # load gemini model
-        llm=LLMModelFactory.get_model_provider(self.model_name).get_model()
+        llm=LLMModelFactory.get_model_provider(self.model_name)
 
-        # generate content
+        # tolerant parsing only: the answer is a single question set object, usable once its closing
+        # brace arrives, so the stream is read to the end (which also lets the response cache store it)
         try:
-            attempt = 0
-            max_attempts = 3
-            while True:
-                try:
-                    response = llm.generate_content(prompt)
-                    if not response or not response.text:
-                        raise ValueError("Empty response from LLM")
-                    break
-                except Exception as e:
-                    attempt += 1
-                    msg = str(e).lower()
-                    if ("429" in msg or "resource exhausted" in msg or "rate limit" in msg) and attempt < max_attempts:
-                        import time
-                        time.sleep(1 * (2 ** (attempt - 1)))
-                        continue
-                    raise
+            question_sets = list(iter_json(
+                llm.stream(prompt, template='mock_interview_prompt'), schema=InterviewQuestionSet, name='mock_interview_prompt'
+            ))
         except Exception as e:
             raise RuntimeError(f"Error generating mock interview: {e}")
-        
-        output = TextUtility.remove_json_marker(response.text)
-        return output
+
+        if not question_sets:
+            raise RuntimeError("Error generating mock interview: no valid question set in the LLM response")
+        return question_sets[0]
 
     
 
@@ -116,66 +97,72 @@ class ProfileEnhancementService:
         # load the prompt
         prompt=PromptManager.tailor_resume_prompt(resume_text, job_title)
         # load gemini model
-        llm=LLMModelFactory.get_model_provider(self.model_name).get_model()
+        llm=LLMModelFactory.get_model_provider(self.model_name)
 
         # generate content
         try:
-            attempt = 0
-            max_attempts = 3
-            while True:
-                try:
-                    response = llm.generate_content(prompt)
-                    if not response or not response.text:
-                        raise ValueError("Empty response from LLM")
-                    break
-                except Exception as e:
-                    attempt += 1
-                    msg = str(e).lower()
-                    if ("429" in msg or "resource exhausted" in msg or "rate limit" in msg) and attempt < max_attempts:
-                        import time
-                        time.sleep(1 * (2 ** (attempt - 1)))
-                        continue
-                    raise
+            response_text = llm.generate(prompt, template='tailor_resume_prompt')
+            if not response_text:
+                raise ValueError("Empty response from LLM")
         except Exception as e:
             raise RuntimeError(f"Error generating profile enhancement: {e}")
 
-        output = TextUtility.remove_json_marker(response.text)
+        output = TextUtility.remove_json_marker(response_text)
         return output
     
 
 #  Make JD based on Job title
 
 class JobDescriptionService:
-    def __init__(self, model_name: str = 'gemini'):
+    # variant name -> few-shot chain, built once and reused by every request
+    _chains = {}
+    _chains_lock = threading.Lock()
+
+    def __init__(self, model_name: str = 'chatgpt'):
         self.model_name = model_name
 
-    def generate_job_description(self, job_title):
-        example_prompt = ChatPromptTemplate.from_messages([
-            ("human", "{input}"),
-            ("assistant", "{output}"),
-        ])
-
-        few_shot = FewShotChatMessagePromptTemplate(
-            examples=PromptManager.example_prompt(),
-            example_prompt=example_prompt,
-        )
+    def chain(self):
+        chain = JobDescriptionService._chains.get(self.model_name)
+        if chain is not None:
+            return chain
+
+        with JobDescriptionService._chains_lock:
+            chain = JobDescriptionService._chains.get(self.model_name)
+            if chain is None:
+                # langchain is only needed here, keep it out of app startup
+                from langchain_core.prompts import ChatPromptTemplate, FewShotChatMessagePromptTemplate
+                from langchain_core.output_parsers import StrOutputParser
+
+                example_prompt = ChatPromptTemplate.from_messages([
+                    ("human", "{input}"),
+                    ("assistant", "{output}"),
+                ])
+
+                few_shot = FewShotChatMessagePromptTemplate(
+                    examples=PromptManager.example_prompt(),
+                    example_prompt=example_prompt,
+                )
 
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", PromptManager.make_JD_prompt(job_title)),
-            few_shot, (
-                "human",
-                """
-                Generate a Job Description with same structure and tone
-                Job title: {job_title}
-                """)
-        ])
+                prompt = ChatPromptTemplate.from_messages([
+                    ("system", "{system_prompt}"),
+                    few_shot, (
+                        "human",
+                        """
+                        Generate a Job Description with same structure and tone
+                        Job title: {job_title}
+                        """)
+                ])
 
-        # llm chain
-        llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0)
-        chain = prompt | llm | StrOutputParser()
+                # llm chain, on the provider's pooled http client
+                llm = LLMModelFactory.get_model_provider(self.model_name).chat_model()
+                chain = prompt | llm | StrOutputParser()
+                JobDescriptionService._chains[self.model_name] = chain
+        return chain
 
+    def generate_job_description(self, job_title):
         try:
-            output = chain.invoke({
+            output = self.chain().invoke({
+                "system_prompt": PromptManager.make_JD_prompt(job_title),
                 "job_title": job_title
             })
         except Exception as e:
@@ -196,28 +183,89 @@ class UpskillingPathService:
         # load the prompt
         prompt=PromptManager.skill_gap_suggest_upskill_prompt(resume_text, job_description, job_title, courses)
         # load gemini model
-        llm=LLMModelFactory.get_model_provider(self.model_name).get_model()
+        llm=LLMModelFactory.get_model_provider(self.model_name)
 
-        # generate content (with retry/backoff for transient rate limits)
+        # generate content (rate limit / retries handled by the shared llm client)
         try:
-            attempt = 0
-            max_attempts = 3
-            while True:
-                try:
-                    response = llm.generate_content(prompt)
-                    if not response or not response.text:
-                        raise ValueError("Empty response from LLM")
-                    break
-                except Exception as e:
-                    attempt += 1
-                    msg = str(e).lower()
-                    if ("429" in msg or "resource exhausted" in msg or "rate limit" in msg) and attempt < max_attempts:
-                        import time
-                        time.sleep(1 * (2 ** (attempt - 1)))
-                        continue
-                    raise
+            response_text = llm.generate(prompt, template='skill_gap_suggest_upskill_prompt')
+            if not response_text:
+                raise ValueError("Empty response from LLM")
         except Exception as e:
             raise RuntimeError(f"Error generating upskilling path: {e}")
 
-        output = TextUtility.remove_json_marker(response.text)
+        output = TextUtility.remove_json_marker(response_text)
         return output
+
+
+# top-n courses for a candidate, so course prompts stay the same size as the catalog grows
+class CourseRetrievalService:
+    """
+    Course vectors live in the 'course' collection, kept in sync with the courses
+    table by course_indexer (ORM events). The resume and target job are embedded
+    locally and only the `max_courses` nearest courses are handed to the LLM.
+    """
+
+    def __init__(self, vector_db=chroma_db_service, indexer=course_indexer, config=prompt_budget_config, clock=time.monotonic):
+        self.vector_db = vector_db
+        self.indexer = indexer
+        self.config = config
+        self.clock = clock
+        self._reconciled_at = None
+
+    def ensure_index(self):
+        """
+        Queue a background reconcile when the collection does not hold one doc per
+        course, and every `course_reconcile_seconds` anyway: edits that bypassed the
+        ORM events (indexing disabled, bulk sql) change content hashes, not the count.
+        The request itself only queries whatever the collection holds right now.
+        """
+        from models import Course
+
+        collection = self.vector_db.get_collection(self.indexer.collection_name)
+        now = self.clock()
+        due = self._reconciled_at is None or now - self._reconciled_at >= self.config.course_reconcile_seconds
+        if due or collection.count() != Course.query.count():
+            self._reconciled_at = now
+            job_runner.submit('course_index_reconcile', {}, coalesce=True)
+        return collection
+
+    def relevant_courses(self, resume_text, job_title, job_description=None, k: int = None):
+        """
+        Args:
+            resume_text: formatted resume text
+            job_title / job_description: target job
+            k: number of courses, defaults to prompt_budget_config.max_courses
+        Returns:
+            list of course dicts (id, title, duration_mins, content_url), most relevant first
+        """
+        k = k or self.config.max_courses
+        collection = self.ensure_index()
+        total = collection.count()
+        if total == 0:
+            return []
+
+        query_text = "\n".join(part for part in (job_title, job_description, resume_text) if part)
+        result = collection.query(
+            query_embeddings=[self.vector_db.model.embed_query(query_text)],
+            n_results=min(k, total),
+            include=["metadatas"]
+        )
+        return [
+            {
+                "id": metadata["course_id"],
+                "title": metadata["title"],
+                "duration_mins": metadata.get("duration_mins"),
+                "content_url": metadata.get("content_url"),
+            }
+            for metadata in result["metadatas"][0]
+        ]
+
+
+course_retrieval_service = CourseRetrievalService()
+
+
+@job_runner.handler('course_index_reconcile', priority='batch')
+def run_course_index_reconcile(job, payload):
+    summary = course_indexer.reconcile()
+    print(f"Course index reconciled: {len(summary['missing'])} missing, {len(summary['stale'])} stale, {len(summary['orphaned'])} orphaned")
+    return {key: len(summary[key]) for key in ('missing', 'stale', 'orphaned')}
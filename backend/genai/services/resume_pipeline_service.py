@@ -0,0 +1,168 @@
+import time
+from datetime import datetime
+from typing import Any, Dict
+
+from database.vector_db import chroma_db_service
+from models import Resume, db
+from utils import TextUtility
+from workers import job_runner, JobFailed
+from ..schema import resume_processing
+from .resume_service import ParseResume, ResumeIndexService
+
+STAGES = ('extract', 'scrub_pii', 'structure', 'embed', 'index')
+
+
+class ResumePipelineService:
+    """
+    Prepares an uploaded resume for matching in the background.
+
+    An upload queues a 'resume_pipeline' job which extracts the text, scrubs
+    PII, structures it with the LLM (persisted on the Resume row like any other
+    parse), embeds the structured text and upserts it into the 'resume'
+    collection. Every stage records its status and duration in
+    `Resume.processing_stages`; stages whose output is already stored (a valid
+    parse for the same file and prompt version, a vector for the same text) are
+    skipped. Matching and recommendations then find the parse and the vector in
+    place instead of paying for them on the request.
+
+    Bad files fail for good; LLM / vector store errors are retried by the job runner.
+    """
+
+    def __init__(self, config=resume_processing):
+        self.config = config
+
+    def start(self, resume: Resume, created_by_id: str = None):
+        """Queue the pipeline of a new (or re-uploaded) resume, None if upload processing is disabled."""
+        if not self.config.pipeline_on_upload:
+            return None
+        resume.processing_status = 'queued'
+        resume.processing_error = None
+        resume.set_processing_stages({stage: {'status': 'pending'} for stage in STAGES})
+        # submit commits the resume together with the job
+        job = job_runner.submit('resume_pipeline', {'resume_id': resume.id}, created_by_id=created_by_id,
+                                total=len(STAGES), coalesce=True)
+        resume.processing_job_id = job.id
+        db.session.commit()
+        # eager mode (tests) ran the pipeline in its own session
+        db.session.refresh(resume)
+        return job
+
+    ## stage bookkeeping
+    @staticmethod
+    def mark(resume: Resume, stage: str, status: str, seconds: float = None, error: str = None):
+        stages = resume.get_processing_stages()
+        entry = {'status': status, 'at': datetime.utcnow().isoformat()}
+        if seconds is not None:
+            entry['seconds'] = round(seconds, 3)
+        if error is not None:
+            entry['error'] = error
+        stages[stage] = entry
+        resume.set_processing_stages(stages)
+
+    def run(self, job, resume: Resume) -> Dict[str, Any]:
+        """Run the stages in order, committing each stage's status as it finishes."""
+        resume.processing_status = 'processing'
+        resume.processing_error = None
+        state = {'content_hash': TextUtility.file_content_hash(resume.file_url)}
+        stored = ParseResume.stored_parse(resume, state['content_hash'])
+        if stored is not None:
+            state['structured'] = stored
+
+        for done, stage in enumerate(STAGES):
+            self.mark(resume, stage, 'running')
+            db.session.commit()
+            start = time.perf_counter()
+            skipped = getattr(self, f'_{stage}')(resume, state)
+            self.mark(resume, stage, 'skipped' if skipped else 'done', time.perf_counter() - start)
+            job_runner.report_progress(job, done + 1, len(STAGES))
+
+        resume.processing_status = 'ready'
+        db.session.commit()
+        return {'resume_id': resume.id, 'stages': resume.get_processing_stages(), 'content_hash': state['text_hash']}
+
+    def record_failure(self, resume_id: str, error: Exception, final: bool):
+        """Store the failed stage on a clean session, the runner rolls back the handler's writes."""
+        db.session.rollback()
+        resume = Resume.query.get(resume_id)
+        if resume is None:
+            return
+        stages = resume.get_processing_stages()
+        stage = next((name for name in STAGES if stages.get(name, {}).get('status') == 'running'), None)
+        if stage is not None:
+            self.mark(resume, stage, 'failed', error=str(error))
+        resume.processing_status = 'failed' if final else 'retrying'
+        resume.processing_error = str(error)
+        db.session.commit()
+
+    ## stages, each returns True when it had nothing to do
+    @staticmethod
+    def _extract(resume: Resume, state: Dict[str, Any]) -> bool:
+        if 'structured' in state:
+            return True
+        try:
+            text = ParseResume.extract_resume_text(resume.file_url)
+        except Exception as e:
+            raise JobFailed(f"Resume text could not be extracted: {e}")
+        if not text or not text.strip():
+            raise JobFailed('Resume has no extractable text')
+        state['text'] = text
+        return False
+
+    @staticmethod
+    def _scrub_pii(resume: Resume, state: Dict[str, Any]) -> bool:
+        if 'structured' in state:
+            return True
+        state['text'] = TextUtility.remove_pii(state['text'])
+        return False
+
+    def _structure(self, resume: Resume, state: Dict[str, Any]) -> bool:
+        if 'structured' in state:
+            return True
+        structured = ParseResume.structure_resume_text(
+            state['text'], self.config.pipeline_model, timeout=self.config.pipeline_llm_timeout
+        )
+        if not isinstance(structured, dict) or not structured:
+            # free text answer, worth another attempt
+            raise ValueError('LLM did not return a structured resume')
+        ParseResume.store_parse(resume, structured, state['content_hash'])
+        state['structured'] = structured
+        return False
+
+    @staticmethod
+    def _embed(resume: Resume, state: Dict[str, Any]) -> bool:
+        text = TextUtility.format_resume_text(state['structured'])
+        state['text_hash'] = ResumeIndexService.content_hash(text)
+        existing = chroma_db_service.get_docs(ResumeIndexService.resume_collection, [str(resume.id)]).get(str(resume.id))
+        if existing and existing['meta_data'].get('content_hash') == state['text_hash']:
+            return True
+        state['resume_text'] = text
+        state['embeddings'] = chroma_db_service.get_embeddings([text])[0]
+        return False
+
+    @staticmethod
+    def _index(resume: Resume, state: Dict[str, Any]) -> bool:
+        if 'embeddings' not in state:
+            return True
+        chroma_db_service.upsert_many(
+            ResumeIndexService.resume_collection,
+            doc_ids=[str(resume.id)],
+            texts=[state['resume_text']],
+            metadatas=[ResumeIndexService.resume_metadata(resume, state['text_hash'])],
+            embeddings=[state['embeddings']]
+        )
+        return False
+
+
+resume_pipeline_service = ResumePipelineService()
+
+
+@job_runner.handler('resume_pipeline')
+def run_resume_pipeline(job, payload):
+    resume = Resume.query.get(payload['resume_id'])
+    if not resume:
+        raise JobFailed('Resume not found')
+    try:
+        return resume_pipeline_service.run(job, resume)
+    except Exception as e:
+        resume_pipeline_service.record_failure(payload['resume_id'], e, final=job_runner.is_final_failure(job, e))
+        raise
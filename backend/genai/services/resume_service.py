@@ -1,8 +1,15 @@
 from ..prompt import PromptManager
 from models import User, Role, Resume, JobPost, Application, PerformanceReview, db
 from database.vector_db import chroma_db_service
+from database.vector_db.job_post_indexer import job_post_indexer
 from ..llm_factory import LLMModelFactory
+from ..llm_client import with_priority_context
 from utils import TextUtility
+from ..schema import resume_processing, StructuredResume
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+import hashlib
+import time
 
 class ResumeService:
     def __init__(self, model_name: str = 'gemini'):
@@ -10,26 +17,134 @@ class ResumeService:
     
     def resume_service(self,resume_id):
 
-        parsed_resume = ParseResume.parse_resume_text(resume_id)
-        chroma_db_service.clear_collection(collection_name='resume')
-        # embed resume and store it in chroma
-        chroma_db_service.add_resume(
-            resume_id=resume_id,
-            metadata={
-                "resume_id": resume_id
-            },
-            text=parsed_resume,
-            clear_first=True
-        )
+        resume = Resume.query.get_or_404(resume_id)
+        # embedded once per resume content, reused across requests
+        indexed_resume = ResumeIndexService.index_resumes([resume], self.model_name).get(str(resume.id))
+        if indexed_resume is None:
+            raise ValueError("Resume could not be parsed")
 
         # search top-n job based on resume
-        jobs = chroma_db_service.search_jobs_for_resume(parsed_resume)
-        print(jobs)
+        jobs = chroma_db_service.search_jobs_for_resume(indexed_resume['text'], embeddings=indexed_resume['embeddings'])
         sorted_jobs = sorted(jobs, key=lambda x: x['distance'])
         
         return sorted_jobs[0] # dict 
         
 
+# persistent resume vectors
+class ResumeIndexService:
+    """
+    Resume vectors live in the 'resume' collection, one per resume, keyed by the
+    resume id and tagged with the content hash of the structured resume text.
+    Job scoped search uses the 'application' collection: one doc per application
+    carrying job_id / application_status metadata and a copy of the resume vector,
+    so scoring a job never re-embeds a resume that did not change.
+    """
+    resume_collection = 'resume'
+    application_collection = 'application'
+    active_statuses = ['applied', 'screening', 'shortlisted', 'submitted']
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def resume_metadata(resume, content_hash: str):
+        return {"resume_id": resume.id, "user_id": resume.owner_id, "content_hash": content_hash}
+
+    @staticmethod
+    def index_resumes(resumes, model_name: str = 'gemini', time_budget: float = None):
+        """
+        Make sure every resume has an up to date vector. Resumes are parsed
+        concurrently; the ones that could not be parsed in time are left out.
+
+        Returns:
+            dict: resume id -> {"text", "embeddings", "content_hash"}
+        """
+        resume_ids = [str(resume.id) for resume in resumes]
+        stored = chroma_db_service.get_docs(ResumeIndexService.resume_collection, resume_ids)
+        structured_resumes, _ = ParseResume.get_structured_resumes(resumes, model_name, time_budget=time_budget)
+
+        indexed, to_embed = {}, []
+        for resume in resumes:
+            if resume.id not in structured_resumes:
+                continue
+            structured_resume = structured_resumes[resume.id]
+            text = TextUtility.format_resume_text(structured_resume)
+            content_hash = ResumeIndexService.content_hash(text)
+            existing = stored.get(str(resume.id))
+
+            if existing and existing['meta_data'].get('content_hash') == content_hash:
+                indexed[str(resume.id)] = {"text": text, "embeddings": existing['embeddings'], "content_hash": content_hash}
+            else:
+                to_embed.append((resume, text, content_hash))
+
+        if to_embed:
+            embeddings = chroma_db_service.get_embeddings([text for _, text, _ in to_embed])
+            chroma_db_service.upsert_many(
+                ResumeIndexService.resume_collection,
+                doc_ids=[str(resume.id) for resume, _, _ in to_embed],
+                texts=[text for _, text, _ in to_embed],
+                metadatas=[
+                    ResumeIndexService.resume_metadata(resume, content_hash) for resume, _, content_hash in to_embed
+                ],
+                embeddings=embeddings
+            )
+            for (resume, text, content_hash), embedding in zip(to_embed, embeddings):
+                indexed[str(resume.id)] = {"text": text, "embeddings": embedding, "content_hash": content_hash}
+
+        return indexed
+
+    @staticmethod
+    def sync_job_applications(job_id, rows, model_name: str = 'gemini', time_budget: float = None):
+        """
+        Bring the job's application docs in line with its active applications.
+
+        Args:
+            rows: (resume, application, user) tuples of the job's active applications
+            time_budget: seconds available for parsing new / changed resumes
+        Returns:
+            int: number of applications with an up to date doc
+        """
+        rows = [
+            (resume, application, user) for resume, application, user in rows
+            if resume.file_url is not None and resume.file_url.endswith(('.pdf', '.docx'))
+        ]
+        indexed = ResumeIndexService.index_resumes([resume for resume, _, _ in rows], model_name, time_budget)
+        stored = chroma_db_service.get_doc_metadata(ResumeIndexService.application_collection, where={"job_id": job_id})
+
+        doc_ids, texts, metadatas, embeddings = [], [], [], []
+        for resume, application, user in rows:
+            indexed_resume = indexed.get(str(resume.id))
+            if indexed_resume is None:
+                # not parsed this time, keep whatever doc it already has
+                continue
+            metadata = {
+                "user_id": resume.owner_id,
+                "resume_id": resume.id,
+                "application_id": application.id,
+                "candidate_name": user.name or "",
+                "job_id": job_id,
+                "application_status": application.status,
+                "content_hash": indexed_resume['content_hash']
+            }
+            if stored.get(str(application.id)) == metadata:
+                continue
+            doc_ids.append(str(application.id))
+            texts.append(indexed_resume['text'])
+            metadatas.append(metadata)
+            embeddings.append(indexed_resume['embeddings'])
+
+        chroma_db_service.upsert_many(ResumeIndexService.application_collection, doc_ids, texts, metadatas, embeddings)
+
+        # withdrawn / rejected / deleted applications drop out of the job's search space
+        active_ids = {str(application.id) for _, application, _ in rows}
+        chroma_db_service.delete_docs(
+            ResumeIndexService.application_collection,
+            [doc_id for doc_id in stored if doc_id not in active_ids]
+        )
+        return sum(1 for resume, _, _ in rows if str(resume.id) in indexed)
+
+
 # store all the jobs in vector db
 class JobService:
 
@@ -37,29 +152,12 @@ class JobService:
         self.collection_name = collection_name
 
     def store_multiple_job_posts(self):
-        job_posts=JobPost.query.all()
-        chroma_db_service.clear_collection(collection_name=self.collection_name)
-        for job_post in job_posts:
-            job=job_post.to_dict()
-
-            metadata= {
-                "job_id": job['id'],
-                "title": job['title'],
-                "description": job['description'] or "",
-                "requirements": job['requirements'] or "",
-                "status": job['status'],
-                "created_at": job['created_at']
-            }
-
-            text = f"{job['title']}\n{job['description']}\n{job['requirements']}"
-
-            #load job data into vector store
-            chroma_db_service.add_job_post(
-                job_post_id=job['id'],
-                metadata=metadata,
-                text=text,
-                clear_first=True
-            )
+        """
+        Bring the job_post collection in line with the job_posts table.
+        Only missing / changed jobs are embedded; new writes are indexed
+        incrementally by job_post_indexer so this is not needed per request.
+        """
+        return job_post_indexer.reconcile()
         
     # delete job post from vector db
     def delete_job_post(self):
@@ -81,93 +179,30 @@ class ResumeMatch:
             .filter(
                 Role.name == 'candidate',
                 Application.job_id == job_id,
-                Application.status.in_(['applied', 'screening', 'shortlisted', 'submitted'])
+                Application.status.in_(ResumeIndexService.active_statuses)
             )
             .all()
         )
-        chroma_db_service.clear_collection(collection_name='resume')
-        # extract key details (skill,etc) from resume and parse it
-        for resume, application, user in resumes_with_applications:
-            
-
-            if resume.file_url is not None and resume.file_url.endswith('.pdf'):
-
-                parsed_resume = TextUtility.extract_text_from_pdf(resume.file_url)
-                parsed_resume = TextUtility.remove_pii(parsed_resume)
-                prompt = PromptManager.get_structure_json_resume(parsed_resume)
-                llm = LLMModelFactory.get_model_provider(self.model_name).get_model()
-                # call LLM with retry on transient failures (rate limit/resource exhausted)
-                attempt = 0
-                max_attempts = 3
-                while True:
-                    try:
-                        response = llm.generate_content(prompt)
-                        parsed_resume = TextUtility.remove_json_marker(response.text)
-                        break
-                    except Exception as e:
-                        attempt += 1
-                        msg = str(e).lower()
-                        if ("429" in msg or "resource exhausted" in msg or "rate limit" in msg) and attempt < max_attempts:
-                            import time
-                            time.sleep(1 * (2 ** (attempt - 1)))
-                            continue
-                        raise
-                parsed_resume = TextUtility.format_resume_text(parsed_resume)
-                # print(type(parsed_resume))
-                
-                chroma_db_service.add_resume(
-                    resume_id = resume.id,
-                    text = parsed_resume,
-                    metadata={
-                        "user_id": resume.owner_id,
-                        "resume_id": resume.id,
-                        "application_id": application.id,
-                        "candidate_name": user.name,
-                        "job_id": job_id,
-                        "application_status": application.status
-                    }
-                )
-                print(parsed_resume)
-            elif resume.file_url is not None and resume.file_url.endswith('.docx'):
-
-                parsed_resume = TextUtility.extract_text_from_docx(resume.file_url)
-                parsed_resume = TextUtility.remove_pii(parsed_resume)
-                prompt = PromptManager.get_structure_json_resume(parsed_resume)
-                llm = LLMModelFactory.get_model_provider(self.model_name).get_model()
-                attempt = 0
-                max_attempts = 3
-                while True:
-                    try:
-                        response = llm.generate_content(prompt)
-                        parsed_resume = TextUtility.remove_json_marker(response.text)
-                        break
-                    except Exception as e:
-                        attempt += 1
-                        msg = str(e).lower()
-                        if ("429" in msg or "resource exhausted" in msg or "rate limit" in msg) and attempt < max_attempts:
-                            import time
-                            time.sleep(1 * (2 ** (attempt - 1)))
-                            continue
-                        raise
-                parsed_resume = TextUtility.format_resume_text(parsed_resume)
-                # print(parsed_resume)
-                chroma_db_service.add_resume(
-                    resume_id = resume.id,
-                    text = parsed_resume,
-                    metadata={
-                        "user_id": resume.owner_id,
-                        "resume_id": resume.id,
-                        "application_id": application.id,
-                        "candidate_name": user.name,
-                        "job_id": job_id,
-                        "application_status": application.status
-                    }
-                )
-                print(parsed_resume)
+        if not resumes_with_applications:
+            raise ValueError("No active applications for this job")
+
+        # parse (concurrently) and embed only new / changed resumes, refresh the job scoped application docs
+        ResumeIndexService.sync_job_applications(job_id, resumes_with_applications, self.model_name)
 
         # search top-n resume based on jobs
         job_text = f"{job_title}\n{job_description}\n{job_requirements}"
-        resumes = chroma_db_service.search_resumes_for_job(job_text, k=min(5, len(resumes_with_applications)))
+        resumes = chroma_db_service.search_resumes_for_job(
+            job_text,
+            k=min(5, len(resumes_with_applications)),
+            where={"$and": [
+                {"job_id": job_id},
+                {"application_status": {"$in": ResumeIndexService.active_statuses}}
+            ]},
+            collection_name=ResumeIndexService.application_collection
+        )
+        if not resumes:
+            # none of the applications has a parsed, indexed resume (yet)
+            raise ValueError("No resumes ready yet for this job, try again once they are processed")
         # print(resumes)
         sorted_resumes = sorted(resumes, key = lambda x: x['distance'])
         # print(sorted_resumes)
@@ -175,22 +210,9 @@ class ResumeMatch:
         # for resume_text in resume_texts:
         # print(resume_text)
         prompt = PromptManager.resume_shortlisting_prompt(sorted_resumes[0], job_title, job_description, job_requirements)
-        llm = LLMModelFactory.get_model_provider(self.model_name).get_model()
-        attempt = 0
-        max_attempts = 3
-        while True:
-            try:
-                response = llm.generate_content(prompt)
-                result = TextUtility.remove_json_marker(response.text)
-                break
-            except Exception as e:
-                attempt += 1
-                msg = str(e).lower()
-                if ("429" in msg or "resource exhausted" in msg or "rate limit" in msg) and attempt < max_attempts:
-                    import time
-                    time.sleep(1 * (2 ** (attempt - 1)))
-                    continue
-                raise
+        llm = LLMModelFactory.get_model_provider(self.model_name)
+        response_text = llm.generate(prompt, template='resume_shortlisting_prompt')
+        result = TextUtility.remove_json_marker(response_text)
         print(result)
         # res={"resume_id":resume_text[0], **result}
         return result
@@ -201,34 +223,142 @@ class ResumeMatch:
 
 class ParseResume:
 
+    @staticmethod
+    def extract_resume_text(file_url):
+        if file_url is not None and file_url.endswith('.pdf'):
+            return TextUtility.extract_text_from_pdf(file_url)
+        elif file_url is not None and file_url.endswith('.docx'):
+            return TextUtility.extract_text_from_docx(file_url)
+        raise ValueError(f"Unsupported resume file: {file_url}")
 
     @staticmethod
-    def parse_resume_text(resume_id):
-        resume=Resume.query.get_or_404(resume_id)
-        if resume.file_url is not None and resume.file_url.endswith('.pdf'):
-            parsed_resume = TextUtility.extract_text_from_pdf(resume.file_url)
-        elif resume.file_url is not None and resume.file_url.endswith('.docx'):
-            parsed_resume = TextUtility.extract_text_from_docx(resume.file_url)
+    def stored_parse(resume, content_hash):
+        """The persisted parse if it is still valid for this file and prompt version, else None"""
+        if (
+            resume.parsed_data
+            and resume.parsed_content_hash is not None
+            and resume.parsed_prompt_version == PromptManager.RESUME_STRUCTURE_PROMPT_VERSION
+            and content_hash in (None, resume.parsed_content_hash)
+        ):
+            return resume.get_parsed_data()
+        return None
+
+    @staticmethod
+    def structure_resume_text(resume_text, model_name: str = 'gemini', timeout: float = None):
+        """Let the LLM structure already extracted, PII scrubbed resume text."""
+        prompt = PromptManager.get_structure_json_resume(resume_text)
+        llm = LLMModelFactory.get_model_provider(model_name)
+        response_text = llm.generate(prompt, template='get_structure_json_resume', timeout=timeout)
+        return TextUtility.remove_json_marker(response_text, schema=StructuredResume)
+
+    @staticmethod
+    def structure_resume_file(file_url, model_name: str = 'gemini', timeout: float = None):
+        """Extract the file and let the LLM structure it. No database access, safe to run in worker threads."""
+        parsed_resume = ParseResume.extract_resume_text(file_url)
+        parsed_resume = TextUtility.remove_pii(parsed_resume)
+        return ParseResume.structure_resume_text(parsed_resume, model_name, timeout)
+
+    @staticmethod
+    def structure_resume_file_by(file_url, model_name: str, deadline: float):
+        """structure_resume_file with whatever is left until `deadline` (time.monotonic) when the task starts."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("resume parse budget spent before the parse started")
+        return ParseResume.structure_resume_file(file_url, model_name, remaining)
+
+    @staticmethod
+    def store_parse(resume, structured_resume, content_hash):
+        # only persist well formed parses, free text answers are retried next time
+        if isinstance(structured_resume, dict) and structured_resume:
+            resume.set_parsed_data(structured_resume)
+            resume.parsed_content_hash = content_hash
+            resume.parsed_prompt_version = PromptManager.RESUME_STRUCTURE_PROMPT_VERSION
+            resume.parsed_at = datetime.utcnow()
+
+    @staticmethod
+    def get_structured_resume(resume, model_name: str = 'gemini'):
+        """
+        Read-through access to the structured (LLM parsed) resume.
+
+        The parse is persisted on the Resume row together with the file content
+        hash and prompt version; the LLM is only called again when either changed.
+
+        Args:
+            resume: Resume row
+            model_name: LLM provider used on a cache miss
+        Returns:
+            dict: structured resume json
+        """
+        content_hash = TextUtility.file_content_hash(resume.file_url)
+        stored = ParseResume.stored_parse(resume, content_hash)
+        if stored is not None:
+            return stored
+
+        structured_resume = ParseResume.structure_resume_file(resume.file_url, model_name)
+        ParseResume.store_parse(resume, structured_resume, content_hash)
+        db.session.commit()
+        return structured_resume
+
+    @staticmethod
+    def get_structured_resumes(resumes, model_name: str = 'gemini', max_workers: int = None, time_budget: float = None):
+        """
+        get_structured_resume for many resumes: the ones without a valid stored
+        parse are extracted and structured concurrently in a bounded thread pool.
+        Resumes that fail, or are not done within `time_budget` seconds, are left
+        out instead of failing the whole batch.
+
+        Returns:
+            tuple: (resume id -> structured resume, resume id -> error message)
+        """
+        max_workers = max_workers or resume_processing.parse_workers
+        time_budget = time_budget or resume_processing.match_time_budget
+        deadline = time.monotonic() + time_budget
+
+        results, errors, pending = {}, {}, {}
+        for resume in resumes:
+            content_hash = TextUtility.file_content_hash(resume.file_url)
+            stored = ParseResume.stored_parse(resume, content_hash)
+            if stored is not None:
+                results[resume.id] = stored
+            else:
+                pending[resume.id] = (resume, content_hash)
+
+        if not pending:
+            return results, errors
+
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(pending)), thread_name_prefix='resume-parse')
+        futures = {
+            # queued tasks only get what is left of the budget once a worker picks them up
+            executor.submit(with_priority_context(ParseResume.structure_resume_file_by), resume.file_url, model_name, deadline): resume_id
+            for resume_id, (resume, _) in pending.items()
+        }
         try:
-            parsed_resume = TextUtility.remove_pii(parsed_resume)
-            prompt = PromptManager.get_structure_json_resume(parsed_resume)
-            llm = LLMModelFactory.get_model_provider('gemini').get_model()
-            attempt = 0
-            max_attempts = 3
-            while True:
+            for future in as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+                resume_id = futures[future]
                 try:
-                    response = llm.generate_content(prompt)
-                    parsed_resume = TextUtility.remove_json_marker(response.text)
-                    parsed_resume = TextUtility.format_resume_text(parsed_resume)
-                    return parsed_resume
+                    results[resume_id] = future.result()
+                    resume, content_hash = pending[resume_id]
+                    ParseResume.store_parse(resume, results[resume_id], content_hash)
                 except Exception as e:
-                    attempt += 1
-                    msg = str(e).lower()
-                    if ("429" in msg or "resource exhausted" in msg or "rate limit" in msg) and attempt < max_attempts:
-                        import time
-                        time.sleep(1 * (2 ** (attempt - 1)))
-                        continue
-                    raise
+                    errors[resume_id] = str(e)
+        except FuturesTimeout:
+            for future, resume_id in futures.items():
+                if resume_id not in results and resume_id not in errors:
+                    errors[resume_id] = f"not parsed within the {time_budget:.0f}s budget"
+        finally:
+            # do not wait for stragglers, their llm deadline bounds them
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        db.session.commit()
+        if errors:
+            print(f"⚠️ {len(errors)} of {len(pending)} resumes could not be parsed: {errors}")
+        return results, errors
+
+    @staticmethod
+    def parse_resume_text(resume_id):
+        resume=Resume.query.get_or_404(resume_id)
+        try:
+            structured_resume = ParseResume.get_structured_resume(resume)
+            return TextUtility.format_resume_text(structured_resume)
         except Exception as e:
             raise RuntimeError(f"Error parsing resume: {e}")
-            
\ No newline at end of file
@@ -0,0 +1,141 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List
+
+from models import User, Resume, JobPost, Application
+from workers import job_runner, JobFailed
+from ..prompt import PromptManager
+from ..llm_factory import LLMModelFactory
+from ..llm_client import with_priority_context
+from ..schema import resume_processing
+from utils import TextUtility
+
+
+class CandidateScoringService:
+    """
+    Scores candidates against a job post with the score_candidate prompt.
+
+    `bulk_score` is the handler of the 'bulk_score' background job: resumes are
+    loaded up front, the LLM calls fan out over a bounded thread pool (the shared
+    llm client keeps them under the provider rate limit) and Application.score is
+    written in batches of `score_commit_batch`, together with the job progress.
+    """
+
+    def __init__(self, model_name: str = 'gemini'):
+        self.model_name = model_name
+
+    @staticmethod
+    def job_description(job: JobPost) -> str:
+        return f"""
+        Title: {job.title}
+        Description: {job.description or 'Not provided'}
+        Requirements: {job.requirements or 'Not provided'}
+        Location: {job.location or 'Not specified'}
+        Level: {job.level or 'Not specified'}
+        """
+
+    def score_resume_text(self, job_description: str, resume_text: str) -> Dict[str, Any]:
+        """One LLM call, no database access so it is safe to run in worker threads."""
+        prompt = PromptManager.score_candidate_prompt(job_description, resume_text)
+        llm = LLMModelFactory.get_model_provider(self.model_name)
+        response_text = llm.generate(prompt, template='score_candidate_prompt')
+        scoring_result = TextUtility.remove_json_marker(response_text)
+        if not isinstance(scoring_result, dict):
+            raise ValueError("Invalid scoring response from LLM")
+        return scoring_result
+
+    @staticmethod
+    def _apply_scores(job_id: str, scores: Dict[str, Any]):
+        applications = Application.query.filter(
+            Application.job_id == job_id,
+            Application.candidate_id.in_(list(scores))
+        ).all()
+        for application in applications:
+            application.score = scores[application.candidate_id]
+
+    def bulk_score(self, job, job_id: str, candidate_ids: List[str]) -> Dict[str, Any]:
+        """
+        Args:
+            job: BackgroundJob row, used for progress reporting
+            job_id: JobPost the candidates are scored against
+            candidate_ids: users to score (their latest parsed resume is used)
+        Returns:
+            dict with results, errors and summary
+        """
+        job_post = JobPost.query.get(job_id)
+        if not job_post:
+            raise JobFailed("Job not found")
+
+        results, errors, work = [], [], []
+        for candidate_id in candidate_ids:
+            candidate = User.query.get(candidate_id)
+            if not candidate:
+                errors.append(f"Candidate {candidate_id} not found")
+                continue
+
+            latest_resume = Resume.query.filter_by(owner_id=candidate_id).order_by(Resume.uploaded_at.desc()).first()
+            if not latest_resume:
+                errors.append(f"No resume found for candidate {candidate_id}")
+                continue
+
+            resume_data = latest_resume.get_parsed_data()
+            if not resume_data or 'error' in resume_data:
+                errors.append(f"Resume parsing failed or incomplete for candidate {candidate_id}")
+                continue
+
+            work.append((candidate_id, candidate.name, TextUtility.format_resume_text(resume_data)))
+
+        done = len(errors)
+        job_runner.report_progress(job, done, total=len(candidate_ids))
+
+        if work:
+            job_description = self.job_description(job_post)
+            pending_scores = {}
+            executor = ThreadPoolExecutor(
+                max_workers=min(resume_processing.score_workers, len(work)), thread_name_prefix='candidate-score'
+            )
+            futures = {
+                executor.submit(with_priority_context(self.score_resume_text), job_description, resume_text): (candidate_id, name)
+                for candidate_id, name, resume_text in work
+            }
+            try:
+                for future in as_completed(futures):
+                    candidate_id, name = futures[future]
+                    try:
+                        scoring_result = future.result()
+                        pending_scores[candidate_id] = scoring_result.get('overall_score', 0)
+                        results.append({
+                            'candidate_id': candidate_id,
+                            'candidate_name': name,
+                            'status': 'scored',
+                            'overall_score': pending_scores[candidate_id],
+                            'scoring_result': scoring_result
+                        })
+                    except Exception as e:
+                        errors.append(f"Error scoring candidate {candidate_id}: {str(e)}")
+
+                    done += 1
+                    if len(pending_scores) >= resume_processing.score_commit_batch or done == len(candidate_ids):
+                        self._apply_scores(job_id, pending_scores)
+                        pending_scores = {}
+                        # also raises JobCancelled when HR cancelled the job
+                        job_runner.report_progress(job, done)
+            finally:
+                # a cancelled job must not wait for the remaining calls
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        return {
+            'job_id': job_id,
+            'results': results,
+            'errors': errors,
+            'summary': {
+                'total_requested': len(candidate_ids),
+                'processed': len(results),
+                'errors': len(errors)
+            }
+        }
+
+
+@job_runner.handler('bulk_score', priority='batch')
+def run_bulk_score(job, payload):
+    service = CandidateScoringService(payload.get('model_name', 'gemini'))
+    return service.bulk_score(job, payload['job_id'], payload['candidate_ids'])
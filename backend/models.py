@@ -98,6 +98,14 @@ class Resume(db.Model):
     file_size = db.Column(db.Integer) 
     file_id = db.Column(db.String(36), db.ForeignKey('files.id'), nullable=True)  # ADD THIS
     parsed_data = db.Column(db.Text)
+    parsed_content_hash = db.Column(db.String(64))  # sha256 of the file parsed_data was built from
+    parsed_prompt_version = db.Column(db.String(20))  # PromptManager resume structure prompt version
+    parsed_at = db.Column(db.DateTime)
+    # upload pipeline (extract, scrub_pii, structure, embed, index), see ResumePipelineService
+    processing_status = db.Column(db.String(20))  # queued, processing, retrying, ready, failed
+    processing_stages = db.Column(db.Text)  # JSON: stage -> {"status", "seconds", "error", "at"}
+    processing_error = db.Column(db.Text)
+    processing_job_id = db.Column(db.String(36))
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     applications = db.relationship('Application', backref='resume', lazy=True)
@@ -108,6 +116,12 @@ class Resume(db.Model):
     
     def set_parsed_data(self, data):
         self.parsed_data = json.dumps(data)
+
+    def get_processing_stages(self):
+        return json.loads(self.processing_stages) if self.processing_stages else {}
+
+    def set_processing_stages(self, stages):
+        self.processing_stages = json.dumps(stages)
     
     def to_dict(self):
         return {
@@ -119,6 +133,12 @@ class Resume(db.Model):
             'file_size': self.file_size,  
             'file_id': self.file_id, 
             'parsed_data': self.get_parsed_data(),
+            'processing': {
+                'status': self.processing_status,
+                'stages': self.get_processing_stages(),
+                'error': self.processing_error,
+                'job_id': self.processing_job_id
+            },
             'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None
         }
 class Application(db.Model):
@@ -843,6 +863,41 @@ class AITestAssignment(db.Model):
             'submitted_at': self.submitted_at.isoformat() if self.submitted_at else None
         }
 
+class InterviewQuestionBank(db.Model):
+    """Pool of generated interview questions of a job post, shared by its candidates."""
+    __tablename__ = 'interview_question_banks'
+    __table_args__ = (db.UniqueConstraint('job_id', 'mix', 'prompt_version', name='uq_question_bank_job_mix'),)
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    job_id = db.Column(db.String(36), db.ForeignKey('job_posts.id'), nullable=False, index=True)
+    mix = db.Column(db.String(50), nullable=False)  # requested questions per difficulty, e.g. easy=3,medium=3,hard=4
+    prompt_version = db.Column(db.String(20), nullable=False)  # PromptManager mock interview prompt version
+    job_content_hash = db.Column(db.String(64))  # sha256 of the job title / description / requirements it was built from
+    questions = db.Column(db.Text, nullable=False)  # JSON: difficulty -> list of questions
+    times_sampled = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    job = db.relationship('JobPost', backref=db.backref('question_banks', cascade='all, delete-orphan'))
+
+    def get_questions(self):
+        return json.loads(self.questions) if self.questions else {}
+
+    def set_questions(self, data):
+        self.questions = json.dumps(data)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_id': self.job_id,
+            'mix': self.mix,
+            'prompt_version': self.prompt_version,
+            'question_counts': {level: len(questions) for level, questions in self.get_questions().items()},
+            'times_sampled': self.times_sampled or 0,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class AITestAssessment(db.Model):
     __tablename__ = 'ai_test_assessments'
     
@@ -931,4 +986,104 @@ class Task(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
-        
\ No newline at end of file
+        
+
+class PolicyDocument(db.Model):
+    __tablename__ = 'policy_documents'
+    __table_args__ = (db.UniqueConstraint('school_id', 'source_path', name='uq_policy_document_source'),)
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    school_id = db.Column(db.String(36), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    source_path = db.Column(db.String(500), nullable=False)
+    content_hash = db.Column(db.String(64))  # sha256 of the ingested file
+    chunk_count = db.Column(db.Integer, default=0)
+    status = db.Column(db.String(20), default='pending')  # pending, ingested, failed
+    error = db.Column(db.Text)
+    ingested_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'school_id': self.school_id,
+            'filename': self.filename,
+            'source_path': self.source_path,
+            'content_hash': self.content_hash,
+            'chunk_count': self.chunk_count,
+            'status': self.status,
+            'error': self.error,
+            'ingested_at': self.ingested_at.isoformat() if self.ingested_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class BackgroundJob(db.Model):
+    __tablename__ = 'background_jobs'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    job_type = db.Column(db.String(50), nullable=False, index=True)
+    status = db.Column(db.String(20), default='queued', index=True)  # queued, running, succeeded, failed, cancelled
+    dedup_key = db.Column(db.String(64), index=True)  # identical active submissions share one job
+    payload = db.Column(db.Text)  # JSON
+    result = db.Column(db.Text)  # JSON
+    error = db.Column(db.Text)
+    progress_done = db.Column(db.Integer, default=0)
+    progress_total = db.Column(db.Integer, default=0)
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    run_after = db.Column(db.DateTime)  # not picked up before this time (retry backoff)
+    cancel_requested = db.Column(db.Boolean, default=False)
+    worker_id = db.Column(db.String(100))
+    heartbeat_at = db.Column(db.DateTime)
+    created_by_id = db.Column(db.String(36), db.ForeignKey('users.id'))
+    subscriber_ids = db.Column(db.Text)  # JSON list, other users whose identical submission got this job
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def get_subscriber_ids(self):
+        return json.loads(self.subscriber_ids) if self.subscriber_ids else []
+
+    def add_subscriber(self, user_id):
+        """Let `user_id` poll this job too, False if they already can."""
+        subscriber_ids = self.get_subscriber_ids()
+        if not user_id or user_id == self.created_by_id or user_id in subscriber_ids:
+            return False
+        self.subscriber_ids = json.dumps(subscriber_ids + [user_id])
+        return True
+
+    def get_payload(self):
+        return json.loads(self.payload) if self.payload else {}
+
+    def set_payload(self, data):
+        self.payload = json.dumps(data)
+
+    def get_result(self):
+        return json.loads(self.result) if self.result else None
+
+    def set_result(self, data):
+        self.result = json.dumps(data)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'result': self.get_result(),
+            'error': self.error,
+            'progress': {
+                'done': self.progress_done or 0,
+                'total': self.progress_total or 0
+            },
+            'attempts': self.attempts or 0,
+            'max_attempts': self.max_attempts,
+            'cancel_requested': bool(self.cancel_requested),
+            'created_by_id': self.created_by_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -1,13 +1,14 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from app import db
 from models import (
     AITestAssessment, AITestAssignment, User, Role, JobPost, Resume, Application, Interview,
     Training, Course, Enrollment, Report, EODReport, ExpenseReport,
-    PerformanceReview, Notification, AuditLog
+    PerformanceReview, Notification, AuditLog, PolicyDocument
 )
 from genai.services import (
-    AIPerformanceReview, ChatbotService, ResumeService, ResumeMatch, JobService, 
-    RecommendationService, InterviewService, ProfileEnhancementService, JobDescriptionService, ParseResume, UpskillingPathService
+    AIPerformanceReview, ChatbotService, chatbot_service, ResumeService, ResumeMatch, policy_ingestion_service,
+    RecommendationService, InterviewService, ProfileEnhancementService, JobDescriptionService, ParseResume, UpskillingPathService,
+    course_retrieval_service, question_bank_service
 )
 from genai.schema.schema_manager import (
     PerformanceReviewRequest, ProfileEnhancementRequest, JobDescriptionRequest,
@@ -16,15 +17,25 @@ from genai.schema.schema_manager import (
     JobDescriptionResponse, InterviewQuestionsResponse, UpskillingPathResponse,
     JobPostsResponse, ErrorResponse
 )
+from genai.cache import llm_response_cache, semantic_answer_cache
+from genai.llm_client import llm_client, llm_router, llm_dispatcher
+from utils.json_stream import json_parse_stats
+from genai.prompt import prompt_budget
 from utils.validation_json import validate_json, validate_uuid
+from workers import job_runner, JobFailed
+from utils.single_flight import single_flight
+from routes.background_job_routes import queued_response
+import os
 import json
 from datetime import datetime
+from werkzeug.utils import secure_filename
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 ai_bp = Blueprint('ai', __name__)
 
 # ai performance review
 @ai_bp.route('/performance_review', methods=['POST'])
+@jwt_required()
 @validate_json(PerformanceReviewRequest)
 def ai_performance_review(validated_data: PerformanceReviewRequest):
     """
@@ -35,7 +46,7 @@ def ai_performance_review(validated_data: PerformanceReviewRequest):
         manager_review (str): The manager's review of the employee.
 
     Returns:
-        str: The generated performance review.
+        202 with the background job; its result is the generated performance review.
     """
     try:
         if not validate_uuid(validated_data.employee_id) or not validate_uuid(validated_data.reviewer_id):
@@ -49,27 +60,13 @@ def ai_performance_review(validated_data: PerformanceReviewRequest):
         if not reviewer:
             return jsonify({'error': 'Reviewer not found'}), 404
 
-        ai_review_service = AIPerformanceReview()
-        performance_review = ai_review_service.generate_performance_review(
-            validated_data.employee_review, 
-            validated_data.manager_review
-        )
-
-        performance_review = PerformanceReview(
-            employee_id=str(validated_data.employee_id),
-            reviewer_id=str(validated_data.reviewer_id),
-            type='ai_performance_review',
-            text=json.dumps(performance_review),
-            rating=None
-        )
-
-        db.session.add(performance_review)
-        db.session.commit()
-
-        response = PerformanceReviewResponse(
-            performance_review = performance_review.to_dict()
-        )
-        return jsonify(response.dict()), 200
+        job = job_runner.submit('performance_review', {
+            'employee_id': str(validated_data.employee_id),
+            'reviewer_id': str(validated_data.reviewer_id),
+            'employee_review': validated_data.employee_review,
+            'manager_review': validated_data.manager_review
+        }, created_by_id=get_jwt_identity())
+        return queued_response(job, 'Performance review queued')
     
     except Exception as e:
         db.session.rollback()
@@ -77,11 +74,36 @@ def ai_performance_review(validated_data: PerformanceReviewRequest):
             error=f"Error generating performance review: {str(e)}"
         )
         return jsonify(error_response.dict()), 500
-    
+
+
+@job_runner.handler('performance_review')
+def run_performance_review(job, payload):
+    ai_review_service = AIPerformanceReview()
+    performance_review = ai_review_service.generate_performance_review(
+        payload['employee_review'],
+        payload['manager_review']
+    )
+
+    performance_review = PerformanceReview(
+        employee_id=payload['employee_id'],
+        reviewer_id=payload['reviewer_id'],
+        type='ai_performance_review',
+        text=json.dumps(performance_review),
+        rating=None
+    )
+
+    db.session.add(performance_review)
+    db.session.commit()
+
+    return PerformanceReviewResponse(
+        performance_review = performance_review.to_dict()
+    ).dict()
+
 
 
 ## generating interview questions for a job post
 @ai_bp.route('/interview_questions/<job_post_id>', methods=['GET'])
+@jwt_required()
 def generate_interview_questions(job_post_id):
     """
     Generate interview questions for a given job post.
@@ -94,31 +116,34 @@ def generate_interview_questions(job_post_id):
         n_medium_questions: number of medium questions to generate
         n_hard_questions: number of hard questions to generate
     Returns:
-        A JSON object containing the generated interview questions
+        202 with the background job; its result holds the generated interview questions
     """
     try:
-        job_post = JobPost.query.get_or_404(job_post_id)
-        job_title = job_post.title
-        job_description = job_post.description
-        job_requirements = job_post.requirements
-        # data = request.get_json()
-        # job_title = data.get('job_title')
-        # job_description = data.get('job_description')
-        # job_requirements = data.get('job_requirements')
-        n_easy_questions = 3
-        n_medium_questions = 3
-        n_hard_questions = 10
-
-        interview_service = InterviewService()
-
-        interview_question = interview_service.generate_mock_interview(job_title, job_description, job_requirements, n_easy_questions, n_medium_questions, n_hard_questions)
-        if not interview_question:
-            return jsonify({'error': 'Failed to generate interview questions'}), 500
-        return jsonify({'interview_questions': interview_question}), 200
+        JobPost.query.get_or_404(job_post_id)
+        # concurrent requests for the same job post share one generation
+        job = job_runner.submit('interview_questions', {'job_post_id': job_post_id}, created_by_id=get_jwt_identity(), coalesce=True)
+        return queued_response(job, 'Interview questions queued')
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+@job_runner.handler('interview_questions')
+def run_interview_questions(job, payload):
+    job_post = JobPost.query.get(payload['job_post_id'])
+    if not job_post:
+        raise JobFailed('Job post not found')
+    # sampled from the job's question bank, the LLM is only asked when the job has none yet
+    try:
+        interview_question = question_bank_service.questions_for(
+            job_post, generator=InterviewService(), created_by_id=job.created_by_id
+        )
+    except ValueError as e:
+        raise JobFailed(str(e))
+    if not interview_question:
+        raise JobFailed('Failed to generate interview questions')
+    return {'interview_questions': interview_question}
+
     
 
 ## profile enhancement - suggestion from ai to make correction in candidate's resume
@@ -189,6 +214,7 @@ def make_JD():
 ### get resume wise score from job title 
 
 @ai_bp.route('/get_resume_score/<job_post_id>', methods=['GET'])
+@jwt_required()
 def get_resume_score(job_post_id):
     """
     Get the resume score for a given job post.
@@ -197,27 +223,34 @@ def get_resume_score(job_post_id):
         job_post_id (int): The id of the job post.
 
     Returns:
-        A JSON object containing the resume score.
+        202 with the background job; its result holds the resume score.
     """
     try:
 
-        jobpost = JobPost.query.get_or_404(job_post_id)
-        job_title = jobpost.title
-        job_description = jobpost.description
-        job_requirements = jobpost.requirements
-
+        JobPost.query.get_or_404(job_post_id)
+        job = job_runner.submit('resume_score', {'job_post_id': job_post_id}, created_by_id=get_jwt_identity(), coalesce=True)
+        return queued_response(job, 'Resume scoring queued')
 
-        resume_match = ResumeMatch()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        top_resume = resume_match.resume_match(job_title, job_description, job_requirements, job_post_id)
 
-        if not top_resume:
-            return jsonify({'error': 'Failed to get resume score'}), 500
-        
-        return jsonify({'resume_score': top_resume}), 200
+@job_runner.handler('resume_score', priority='batch')
+def run_resume_score(job, payload):
+    jobpost = JobPost.query.get(payload['job_post_id'])
+    if not jobpost:
+        raise JobFailed('Job post not found')
 
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    resume_match = ResumeMatch()
+    try:
+        top_resume = resume_match.resume_match(jobpost.title, jobpost.description, jobpost.requirements, jobpost.id)
+    except ValueError as e:
+        # e.g. no applications to score
+        raise JobFailed(str(e))
+
+    if not top_resume:
+        raise JobFailed('Failed to get resume score')
+    return {'resume_score': top_resume}
     
 
 
@@ -242,8 +275,9 @@ def get_courses(resume_id):
             return jsonify({'error': 'Failed to parse resume'}), 500
         
         course_recommendation = RecommendationService()
-        courses=Course.query.all()
-        course_details = [(course.to_dict().get('title'), course.to_dict().get('duration'), course.to_dict().get('content_url')) for course in courses]
+        # only the courses closest to the resume and job reach the prompt
+        courses = course_retrieval_service.relevant_courses(parsed_resume, job_title)
+        course_details = [(course['title'], course['duration_mins'], course['content_url']) for course in courses]
         course_recommendation = course_recommendation.generate_course_recommendations(parsed_resume, job_title, course_details)
         if not course_recommendation:
             return jsonify({'error': 'Failed to generate course recommendation'}), 500
@@ -278,7 +312,6 @@ def chatbot(school_id):
                 'error': 'Question is required'
             }), 400
         
-        chatbot_service = ChatbotService()
         answer = chatbot_service.chat(school_id, question)
         
         if not answer:
@@ -299,6 +332,128 @@ def chatbot(school_id):
         }), 500
 
 
+### chatbot - streamed over server sent events
+@ai_bp.route('/chatbot/<school_id>/stream', methods=['POST'])
+@jwt_required()
+def chatbot_stream(school_id):
+    """
+    Chat with AI assistant about school policies, streaming the answer.
+
+    Responds with `text/event-stream`: a `context` event with the retrieved
+    sources, `token` events carrying answer text as Gemini produces it, and a
+    final `done` (full answer) or `error` event.
+
+    Args:
+        school_id (str): The school ID.
+        question (str): The user's question.
+    """
+    data = request.get_json(silent=True) or {}
+    question = data.get('question')
+
+    if not question:
+        return jsonify({
+            'success': False,
+            'error': 'Question is required'
+        }), 400
+
+    def event_stream():
+        for event, payload in chatbot_service.stream_chat(school_id, question):
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return Response(
+        stream_with_context(event_stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def _is_admin():
+    current_user = User.query.get(get_jwt_identity())
+    return current_user is not None and current_user.role is not None and current_user.role.name == 'admin'
+
+
+### chatbot policy documents (admin / hr)
+def _is_policy_admin():
+    current_user = User.query.get(get_jwt_identity())
+    return current_user is not None and current_user.role is not None and current_user.role.name in ['admin', 'hr']
+
+
+@ai_bp.route('/chatbot/<school_id>/documents', methods=['GET'])
+@jwt_required()
+def list_policy_documents(school_id):
+    """
+    List the policy documents ingested for a school.
+
+    Returns:
+        A JSON object containing the registered documents.
+    """
+    try:
+        if not _is_policy_admin():
+            return jsonify({'error': 'Access denied'}), 403
+        documents = policy_ingestion_service.list_documents(school_id)
+        return jsonify({'documents': [document.to_dict() for document in documents]}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@ai_bp.route('/chatbot/<school_id>/documents', methods=['POST'])
+@jwt_required()
+def ingest_policy_documents(school_id):
+    """
+    Ingest school policy documents for the chatbot.
+
+    With a multipart `file` the upload is stored and ingested; without one every
+    registered document of the school is refreshed. Unchanged files are skipped,
+    changed files only embed their new chunks. `force=true` re-chunks anyway.
+
+    Returns:
+        A JSON object with the ingestion result per document.
+    """
+    try:
+        if not _is_policy_admin():
+            return jsonify({'error': 'Access denied'}), 403
+
+        force = str(request.values.get('force', 'false')).lower() == 'true'
+        file = request.files.get('file')
+
+        if file is None:
+            results = policy_ingestion_service.reingest_school(school_id, force=force)
+            return jsonify({'results': results}), 200
+
+        filename = secure_filename(file.filename or '')
+        if not filename.lower().endswith(policy_ingestion_service.supported_extensions):
+            return jsonify({'error': 'Only .pdf, .docx and .txt policy documents are supported'}), 400
+
+        folder = os.path.join(current_app.config['POLICY_UPLOAD_FOLDER'], secure_filename(str(school_id)))
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, filename)
+        file.save(path)
+
+        result = policy_ingestion_service.ingest(school_id, path, force=force)
+        status_code = 500 if result['status'] == 'failed' else 200
+        return jsonify({'results': [{'path': path, **result}]}), status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@ai_bp.route('/chatbot/<school_id>/documents/<document_id>', methods=['DELETE'])
+@jwt_required()
+def delete_policy_document(school_id, document_id):
+    """
+    Remove a policy document and its chunks from the school's chatbot index.
+    """
+    try:
+        if not _is_policy_admin():
+            return jsonify({'error': 'Access denied'}), 403
+        document = PolicyDocument.query.filter_by(id=document_id, school_id=str(school_id)).first()
+        if document is None:
+            return jsonify({'error': 'Document not found'}), 404
+        removed = policy_ingestion_service.remove(document)
+        return jsonify({'message': 'Document removed', 'chunks_removed': removed}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 ### get job posts based on resume 
 @ai_bp.route('/get_job_posts/<resume_id>', methods=['GET'])
 def get_job_posts(resume_id):
@@ -312,10 +467,8 @@ def get_job_posts(resume_id):
         A JSON object containing the job posts.
     """
     try:
+        # job_post collection is kept in sync by job_post_indexer on every job write
         resume_service = ResumeService()
-        
-        job_service = JobService()
-        job_service.store_multiple_job_posts()
 
         job_post = resume_service.resume_service(resume_id)
         print(job_post)
@@ -336,8 +489,8 @@ def get_upskilling_path(resume_id):
     try:
         data=request.get_json()
         parsed_resume = ParseResume.parse_resume_text(resume_id)
-        courses=Course.query.all()
-        course_details = [(course.to_dict().get('id'),course.to_dict().get('title'), course.to_dict().get('duration'), course.to_dict().get('content_url')) for course in courses]
+        courses = course_retrieval_service.relevant_courses(parsed_resume, data.get('job_title'), data.get('job_description'))
+        course_details = [(course['id'], course['title'], course['duration_mins'], course['content_url']) for course in courses]
         upskilling_path = UpskillingPathService()
         output = upskilling_path.get_upskilling_path(parsed_resume, data.get('job_title'), data.get('job_description'), course_details)
 
@@ -352,19 +505,86 @@ def get_upskilling_path(resume_id):
         return jsonify({'error': str(e)}), 500
 
 
+### LLM response cache statistics
+@ai_bp.route('/cache_stats', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    """
+    Get hit/miss counters of the shared LLM response cache and request coalescing (admin only).
+
+    Returns:
+        A JSON object containing the cache statistics.
+    """
+    try:
+        if not _is_admin():
+            return jsonify({'error': 'Access denied'}), 403
+        return jsonify({
+            'cache_stats': llm_response_cache.stats(),
+            'chatbot_cache': semantic_answer_cache.stats(),
+            'single_flight': single_flight.stats(),
+            'background_jobs': job_runner.stats()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+### LLM client statistics (rate limiting, retries, latency per provider)
+@ai_bp.route('/llm_stats', methods=['GET'])
+@jwt_required()
+def get_llm_stats():
+    """
+    Get per provider call, retry, rate limit, latency and circuit breaker stats of the shared
+    LLM client, failover / hedging counters, per priority class queue depth and wait times,
+    the tokens saved by prompt budgeting per template and JSON extraction times per schema
+    (admin only).
+
+    Returns:
+        A JSON object containing the client statistics.
+    """
+    try:
+        if not _is_admin():
+            return jsonify({'error': 'Access denied'}), 403
+        return jsonify({
+            'llm_stats': llm_client.stats(),
+            'routing': llm_router.stats(),
+            'dispatch': llm_dispatcher.stats(),
+            'prompt_budget': prompt_budget.stats(),
+            'json_parsing': json_parse_stats.stats()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 # Add these new routes to your existing ai_routes.py
 
 @ai_bp.route('/schedule-test', methods=['POST'])
+@jwt_required()
 def schedule_test():
-    """Schedule an AI test for a candidate"""
+    """
+    Schedule an AI test for a candidate.
+
+    Without `questions` in the body they are sampled from the job's question bank
+    (a database read); if the job has no bank yet it is generated in the background
+    and 202 is returned with that job, schedule again once it has finished.
+    """
     try:
         data = request.get_json()
-        
+
+        questions = data.get('questions')
+        if not questions:
+            job_post = JobPost.query.get(data['job_id'])
+            if not job_post:
+                return jsonify({'error': 'Job not found'}), 404
+            sampled, job = question_bank_service.stored_questions_for(job_post, data['candidate_id'], created_by_id=get_jwt_identity())
+            if sampled is None:
+                return queued_response(job, 'Question bank is being generated, schedule the test again once it is ready')
+            questions = json.dumps(sampled)
+
         test_assignment = AITestAssignment(
             candidate_id=data['candidate_id'],
             job_id=data['job_id'],
-            test_type=data['test_type'],
-            questions=data['questions'],
+            test_type=data.get('test_type', 'ai_technical_test'),
+            questions=questions,
             duration_minutes=data['duration_minutes'],
             deadline=datetime.fromisoformat(data['deadline']),
             instructions=data.get('instructions', ''),
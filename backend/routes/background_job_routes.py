@@ -0,0 +1,74 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app import db
+from models import BackgroundJob, User
+from workers import job_runner
+
+background_job_bp = Blueprint('background_jobs', __name__)
+
+
+def queued_response(job, message):
+    """202 answer of the endpoints that hand their work to the job queue."""
+    return jsonify({
+        'message': message,
+        'job_id': job.id,
+        'status_url': f'/api/background-jobs/{job.id}',
+        'job': job.to_dict()
+    }), 202
+
+
+def can_view_job(job, user_id):
+    """
+    Jobs are visible to the users who submitted them (the first submitter and those
+    whose identical submission was coalesced into it); ownerless (internal) jobs only to admins.
+    """
+    if user_id is not None and (job.created_by_id == user_id or user_id in job.get_subscriber_ids()):
+        return True
+    user = User.query.get(user_id)
+    return user is not None and user.role is not None and user.role.name == 'admin'
+
+
+def _get_visible_job(job_id):
+    job = BackgroundJob.query.get(job_id)
+    if not job:
+        return None, (jsonify({'error': 'Background job not found'}), 404)
+    if not can_view_job(job, get_jwt_identity()):
+        return None, (jsonify({'error': 'Unauthorized'}), 403)
+    return job, None
+
+
+@background_job_bp.route('/<job_id>', methods=['GET'])
+@jwt_required()
+def get_background_job(job_id):
+    """Status, progress and (once finished) result of a queued AI job"""
+    try:
+        job, error = _get_visible_job(job_id)
+        if error:
+            return error
+        return jsonify(job.to_dict()), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@background_job_bp.route('/<job_id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel_background_job(job_id):
+    """Cancel a queued job, or ask a running one to stop at its next progress report"""
+    try:
+        job, error = _get_visible_job(job_id)
+        if error:
+            return error
+
+        if job.status in ('succeeded', 'failed', 'cancelled'):
+            return jsonify({'error': f'Job already {job.status}'}), 409
+
+        job = job_runner.cancel(job)
+        return jsonify({
+            'message': 'Job cancelled' if job.status == 'cancelled' else 'Cancellation requested',
+            'job': job.to_dict()
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from models import ExpenseReport, Report, User
+from workers import job_runner, JobFailed
+from routes.background_job_routes import queued_response
+from utils.file_utils import get_data_root
 from datetime import datetime
 import os
 import uuid
@@ -9,7 +13,7 @@ import uuid
 expense_bp = Blueprint('expenses', __name__)
 
 # Configuration
-UPLOAD_FOLDER = './uploads/receipts'
+UPLOAD_FOLDER = os.path.join(get_data_root(), 'uploads', 'receipts')
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 
@@ -482,45 +486,55 @@ def get_expense_reports():
 
 # 8. AI VERIFICATION (Placeholder for future AI integration)
 @expense_bp.route('/ai-verify/<expense_id>', methods=['POST'])
+@jwt_required()
 def ai_verify_expense(expense_id):
     """
-    AI-powered expense verification
+    AI-powered expense verification, runs as a background job
     This is a placeholder for future AI integration
     """
     try:
-        expense = ExpenseReport.query.get_or_404(expense_id)
-        items = expense.get_items()
-        
-        # Placeholder AI verification logic
-        # In a real implementation, this would:
-        # 1. Extract text from receipt images using OCR
-        # 2. Compare extracted amounts with claimed amounts
-        # 3. Check for policy violations
-        # 4. Flag suspicious expenses
-        
-        verification_results = []
-        for item in items:
-            verification_results.append({
-                'item': item.get('description'),
-                'claimed_amount': item.get('amount'),
-                'verified_amount': item.get('amount'),  # Placeholder
-                'confidence_score': 0.95,  # Placeholder
-                'policy_compliant': True,  # Placeholder
-                'flags': []  # Placeholder for any issues
-            })
-        
-        return jsonify({
-            'expense_id': expense_id,
-            'verification_status': 'verified',
-            'overall_confidence': 0.95,
-            'results': verification_results,
-            'recommendations': 'All expenses appear valid and policy-compliant.'
-        }), 200
+        ExpenseReport.query.get_or_404(expense_id)
+        job = job_runner.submit('expense_ai_verify', {'expense_id': expense_id}, created_by_id=get_jwt_identity())
+        return queued_response(job, 'Expense verification queued')
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@job_runner.handler('expense_ai_verify', priority='batch')
+def run_expense_ai_verify(job, payload):
+    expense = ExpenseReport.query.get(payload['expense_id'])
+    if not expense:
+        raise JobFailed('Expense not found')
+    items = expense.get_items()
+    
+    # Placeholder AI verification logic
+    # In a real implementation, this would:
+    # 1. Extract text from receipt images using OCR
+    # 2. Compare extracted amounts with claimed amounts
+    # 3. Check for policy violations
+    # 4. Flag suspicious expenses
+    
+    verification_results = []
+    for item in items:
+        verification_results.append({
+            'item': item.get('description'),
+            'claimed_amount': item.get('amount'),
+            'verified_amount': item.get('amount'),  # Placeholder
+            'confidence_score': 0.95,  # Placeholder
+            'policy_compliant': True,  # Placeholder
+            'flags': []  # Placeholder for any issues
+        })
+    
+    return {
+        'expense_id': expense.id,
+        'verification_status': 'verified',
+        'overall_confidence': 0.95,
+        'results': verification_results,
+        'recommendations': 'All expenses appear valid and policy-compliant.'
+    }
+
+
 # 9. POLICY CHECK
 @expense_bp.route('/policy-check/<expense_id>', methods=['GET'])
 def policy_check_expense(expense_id):
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify, send_file
 from werkzeug.utils import secure_filename
 from app import db
 from models import File, Resume, User
+from genai.services.resume_pipeline_service import resume_pipeline_service
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import os
 import uuid
@@ -9,10 +10,11 @@ import base64
 import mimetypes
 import docx2txt
 from datetime import datetime
+from utils.file_utils import get_data_root
 file_bp = Blueprint('files', __name__)
 
 # Configuration
-UPLOAD_FOLDER = './uploads/files'
+UPLOAD_FOLDER = os.path.join(get_data_root(), 'uploads', 'files')
 ALLOWED_EXTENSIONS = {'pdf', 'docx'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
@@ -741,11 +743,22 @@ def upload_resume():
         
         db.session.commit()
         
+        # Extract, structure, embed and index in the background, the upload does not wait for the LLM
+        try:
+            job = resume_pipeline_service.start(resume_record, created_by_id=current_user_id)
+        except Exception as e:
+            # the resume is saved, matching parses it on demand
+            db.session.rollback()
+            print(f"Resume pipeline could not be queued: {e}")
+            job = None
+        
         return jsonify({
             'success': True,
             'message': 'Resume uploaded successfully',
             'file': new_file.to_dict(),
-            'resume': resume_record.to_dict()
+            'resume': resume_record.to_dict(),
+            'job_id': job.id if job else None,
+            'status_url': f'/api/background-jobs/{job.id}' if job else None
         }), 201
     
     except Exception as e:
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from app import db
 from models import JobPost
 from genai.services.recommendation_service import RecommendationService
+from genai.services.question_bank_service import question_bank_service
 from genai.prompt import PromptManager
 from genai.llm_factory import LLMModelFactory
 from utils import TextUtility
@@ -66,6 +67,12 @@ def update_job(job_id):
         job.status = data.get('status', job.status)
         
         db.session.commit()
+
+        # question banks built from the old description are regenerated in the background
+        try:
+            question_bank_service.refresh_stale_banks(job)
+        except Exception as e:
+            print(f"Could not queue question bank refresh for job {job.id}: {e}")
         
         return jsonify({'message': 'Job post updated successfully', 'job': job.to_dict()}), 200
     
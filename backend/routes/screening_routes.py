@@ -1,12 +1,17 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from models import InterviewerAssignment, Resume, User, Application, JobPost
-from genai.services.resume_service import ResumeService
+from models import InterviewerAssignment, Resume, User, Application, JobPost, BackgroundJob
+from genai.services.resume_pipeline_service import resume_pipeline_service
 from genai.services.recommendation_service import RecommendationService
+from genai.services.screening_service import CandidateScoringService
+from workers import job_runner
+from routes.background_job_routes import can_view_job
 from genai.prompt import PromptManager
 from genai.llm_factory import LLMModelFactory
+from genai.llm_client import llm_priority
 from utils import TextUtility
+from utils.file_utils import get_data_root
 import os
 from werkzeug.utils import secure_filename
 from datetime import datetime
@@ -23,6 +28,7 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 @screening_bp.route('/upload-resume', methods=['POST'])
+@jwt_required()
 def upload_resume():
     """Upload and parse a resume for a candidate"""
     try:
@@ -51,7 +57,7 @@ def upload_resume():
             filename = f"{user_id}_{timestamp}_{filename}"
             
             # Create uploads directory if it doesn't exist
-            upload_dir = os.path.join(os.path.dirname(__file__), '..', 'uploads', 'resumes')
+            upload_dir = os.path.join(get_data_root(), 'uploads', 'resumes')
             os.makedirs(upload_dir, exist_ok=True)
             
             # Save file
@@ -66,27 +72,22 @@ def upload_resume():
             )
             
             db.session.add(resume)
-            db.session.flush()  # Get the resume ID
+            db.session.commit()
             
-            # Process resume using AI service
+            # Extract, structure, embed and index in the background, the upload does not wait for the LLM
             try:
-                resume_service = ResumeService(file_path, user_id, resume.id)
-                parsed_resume_data = resume_service.resume_service()
-                
-                # Store parsed data
-                resume.set_parsed_data(parsed_resume_data)
-                
+                job = resume_pipeline_service.start(resume, created_by_id=get_jwt_identity())
             except Exception as e:
-                # If AI processing fails, still save the resume but without parsed data
-                print(f"AI processing failed: {e}")
-                resume.set_parsed_data({'error': 'AI processing failed', 'raw_error': str(e)})
-            
-            db.session.commit()
+                # the resume is saved, matching parses it on demand
+                db.session.rollback()
+                print(f"Resume pipeline could not be queued: {e}")
+                job = None
             
             return jsonify({
-                'message': 'Resume uploaded and processed successfully',
+                'message': 'Resume uploaded, processing started' if job else 'Resume uploaded successfully',
                 'resume': resume.to_dict(),
-                'recommended_jobs': parsed_resume_data if 'error' not in str(parsed_resume_data) else []
+                'job_id': job.id if job else None,
+                'status_url': f'/api/background-jobs/{job.id}' if job else None
             }), 201
         
         else:
@@ -136,53 +137,21 @@ def score_candidate():
         # Format resume for AI processing
         resume_text = TextUtility.format_resume_text(resume_data)
         
-        # Create a comprehensive job description for scoring
-        job_description = f"""
-        Title: {job.title}
-        Description: {job.description or 'Not provided'}
-        Requirements: {job.requirements or 'Not provided'}
-        Location: {job.location or 'Not specified'}
-        Level: {job.level or 'Not specified'}
-        """
-        
-        # Generate AI score using skill gap analysis prompt (we'll create a new one)
-        prompt = f"""
-        You are an expert HR recruiter. Score this candidate against the job requirements.
-        Provide a detailed analysis and score from 0-100.
-        
-        Respond only in valid JSON format:
-        {{
-            "overall_score": 85,
-            "category_scores": {{
-                "skills_match": 90,
-                "experience_match": 80,
-                "education_match": 85,
-                "location_match": 95
-            }},
-            "strengths": ["Strong technical skills", "Relevant experience"],
-            "weaknesses": ["Limited leadership experience"],
-            "recommendation": "strong_fit",
-            "summary": "Excellent candidate with strong technical background"
-        }}
-        
-        Job Details:
-        {job_description}
-        
-        Candidate Resume:
-        {resume_text}
-        
-        Score this candidate comprehensively considering skills, experience, education, and overall fit.
-        """
+        # Same prompt the bulk-score job uses
+        job_description = CandidateScoringService.job_description(job)
+        prompt = PromptManager.score_candidate_prompt(job_description, resume_text)
         
         # Get LLM and generate score
         try:
-            llm = LLMModelFactory.get_model_provider(model_name).get_model()
-            response = llm.generate_content(prompt)
+            provider = LLMModelFactory.get_model_provider(model_name)
+            # a recruiter is waiting on this one, it goes ahead of bulk scoring
+            with llm_priority('interactive'):
+                response = provider.generate(prompt, template='score_candidate_prompt')
             
-            if not response or not response.text:
+            if not response:
                 raise ValueError("Empty response from LLM")
             
-            scoring_result = TextUtility.remove_json_marker(response.text)
+            scoring_result = TextUtility.remove_json_marker(response)
             
         except Exception as e:
             return jsonify({'error': f'AI scoring failed: {str(e)}'}), 500
@@ -366,8 +335,9 @@ def update_candidate_action(candidate_id):
         return jsonify({'error': str(e)}), 500
 
 @screening_bp.route('/bulk-score', methods=['POST'])
+@jwt_required()
 def bulk_score_candidates():
-    """Score multiple candidates against a job"""
+    """Queue a job scoring multiple candidates against a job, poll /bulk-score/<scoring_job_id> for results"""
     try:
         data = request.get_json()
         
@@ -386,44 +356,36 @@ def bulk_score_candidates():
         if not job:
             return jsonify({'error': 'Job not found'}), 404
         
-        results = []
-        errors = []
-        
-        for candidate_id in candidate_ids:
-            try:
-                # Process each candidate (reuse logic from score_candidate)
-                candidate = User.query.get(candidate_id)
-                if not candidate:
-                    errors.append(f"Candidate {candidate_id} not found")
-                    continue
-                
-                latest_resume = Resume.query.filter_by(owner_id=candidate_id).order_by(Resume.uploaded_at.desc()).first()
-                if not latest_resume:
-                    errors.append(f"No resume found for candidate {candidate_id}")
-                    continue
-                
-                # Add to results (simplified for bulk operation)
-                results.append({
-                    'candidate_id': candidate_id,
-                    'candidate_name': candidate.name,
-                    'status': 'processed',
-                    'has_resume': True
-                })
-                
-            except Exception as e:
-                errors.append(f"Error processing candidate {candidate_id}: {str(e)}")
+        scoring_job = job_runner.submit(
+            'bulk_score',
+            {'job_id': job_id, 'candidate_ids': candidate_ids, 'model_name': model_name},
+            created_by_id=get_jwt_identity(),
+            total=len(candidate_ids)
+        )
         
         return jsonify({
-            'message': f'Bulk scoring completed. Processed {len(results)} candidates',
-            'job_id': job_id,
-            'results': results,
-            'errors': errors,
-            'summary': {
-                'total_requested': len(candidate_ids),
-                'processed': len(results),
-                'errors': len(errors)
-            }
-        }), 200
+            'message': f'Bulk scoring queued for {len(candidate_ids)} candidates',
+            'scoring_job_id': scoring_job.id,
+            'status_url': f'/api/screening/bulk-score/{scoring_job.id}',
+            'job': scoring_job.to_dict()
+        }), 202
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@screening_bp.route('/bulk-score/<scoring_job_id>', methods=['GET'])
+@jwt_required()
+def get_bulk_score_status(scoring_job_id):
+    """Progress and (once finished) results of a bulk scoring job"""
+    try:
+        scoring_job = BackgroundJob.query.filter_by(id=scoring_job_id, job_type='bulk_score').first()
+        if not scoring_job:
+            return jsonify({'error': 'Scoring job not found'}), 404
+        if not can_view_job(scoring_job, get_jwt_identity()):
+            return jsonify({'error': 'Unauthorized'}), 403
+        
+        return jsonify(scoring_job.to_dict()), 200
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -4,6 +4,8 @@ from app import db
 from models import Task, User, PerformanceReview
 from datetime import datetime, timedelta
 from genai.services import AIPerformanceReview
+from workers import job_runner, JobFailed
+from routes.background_job_routes import queued_response
 import json
 
 task_bp = Blueprint('tasks', __name__)
@@ -172,7 +174,7 @@ def submit_manager_review(task_id):
 @task_bp.route('/<task_id>/generate-ai-summary', methods=['POST'])
 @jwt_required()
 def generate_ai_summary(task_id):
-    """Generate AI summary combining employee and manager reviews"""
+    """Queue an AI summary combining employee and manager reviews"""
     try:
         current_user_id = get_jwt_identity()
         task = Task.query.get_or_404(task_id)
@@ -184,47 +186,57 @@ def generate_ai_summary(task_id):
         if not task.employee_review or not task.manager_review:
             return jsonify({'error': 'Both employee and manager reviews are required'}), 400
         
-        # Generate AI summary using existing service
-        ai_review_service = AIPerformanceReview()
-        ai_summary = ai_review_service.generate_performance_review(
-            task.employee_review,
-            task.manager_review
-        )
-        
-        # Save AI summary to task
-        task.ai_summary = json.dumps(ai_summary)
-        task.ai_summary_generated_at = datetime.utcnow()
-        
-        # Also create a performance review record
-        performance_review = PerformanceReview(
-            employee_id=task.assigned_to_id,
-            reviewer_id=task.assigned_by_id,
-            type='task_performance_review',
-            text=json.dumps({
-                'task_id': task.id,
-                'task_title': task.title,
-                'employee_review': task.employee_review,
-                'manager_review': task.manager_review,
-                'ai_summary': ai_summary
-            }),
-            rating=None
-        )
-        
-        db.session.add(performance_review)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'AI summary generated successfully',
-            'task': task.to_dict(),
-            'ai_summary': ai_summary,
-            'performance_review_id': performance_review.id
-        }), 200
+        job = job_runner.submit('task_ai_summary', {'task_id': task.id}, created_by_id=current_user_id)
+        return queued_response(job, 'AI summary queued')
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
+@job_runner.handler('task_ai_summary', priority='batch')
+def run_task_ai_summary(job, payload):
+    task = Task.query.get(payload['task_id'])
+    if not task:
+        raise JobFailed('Task not found')
+    
+    # Generate AI summary using existing service
+    ai_review_service = AIPerformanceReview()
+    ai_summary = ai_review_service.generate_performance_review(
+        task.employee_review,
+        task.manager_review
+    )
+    
+    # Save AI summary to task
+    task.ai_summary = json.dumps(ai_summary)
+    task.ai_summary_generated_at = datetime.utcnow()
+    
+    # Also create a performance review record
+    performance_review = PerformanceReview(
+        employee_id=task.assigned_to_id,
+        reviewer_id=task.assigned_by_id,
+        type='task_performance_review',
+        text=json.dumps({
+            'task_id': task.id,
+            'task_title': task.title,
+            'employee_review': task.employee_review,
+            'manager_review': task.manager_review,
+            'ai_summary': ai_summary
+        }),
+        rating=None
+    )
+    
+    db.session.add(performance_review)
+    db.session.commit()
+    
+    return {
+        'message': 'AI summary generated successfully',
+        'task': task.to_dict(),
+        'ai_summary': ai_summary,
+        'performance_review_id': performance_review.id
+    }
+
+
 @task_bp.route('/', methods=['POST'])
 @jwt_required()
 def create_task():
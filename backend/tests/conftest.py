@@ -2,9 +2,16 @@
 import pytest
 import os
 import sys
+import shutil
+import tempfile
 
 # Add the backend directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# before the app (and its module level configs) are imported: no llm cache db on disk, ...
+os.environ['FLASK_ENV'] = 'testing'
+# ... and uploads / the chroma store go to a temp dir instead of the source tree
+_data_root = tempfile.mkdtemp(prefix='hr-tests-')
+os.environ['DATA_ROOT'] = _data_root
 
 from app import create_app
 from app import db
@@ -21,6 +28,8 @@ def app():
     app.config['TESTING'] = True
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
     app.config['WTF_CSRF_ENABLED'] = False  # Disable CSRF for testing
+    app.config['VECTOR_INDEXING_ENABLED'] = False  # No chroma writes from ORM events
+    app.config['BACKGROUND_JOB_MODE'] = 'eager'  # Background jobs finish before the response
     # app.config["JWT_SECRET_KEY"] = "test-secret"
     # app.config['PROPAGATE_EXCEPTIONS'] = True
     
@@ -39,4 +48,8 @@ def client(app):
 @pytest.fixture
 def runner(app):
     """Create a test CLI runner."""
-    return app.test_cli_runner()
\ No newline at end of file
+    return app.test_cli_runner()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_data_root, ignore_errors=True)
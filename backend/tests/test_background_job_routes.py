@@ -0,0 +1,307 @@
+# tests/test_background_job_routes.py
+import pytest
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from flask_jwt_extended import create_access_token
+from app import db
+from models import User, Role, Task, BackgroundJob
+from workers import job_runner, JobFailed
+from werkzeug.security import generate_password_hash
+
+
+# Helper functions
+def create_role(name="employee", description="Employee role"):
+    """Create a role in the database."""
+    role = Role(name=name, description=description)
+    db.session.add(role)
+    db.session.commit()
+    return role
+
+
+def create_user(name, email, role_id, status="active"):
+    """Create a user in the database."""
+    user = User(
+        name=name,
+        email=email,
+        password=generate_password_hash("testpass123"),
+        role_id=role_id,
+        status=status
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def auth_headers(user_id):
+    return {"Authorization": f"Bearer {create_access_token(identity=user_id)}"}
+
+
+calls = {"flaky": 0}
+
+
+@job_runner.handler('test_flaky')
+def flaky_handler(job, payload):
+    calls["flaky"] += 1
+    if calls["flaky"] < payload["fail_times"] + 1:
+        raise RuntimeError("provider unavailable")
+    return {"echo": payload["value"]}
+
+
+@job_runner.handler('test_permanent')
+def permanent_handler(job, payload):
+    raise JobFailed("bad input")
+
+
+@job_runner.handler('test_cancel_while_running')
+def cancel_while_running_handler(job, payload):
+    # HR hits /cancel while the job is half way
+    BackgroundJob.query.filter_by(id=job.id).update({'cancel_requested': True})
+    job_runner.report_progress(job, 1, total=2)
+    return {"finished": True}
+
+
+@job_runner.handler('test_llm_deadline')
+def llm_deadline_handler(job, payload):
+    from genai.llm_client import LLMDeadlineExceeded
+    raise LLMDeadlineExceeded("no answer within 90s")
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls["flaky"] = 0
+
+
+# =========================================================
+#                  JOB RUNNER TESTS
+# =========================================================
+
+def test_job_retried_until_success(app):
+    """Test transient failures are retried and the result stored"""
+    with app.app_context():
+        job = job_runner.submit('test_flaky', {'fail_times': 1, 'value': 42})
+
+        assert job.status == 'succeeded'
+        assert job.attempts == 2
+        assert job.get_result() == {'echo': 42}
+        assert job.error is None
+
+
+def test_job_fails_after_max_attempts(app):
+    """Test a job that keeps failing ends failed after max_attempts"""
+    with app.app_context():
+        job = job_runner.submit('test_flaky', {'fail_times': 10, 'value': 1}, max_attempts=2)
+
+        assert job.status == 'failed'
+        assert job.attempts == 2
+        assert 'provider unavailable' in job.error
+
+
+def test_permanent_failure_not_retried(app):
+    """Test JobFailed fails the job on the first attempt"""
+    with app.app_context():
+        job = job_runner.submit('test_permanent', {})
+
+        assert job.status == 'failed'
+        assert job.attempts == 1
+        assert job.error == 'bad input'
+
+
+def test_running_job_stops_when_cancelled(app):
+    """Test cancellation requested while running stops at the next progress report"""
+    with app.app_context():
+        job = job_runner.submit('test_cancel_while_running', {})
+
+        assert job.status == 'cancelled'
+        assert job.get_result() is None
+        assert job.progress_done == 1
+
+
+def test_claim_is_exclusive(app):
+    """Test a queued job is handed to exactly one worker"""
+    with app.app_context():
+        app.config['BACKGROUND_JOB_MODE'] = 'process'
+        job = job_runner.submit('test_flaky', {'fail_times': 0, 'value': 1})
+        assert job.status == 'queued'
+
+        assert job_runner.claim('worker-1') == job.id
+        assert job_runner.claim('worker-2') is None
+
+        db.session.refresh(job)
+        assert job.status == 'running'
+        assert job.worker_id == 'worker-1'
+
+
+def test_stale_running_job_requeued(app):
+    """Test jobs of a dead worker go back to the queue"""
+    with app.app_context():
+        app.config['BACKGROUND_JOB_MODE'] = 'process'
+        job = job_runner.submit('test_flaky', {'fail_times': 0, 'value': 1})
+        job_runner.claim('dead-worker')
+        BackgroundJob.query.filter_by(id=job.id).update({
+            'heartbeat_at': datetime.utcnow() - timedelta(seconds=job_runner.stale_seconds + 60)
+        })
+        db.session.commit()
+
+        assert job_runner.requeue_stale() == 1
+        db.session.refresh(job)
+        assert job.status == 'queued'
+
+
+def test_llm_deadline_not_retried(app):
+    """Test a job whose LLM call ran out of its (already retried) deadline is not run again"""
+    with app.app_context():
+        job = job_runner.submit('test_llm_deadline', {})
+
+        assert job.status == 'failed'
+        assert job.attempts == 1
+        assert 'no answer within 90s' in job.error
+
+
+def test_start_requeues_stale_jobs(app):
+    """Test thread mode start picks up the jobs a previous process left running"""
+    with app.app_context():
+        app.config['BACKGROUND_JOB_MODE'] = 'process'
+        job = job_runner.submit('test_flaky', {'fail_times': 0, 'value': 1})
+        job_runner.claim('previous-process')
+        BackgroundJob.query.filter_by(id=job.id).update({
+            'heartbeat_at': datetime.utcnow() - timedelta(seconds=job_runner.stale_seconds + 60)
+        })
+        db.session.commit()
+
+        with patch.object(job_runner, 'start_threads') as start_threads:
+            job_runner.start(app)
+
+        start_threads.assert_called_once_with(app)
+        db.session.refresh(job)
+        assert job.status == 'queued'
+
+
+def test_worker_survives_unexpected_errors(app):
+    """Test an error outside the handler does not end the worker loop"""
+    with app.app_context():
+        app.config['BACKGROUND_JOB_MODE'] = 'process'
+        first = job_runner.submit('test_flaky', {'fail_times': 0, 'value': 1})
+        second = job_runner.submit('test_flaky', {'fail_times': 0, 'value': 2})
+        stop_event = threading.Event()
+        ran = []
+
+        def run(app, job_id):
+            ran.append(job_id)
+            if len(ran) == 1:
+                raise RuntimeError("result column too small")
+            stop_event.set()
+            return 'succeeded'
+
+        with patch.object(job_runner, 'run', side_effect=run), patch.object(job_runner, 'poll_interval', 0):
+            job_runner.work(app, 'worker-1', stop_event)
+
+        assert ran == [first.id, second.id]
+
+
+def test_run_skips_deleted_job(app):
+    """Test a job row deleted after its claim is skipped, not crashed on"""
+    with app.app_context():
+        app.config['BACKGROUND_JOB_MODE'] = 'process'
+        job = job_runner.submit('test_flaky', {'fail_times': 0, 'value': 1})
+        job_id = job_runner.claim('worker-1')
+        BackgroundJob.query.filter_by(id=job_id).delete()
+        db.session.commit()
+
+        assert job_runner.run(app, job_id) is None
+
+
+def test_thread_workers_start_with_first_request_only():
+    """Test create_app() alone (cli commands, init_db.py) does not start worker threads"""
+    from app import create_app
+
+    env = {'BACKGROUND_JOB_MODE': 'thread', 'BACKGROUND_JOB_AUTOSTART': 'true', 'DATABASE_URL': 'sqlite:///:memory:'}
+    with patch.dict('os.environ', env), patch.object(job_runner, 'start') as start:
+        app = create_app()
+        start.assert_not_called()
+
+        app.test_client().get('/health')
+        app.test_client().get('/health')
+
+    # every request asks, start() returns early once this process runs its threads
+    assert start.call_count == 2
+    start.assert_called_with(app)
+
+
+# =========================================================
+#                BACKGROUND JOB ROUTE TESTS
+# =========================================================
+
+def test_get_background_job_not_found(client):
+    """Test polling an unknown job"""
+    response = client.get('/api/background-jobs/non-existent', headers=auth_headers('test-user'))
+
+    assert response.status_code == 404
+    assert response.get_json()['error'] == 'Background job not found'
+
+
+def test_cancel_queued_job(client, app):
+    """Test cancelling a job that has not started"""
+    with app.app_context():
+        role = create_role()
+        user = create_user("Employee", "employee@example.com", role.id)
+        app.config['BACKGROUND_JOB_MODE'] = 'process'
+        job = job_runner.submit('test_flaky', {'fail_times': 0, 'value': 1}, created_by_id=user.id)
+
+        response = client.post(f'/api/background-jobs/{job.id}/cancel', headers=auth_headers(user.id))
+
+        assert response.status_code == 200
+        assert response.get_json()['job']['status'] == 'cancelled'
+        assert job_runner.claim('worker-1') is None
+
+        # finished jobs cannot be cancelled again
+        response = client.post(f'/api/background-jobs/{job.id}/cancel', headers=auth_headers(user.id))
+        assert response.status_code == 409
+
+
+def test_ownerless_job_visible_to_admins_only(client, app):
+    """Test internal jobs (no submitter) cannot be read or cancelled by other users or without a token"""
+    with app.app_context():
+        admin = create_user("Admin", "admin@example.com", create_role("admin", "Admin role").id)
+        employee = create_user("Employee", "employee@example.com", create_role().id)
+        app.config['BACKGROUND_JOB_MODE'] = 'process'
+        job = job_runner.submit('test_flaky', {'fail_times': 0, 'value': 1})
+
+        assert client.get(f'/api/background-jobs/{job.id}').status_code == 401
+        assert client.post(f'/api/background-jobs/{job.id}/cancel').status_code == 401
+        assert client.get(f'/api/background-jobs/{job.id}', headers=auth_headers(employee.id)).status_code == 403
+        assert client.post(f'/api/background-jobs/{job.id}/cancel', headers=auth_headers(employee.id)).status_code == 403
+        assert client.get(f'/api/background-jobs/{job.id}', headers=auth_headers(admin.id)).status_code == 200
+
+
+@patch('routes.task_routes.AIPerformanceReview')
+def test_task_ai_summary_runs_as_job(mock_ai_review, client, app):
+    """Test generate-ai-summary answers 202 and the job stores the summary"""
+    with app.app_context():
+        role = create_role()
+        manager = create_user("Manager", "manager@example.com", role.id)
+        employee = create_user("Employee", "employee@example.com", role.id)
+        other = create_user("Other", "other@example.com", role.id)
+        task = Task(
+            title="Ship feature",
+            assigned_to_id=employee.id,
+            assigned_by_id=manager.id,
+            deadline=datetime.utcnow() + timedelta(days=1),
+            employee_review="Done on time",
+            manager_review="Good work"
+        )
+        db.session.add(task)
+        db.session.commit()
+        mock_ai_review.return_value.generate_performance_review.return_value = {"summary": "Solid delivery"}
+
+        response = client.post(f'/api/tasks/{task.id}/generate-ai-summary', headers=auth_headers(manager.id))
+
+        assert response.status_code == 202
+        status_url = response.get_json()['status_url']
+        job = client.get(status_url, headers=auth_headers(manager.id)).get_json()
+        assert job['status'] == 'succeeded'
+        assert job['result']['ai_summary'] == {"summary": "Solid delivery"}
+        assert Task.query.get(task.id).ai_summary is not None
+
+        # only the submitter can see the job
+        assert client.get(status_url, headers=auth_headers(other.id)).status_code == 403
@@ -2,9 +2,11 @@ import os
 import io
 import json
 import uuid
-from models import User, Role, File
+from unittest.mock import patch
+from models import User, Role, File, Resume
 from flask_jwt_extended import create_access_token
 from app import db
+from routes.file_routes import UPLOAD_FOLDER
 
 
 # JWT Headers helper --------------------------------------------------------
@@ -105,6 +107,35 @@ def test_upload_file_missing_file(client, app):
     assert resp.get_json()["error"] == "No file provided"
 
 
+def test_upload_resume_queues_pipeline(client, app):
+    with app.app_context():
+        role = create_role("candidate")
+        user = create_user("C", "c@test.com", "pass", role)
+
+        test_file, filename = create_fake_file()
+
+        with patch("genai.services.resume_pipeline_service.ParseResume.extract_resume_text", return_value="Resume text"), \
+             patch("genai.services.resume_pipeline_service.ParseResume.structure_resume_text", return_value={"skills": ["Python"]}), \
+             patch("genai.services.resume_pipeline_service.chroma_db_service") as mock_chroma:
+            mock_chroma.get_docs.return_value = {}
+            mock_chroma.get_embeddings.return_value = [[0.1, 0.2]]
+
+            resp = client.post(
+                "/api/files/upload/resume",
+                headers=auth_header(user),
+                data={"file": (test_file, filename)},
+                content_type="multipart/form-data"
+            )
+
+        assert resp.status_code == 201
+        body = resp.get_json()
+        assert body["success"] is True
+        assert body["status_url"] == f"/api/background-jobs/{body['job_id']}"
+        # eager job mode: the resume is prepared for matching by now
+        assert body["resume"]["processing"]["status"] == "ready"
+        assert Resume.query.get(body["resume"]["id"]).get_parsed_data() == {"skills": ["Python"]}
+
+
 # -----------------------------------------------------------------------
 # 2. DOWNLOAD FILE
 # -----------------------------------------------------------------------
@@ -165,7 +196,7 @@ def test_download_file_permission_denied(client, app):
 
         # File owned by user1
         fake_file, filename = create_fake_file()
-        file_path = f"./uploads/files/{uuid.uuid4()}_{filename}"
+        file_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4()}_{filename}")
         with open(file_path, "wb") as f:
             f.write(b"Hello")
 
@@ -204,7 +235,7 @@ def test_delete_file_success(client, app):
 
         # Create a real file
         fake_file, filename = create_fake_file()
-        file_path = f"./uploads/files/{uuid.uuid4()}_{filename}"
+        file_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4()}_{filename}")
         with open(file_path, "wb") as f:
             f.write(b"Hello")
 
@@ -239,7 +270,7 @@ def test_delete_file_permission_denied(client, app):
         user2 = create_user("B", "b@test.com", "pass", role)
 
         fake_file, filename = create_fake_file()
-        file_path = f"./uploads/files/{uuid.uuid4()}_{filename}"
+        file_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4()}_{filename}")
         with open(file_path, "wb") as f:
             f.write(b"Hello")
 
@@ -278,7 +309,7 @@ def test_preview_pdf_metadata_only(client, app):
         user = create_user("A", "a@test.com", "pass", role)
 
         fake_file, filename = create_fake_file(b"dummy pdf", "pdf")
-        file_path = f"./uploads/files/{uuid.uuid4()}_{filename}"
+        file_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4()}_{filename}")
         with open(file_path, "wb") as f:
             f.write(b"dummy pdf")
 
@@ -333,7 +364,7 @@ def test_get_file_info_success(client, app):
         user = create_user("A", "a@test.com", "pass", role)
 
         fake_file, filename = create_fake_file()
-        file_path = f"./uploads/files/{uuid.uuid4()}_{filename}"
+        file_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4()}_{filename}")
         with open(file_path, "wb") as f:
             f.write(b"Hello")
 
@@ -373,7 +404,7 @@ def test_update_metadata_success(client, app):
         user = create_user("Admin", "admin@test.com", "pass", role)
 
         fake_file, filename = create_fake_file()
-        file_path = f"./uploads/files/{uuid.uuid4()}_{filename}"
+        file_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4()}_{filename}")
         with open(file_path, "wb") as f:
             f.write(b"Hello")
 
@@ -249,3 +249,74 @@ def test_generate_description_missing_fields(client, missing_field):
 
     assert response.status_code == 400
     assert missing_field in response.get_json()["error"]
+
+
+# ---------------------------------------------------------
+# Incremental job_post vector indexing
+# ---------------------------------------------------------
+def _create_poster():
+    from app import db
+    from models import Role, User
+
+    role = Role(name="hr", description="HR")
+    db.session.add(role)
+    db.session.commit()
+    user = User(name="HR", email="hr@example.com", password="x", role_id=role.id)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_job_writes_are_indexed_incrementally(client, app):
+    with app.app_context():
+        app.config["VECTOR_INDEXING_ENABLED"] = True
+        poster = _create_poster()
+
+        with patch("database.vector_db.model_indexer._index_executor") as mock_executor:
+            response = client.post("/api/jobs/", json={"title": "Math Teacher", "posted_by_id": poster.id})
+            assert response.status_code == 201
+            job_id = response.get_json()["job"]["id"]
+
+            ops = mock_executor.submit.call_args[0][1]
+            assert list(ops) == [job_id]
+            assert ops[job_id][0] == "upsert"
+            assert ops[job_id][2]["content_hash"]
+
+            client.put(f"/api/jobs/{job_id}", json={"description": "Teach algebra"})
+            ops = mock_executor.submit.call_args[0][1]
+            assert ops[job_id][0] == "upsert"
+            assert "Teach algebra" in ops[job_id][1]
+
+            client.delete(f"/api/jobs/{job_id}")
+            ops = mock_executor.submit.call_args[0][1]
+            assert ops[job_id][0] == "delete"
+            assert mock_executor.submit.call_count == 3
+
+
+def test_reconcile_job_index(app):
+    from app import db
+    from database.vector_db.job_post_indexer import job_post_indexer
+
+    with app.app_context():
+        poster = _create_poster()
+        fresh = JobPost(title="Fresh", posted_by_id=poster.id)
+        changed = JobPost(title="Changed", posted_by_id=poster.id)
+        missing = JobPost(title="Missing", posted_by_id=poster.id)
+        db.session.add_all([fresh, changed, missing])
+        db.session.commit()
+
+        with patch("database.vector_db.chroma_db_service") as mock_chroma:
+            mock_chroma.get_doc_metadata.return_value = {
+                fresh.id: {"content_hash": job_post_indexer.build_entry(fresh)[2]["content_hash"]},
+                changed.id: {"content_hash": "outdated"},
+                "deleted-job": {"content_hash": "whatever"},
+            }
+
+            summary = job_post_indexer.reconcile()
+
+        assert summary["missing"] == [missing.id]
+        assert summary["stale"] == [changed.id]
+        assert summary["orphaned"] == ["deleted-job"]
+        mock_chroma.delete_docs.assert_called_once_with("job_post", ["deleted-job"])
+        mock_chroma.upsert_many.assert_called_once()
+        assert set(mock_chroma.upsert_many.call_args.kwargs["doc_ids"]) == {missing.id, changed.id}
@@ -0,0 +1,57 @@
+# tests/test_startup.py
+import os
+import sys
+import json
+import subprocess
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# cold start of the non-AI app, override on slow CI machines
+STARTUP_BUDGET_SECONDS = float(os.environ.get('STARTUP_BUDGET_SECONDS', 3.0))
+
+# must only be imported by the first AI request (or AI_PRELOAD)
+HEAVY_MODULES = [
+    'torch', 'transformers', 'sentence_transformers', 'chromadb',
+    'langchain', 'langchain_core', 'langchain_community', 'langchain_openai',
+    'google.generativeai', 'openai',
+]
+
+STARTUP_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+from app import create_app
+app = create_app()
+status = app.test_client().get('/health').status_code
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "status": status, "modules": sorted(sys.modules)}))
+"""
+
+
+def _cold_start(extra_env=None):
+    env = dict(os.environ, DATABASE_URL='sqlite:///:memory:', AI_PRELOAD='false', EMBEDDING_WARMUP='false')
+    env.update(extra_env or {})
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=300
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_app_startup_does_not_import_ai_stack():
+    """Test create_app() and /health never pull in the ML / LLM SDKs"""
+    startup = _cold_start()
+
+    assert startup["status"] == 200
+    loaded = [
+        name for name in HEAVY_MODULES
+        if any(module == name or module.startswith(name + '.') for module in startup["modules"])
+    ]
+    assert loaded == []
+
+
+def test_app_cold_start_within_budget():
+    """Test the non-AI cold start stays under STARTUP_BUDGET_SECONDS"""
+    # best of two runs to smooth out disk cache noise
+    seconds = min(_cold_start()["seconds"] for _ in range(2))
+    assert seconds < STARTUP_BUDGET_SECONDS, f"cold start took {seconds:.2f}s (budget {STARTUP_BUDGET_SECONDS}s)"
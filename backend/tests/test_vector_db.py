@@ -0,0 +1,63 @@
+import uuid
+from unittest.mock import patch
+
+
+# ---------------------------------------------------------
+# ChromaVectorDBService bulk writes
+# ---------------------------------------------------------
+def test_upsert_many_batches_embeddings_and_writes():
+    import chromadb
+    from database.vector_db.chroma_vector_db import ChromaVectorDBService
+
+    class FakeModel:
+        def __init__(self):
+            self.batches = []
+
+        def encode(self, texts, **kwargs):
+            import numpy as np
+            self.batches.append(len(texts))
+            return np.array([[float(len(t)), 1.0] for t in texts])
+
+    service = ChromaVectorDBService()
+    service._client = chromadb.EphemeralClient()
+    service.model = FakeModel()
+    collection_name = f"bulk_test_{uuid.uuid4().hex}"
+
+    ids = [f"doc-{i}" for i in range(25)]
+    texts = [f"text {i}" for i in range(25)]
+    metas = [{"n": i} for i in range(25)]
+    with patch("database.vector_db.chroma_vector_db.vector_index.upsert_batch_size", 10):
+        stats = service.upsert_many(collection_name, ids, texts, metas, batch_size=8, num_threads=2)
+        # second run replaces instead of duplicating
+        service.upsert_many(collection_name, ids, texts, metas, batch_size=8, num_threads=1)
+
+    assert stats["count"] == 25
+    assert stats["docs_per_second"] > 0
+    assert sorted(service.model.batches) == sorted([8, 8, 8, 1] * 2)
+    assert service.get_collection(collection_name).count() == 25
+    assert service.get_docs(collection_name, ["doc-3"])["doc-3"]["embeddings"] == [6.0, 1.0]
+
+
+# ---------------------------------------------------------
+# Shared, lazily loaded embedding model
+# ---------------------------------------------------------
+def test_embedding_model_is_shared_and_lazy():
+    from database.vector_db import chroma_db_service, embedding_provider
+    from database.vector_db.embedding_provider import EmbeddingProvider
+
+    # the singleton service never loads the model just by being imported
+    assert chroma_db_service.model is embedding_provider
+
+    provider = EmbeddingProvider("some-model")
+    assert not provider.is_loaded
+    with patch("sentence_transformers.SentenceTransformer") as mock_st:
+        import numpy as np
+        mock_st.return_value.encode.side_effect = lambda texts, **kwargs: (
+            np.ones((len(texts), 3)) if isinstance(texts, list) else np.ones(3)
+        )
+        assert provider.embed_query("hello") == [1.0, 1.0, 1.0]
+        assert provider.embed_documents(["a", "b"]) == [[1.0, 1.0, 1.0]] * 2
+        provider.warm_up()
+
+    assert provider.is_loaded
+    mock_st.assert_called_once_with("some-model")
@@ -0,0 +1,235 @@
+import re
+import json
+import time
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# outside strings: structural characters, or a run of anything else (numbers, literals)
+_TOKEN = re.compile(r'[{}\[\],"]|[^\s{}\[\],"]+')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_VALUE_START = re.compile(r'[{\[]')
+
+
+class JSONParseStats:
+    """Process wide counters of StreamingJSONExtractor runs, per schema."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, name: str, values: int, invalid: int, seconds: float, chars: int):
+        with self._lock:
+            stats = self._stats.setdefault(name, {
+                'documents': 0, 'values': 0, 'invalid': 0, 'chars': 0, 'parse_seconds': 0.0, 'max_parse_seconds': 0.0,
+            })
+            stats['documents'] += 1
+            stats['values'] += values
+            stats['invalid'] += invalid
+            stats['chars'] += chars
+            stats['parse_seconds'] += seconds
+            stats['max_parse_seconds'] = max(stats['max_parse_seconds'], seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: {
+                    **values,
+                    'parse_seconds': round(values['parse_seconds'], 6),
+                    'max_parse_seconds': round(values['max_parse_seconds'], 6),
+                }
+                for name, values in self._stats.items()
+            }
+
+
+json_parse_stats = JSONParseStats()
+
+
+class StreamingJSONExtractor:
+    """
+    Single pass, incremental extraction of JSON values from LLM output.
+
+    Feed the text in chunks as it streams in; `feed()` returns the values that
+    completed in that chunk, so callers can use them before generation ends.
+    Markdown fences and prose around the JSON are skipped. Objects are found
+    anywhere in the text, an array only when it is the whole answer (a leading
+    `[` in prose is not JSON). Trailing commas, common in LLM output, are
+    dropped while scanning. Every character is looked at once; each completed
+    value is decoded once.
+
+    With a pydantic `schema`, values that do not validate are counted in
+    `invalid` and skipped, valid ones are returned as `model_dump()` dicts.
+    `limit` stops scanning after that many values (1 for "the first object").
+    `parse_seconds` is the time spent scanning and decoding, also aggregated
+    per schema in `json_parse_stats`.
+    """
+
+    def __init__(self, schema=None, limit: Optional[int] = None, name: str = None):
+        self.schema = schema
+        self.limit = limit
+        self.name = name or (schema.__name__ if schema is not None else 'json')
+        self.values: List[Any] = []
+        self.raw_values: List[Any] = []  # every decoded value, before schema validation
+        self.invalid = 0
+        self.errors: List[str] = []
+        self.parse_seconds = 0.0
+        self.chars = 0
+        self.closed = False
+
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._parts: List[str] = []  # text of the value being read, from earlier chunks
+        self._parts_length = 0
+        self._trailing_commas: List[int] = []  # offsets within the current value
+        self._pending_comma: Optional[int] = None
+        self._values_seen = 0
+        # text around the values; only a markdown fence keeps the answer a single json document
+        self._outside = ''
+        self._fenced_only = True
+
+    @property
+    def done(self) -> bool:
+        return self.limit is not None and len(self.values) >= self.limit
+
+    @property
+    def whole_document(self) -> bool:
+        """True if the text was exactly one JSON value, optionally in a markdown fence."""
+        return self._values_seen == 1 and self._fenced_only and self._depth == 0
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Scan the next chunk, returns the values completed by it."""
+        if not chunk or self.done or self.closed:
+            return []
+        start = time.perf_counter()
+        try:
+            return self._scan(chunk)
+        finally:
+            self.chars += len(chunk)
+            self.parse_seconds += time.perf_counter() - start
+
+    def close(self) -> List[Any]:
+        """End of the stream, records the run and returns every value found."""
+        if not self.closed:
+            self.closed = True
+            json_parse_stats.record(self.name, len(self.values), self.invalid, self.parse_seconds, self.chars)
+        return self.values
+
+    def _scan(self, chunk: str) -> List[Any]:
+        completed = []
+        length = len(chunk)
+        value_start = 0 if self._depth else None
+        pos = 0
+
+        while pos < length:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = _STRING_SPECIAL.search(chunk, pos)
+                if match is None:
+                    break
+                if match.group() == '\\':
+                    self._escape = True
+                else:
+                    self._in_string = False
+                pos = match.end()
+                continue
+
+            if self._depth == 0:
+                match = _VALUE_START.search(chunk, pos)
+                if match is None:
+                    self._track_outside(chunk[pos:])
+                    break
+                self._track_outside(chunk[pos:match.start()])
+                # a [ in prose is not json, arrays are only taken as the whole answer
+                if match.group() == '{' or (self._fenced_only and not self._values_seen):
+                    self._depth = 1
+                    value_start = match.start()
+                    self._parts, self._parts_length, self._trailing_commas, self._pending_comma = [], 0, [], None
+                else:
+                    self._track_outside(match.group())
+                pos = match.end()
+                continue
+
+            match = _TOKEN.search(chunk, pos)
+            if match is None:
+                break
+            token = match.group()
+            if self._pending_comma is not None and token in ('}', ']'):
+                self._trailing_commas.append(self._pending_comma)
+            self._pending_comma = None
+
+            if token == '"':
+                self._in_string = True
+            elif token == ',':
+                self._pending_comma = self._parts_length + match.start() - value_start
+            elif token in ('{', '['):
+                self._depth += 1
+            elif token in ('}', ']'):
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete(''.join(self._parts) + chunk[value_start:match.end()], completed)
+                    value_start = None
+                    if self.done:
+                        return completed
+            pos = match.end()
+
+        if self._depth and value_start is not None:
+            self._parts.append(chunk[value_start:])
+            self._parts_length += length - value_start
+        return completed
+
+    def _track_outside(self, text: str):
+        if not text or not self._fenced_only:
+            return
+        self._outside = (self._outside + text)[-16:]
+        stripped = self._outside.strip().lower()
+        fence = '```json' if not self._values_seen else '```'
+        if stripped and not (fence.startswith(stripped) or (self._values_seen and stripped == '```json')):
+            self._fenced_only = False
+        if self._values_seen:
+            self._outside = self._outside[-8:]
+
+    def _complete(self, text: str, completed: List[Any]):
+        self._values_seen += 1
+        self._outside = ''
+        if self._trailing_commas:
+            drop = set(self._trailing_commas)
+            text = ''.join(char for offset, char in enumerate(text) if offset not in drop)
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError as e:
+            self.invalid += 1
+            self.errors.append(f"invalid json at value {self._values_seen}: {e}")
+            return
+        self.raw_values.append(value)
+        if self.schema is not None:
+            try:
+                value = self.schema.model_validate(value).model_dump()
+            except Exception as e:
+                self.invalid += 1
+                self.errors.append(f"{self.name} validation failed: {e}")
+                return
+        self.values.append(value)
+        completed.append(value)
+
+
+def iter_json(chunks: Iterable[str], schema=None, limit: Optional[int] = None, name: str = None) -> Iterator[Any]:
+    """Yield JSON values from a stream of text chunks as soon as each one completes."""
+    extractor = StreamingJSONExtractor(schema=schema, limit=limit, name=name)
+    try:
+        for chunk in chunks:
+            yield from extractor.feed(getattr(chunk, 'text', chunk))
+            if extractor.done:
+                break
+    finally:
+        extractor.close()
+
+
+def extract_json(text: str, schema=None, limit: Optional[int] = None, name: str = None) -> StreamingJSONExtractor:
+    """Run the extractor over a complete text, returns it (values, errors, parse_seconds)."""
+    extractor = StreamingJSONExtractor(schema=schema, limit=limit, name=name)
+    extractor.feed(text or '')
+    extractor.close()
+    return extractor
@@ -0,0 +1,154 @@
+import os
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # not on windows, coalescing is then per process only
+    fcntl = None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical work.
+
+    Within a process the first caller of `do(key, fn)` runs `fn`; callers with the
+    same key that arrive while it runs wait and receive the same result (or error).
+    Across worker processes the leader also holds an flock on `<lock_dir>/<key>.lock`
+    and, once it has the lock, calls `recheck()` (e.g. a cache lookup) so it uses
+    what another process just produced instead of computing it again.
+    """
+
+    def __init__(self, lock_dir: str = None, lock_timeout: float = None):
+        self.lock_dir = lock_dir or os.environ.get('SINGLE_FLIGHT_LOCK_DIR', './instance/locks')
+        self.lock_timeout = lock_timeout or float(os.environ.get('SINGLE_FLIGHT_LOCK_TIMEOUT', 120))
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "coalesced": 0, "process_waits": 0, "recheck_hits": 0, "lock_timeouts": 0}
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._stats[counter] += 1
+
+    ## cross process
+    @contextmanager
+    def process_lock(self, key: str):
+        """
+        Exclusive flock for `key` shared by every process on this machine. Yields True
+        if the lock had to be waited for, i.e. another process was working on the key.
+        Gives up waiting after `lock_timeout` seconds and proceeds unlocked.
+        """
+        if fcntl is None:
+            yield False
+            return
+
+        os.makedirs(self.lock_dir, exist_ok=True)
+        path = os.path.join(self.lock_dir, f"{key}.lock")
+        deadline = time.monotonic() + self.lock_timeout
+        waited = False
+        fd = None
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                fd = None
+                waited = True
+                if time.monotonic() > deadline:
+                    self._count('lock_timeouts')
+                    break
+                time.sleep(0.05)
+                continue
+            # the holder may have unlinked the file before we locked it
+            try:
+                if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+            fd = None
+
+        if waited:
+            self._count('process_waits')
+        try:
+            yield waited
+        finally:
+            if fd is not None:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    ## coalescing
+    def do(self, key: str, fn: Callable[[], Any], recheck: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Run `fn()` once for all concurrent callers of `key` and return its result.
+
+        Args:
+            key: normalized request key (see make_key)
+            fn: zero-arg callable doing the work
+            recheck: optional zero-arg callable returning an already available
+                result (or None); enables coalescing across processes
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats["leaders"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if recheck is None:
+                call.result = fn()
+            else:
+                with self.process_lock(key):
+                    # another process may have finished the same work meanwhile
+                    result = recheck()
+                    if result is not None:
+                        self._count('recheck_hits')
+                    else:
+                        result = fn()
+                    call.result = result
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
+
+
+single_flight = SingleFlight()
@@ -1,18 +1,18 @@
 # backend/utils/text_utility.py
 
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import Docx2txtLoader 
-from langchain_community.document_loaders import PyPDFLoader
 import os 
 from pathlib import Path
 import re
 import json
+import hashlib
 from config import Config
+from .json_stream import extract_json
 
 class TextUtility:
 
     @staticmethod
     def extract_text_from_pdf(pdf_path):
+        from langchain_community.document_loaders import PyPDFLoader
         loader = PyPDFLoader(pdf_path)
         text = loader.load()
         content = ''
@@ -22,6 +22,7 @@ class TextUtility:
     
     @staticmethod
     def extract_text_from_docx(file_path):
+        from langchain_community.document_loaders import Docx2txtLoader
         docx_loader=Docx2txtLoader(file_path)
         docs=docx_loader.load()
         content=''
@@ -29,6 +30,17 @@ class TextUtility:
             content+=docs[i].page_content
         return content
     
+    @staticmethod
+    def file_content_hash(file_path):
+        """sha256 of a file's bytes, None if the file is not readable"""
+        if not file_path or not os.path.isfile(file_path):
+            return None
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
     @staticmethod
     def remove_pii(text: str):
         text = re.sub(r'[\w\.-]+@[\w\.-]+\.\w+','[EMAIL]', text)
@@ -37,33 +49,32 @@ class TextUtility:
         return text.strip()
     
     @staticmethod
-    def remove_json_marker(text: str):
+    def remove_json_marker(text: str, schema=None):
+        """
+        Decode the JSON of an LLM answer in a single pass (see StreamingJSONExtractor).
 
+        A single JSON document, optionally in a ```json fence, is returned as is; otherwise
+        the list of JSON objects found in the text, or the text itself if there are none.
+        With a pydantic `schema` the first value that validates is returned as a dict,
+        falling back to the above when none does.
+        """
         if not text or not isinstance(text, str):
             return {}
-        text=text.strip()
+
+        extractor = extract_json(text, schema=schema)
+        if schema is not None and extractor.values:
+            return extractor.values[0]
+        if extractor.whole_document:
+            return extractor.raw_values[0]
+
+        json_objects = [value for value in extractor.raw_values if isinstance(value, dict)]
+        if json_objects:
+            return json_objects
+
+        text = text.strip()
         if text.startswith("```json") and text.endswith("```"):
             text = text[7:-3]
-        
-        text=text.strip()
-
-        try:
-            print("json")
-            return json.loads(text)
-        except json.JSONDecodeError:
-            json_obj = TextUtility.extract_multiple_json_objects(text)
-            if json_obj:
-                print("json_obj")
-                return json_obj
-            print("text")
-            return text
-        
-        
-        # cleaned_json=text.strip('`json \n')
-        # try:
-        #     return json.loads(cleaned_json)
-        # except json.JSONDecodeError:
-        #     return cleaned_json
+        return text.strip()
 
 
     @staticmethod
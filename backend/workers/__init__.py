@@ -0,0 +1 @@
+from .job_runner import BackgroundJobRunner, JobFailed, JobCancelled, job_runner, worker_process_main
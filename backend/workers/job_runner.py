@@ -0,0 +1,326 @@
+import os
+import json
+import time
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.exc import OperationalError
+
+from models import BackgroundJob, db
+from utils.single_flight import SingleFlight, single_flight
+
+
+class JobFailed(Exception):
+    """Permanent failure (bad input, missing rows): the job is not retried."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler once cancellation of its job was requested."""
+
+
+class BackgroundJobRunner:
+    """
+    Database backed job queue for long AI operations, no broker needed.
+
+    A job is a `background_jobs` row (type, JSON payload, status, progress,
+    JSON result). Routes `submit()` it and return 202 with the job id; a
+    worker claims the row (a conditional UPDATE, so two workers never run the
+    same job), runs the handler registered for its type inside an app context
+    and stores the result. Failures other than JobFailed are retried with
+    exponential backoff up to `max_attempts`; jobs whose worker died are
+    re-queued once their heartbeat is older than `stale_seconds`.
+
+    BACKGROUND_JOB_MODE selects where workers run:
+      - thread:  a few daemon threads inside the web process (default)
+      - process: nothing runs in the web process, start `flask run-jobs`
+      - eager:   the handler runs inline in submit() (tests / debugging)
+    """
+
+    def __init__(self):
+        self.num_threads = int(os.environ.get('BACKGROUND_JOB_WORKERS', 2))
+        self.poll_interval = float(os.environ.get('BACKGROUND_JOB_POLL_INTERVAL', 1.0))
+        self.max_attempts = int(os.environ.get('BACKGROUND_JOB_MAX_ATTEMPTS', 3))
+        self.retry_backoff = float(os.environ.get('BACKGROUND_JOB_RETRY_BACKOFF', 10))
+        self.stale_seconds = float(os.environ.get('BACKGROUND_JOB_STALE_SECONDS', 15 * 60))
+        self._handlers: Dict[str, Callable] = {}
+        self._priorities: Dict[str, str] = {}
+        self._threads = []
+        self._threads_pid = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "coalesced": 0}
+
+    ## registry
+    def handler(self, job_type: str, priority: str = 'normal'):
+        """
+        Register `func(job, payload) -> result` as the handler of `job_type`.
+        Its LLM calls run in the given priority class (interactive, normal or batch).
+        """
+        def decorator(func):
+            self._handlers[job_type] = func
+            self._priorities[job_type] = priority
+            return func
+        return decorator
+
+    ## producer side
+    def submit(self, job_type: str, payload: Dict[str, Any], created_by_id: str = None,
+               total: int = 0, max_attempts: int = None, coalesce: bool = False) -> BackgroundJob:
+        """
+        Queue a job. With `coalesce` an identical submission (same type and payload,
+        whoever submits it) that is still queued or running is returned instead of a
+        new job, so a burst of equal requests costs one handler run; later submitters
+        are recorded as subscribers and can poll it too. The check and insert happen
+        under a cross-process lock on the request key.
+        """
+        if job_type not in self._handlers:
+            raise ValueError(f"No handler registered for job type '{job_type}'")
+
+        if not coalesce:
+            return self._enqueue(job_type, payload, created_by_id, total, max_attempts, None)
+
+        dedup_key = SingleFlight.make_key(job_type, json.dumps(payload, sort_keys=True, default=str))
+        with single_flight.process_lock(dedup_key):
+            active = BackgroundJob.query.filter(
+                BackgroundJob.dedup_key == dedup_key,
+                BackgroundJob.status.in_(('queued', 'running'))
+            ).order_by(BackgroundJob.created_at).first()
+            if active is not None:
+                if active.add_subscriber(created_by_id):
+                    db.session.commit()
+                with self._lock:
+                    self._stats["coalesced"] += 1
+                return active
+            return self._enqueue(job_type, payload, created_by_id, total, max_attempts, dedup_key)
+
+    def _enqueue(self, job_type, payload, created_by_id, total, max_attempts, dedup_key) -> BackgroundJob:
+        job = BackgroundJob(
+            job_type=job_type,
+            created_by_id=created_by_id,
+            progress_total=total,
+            max_attempts=max_attempts or self.max_attempts,
+            dedup_key=dedup_key
+        )
+        job.set_payload(payload)
+        db.session.add(job)
+        db.session.commit()
+        with self._lock:
+            self._stats["submitted"] += 1
+
+        app = current_app._get_current_object()
+        mode = app.config.get('BACKGROUND_JOB_MODE', 'thread')
+        if mode == 'eager':
+            self.run_inline(app, job.id)
+            db.session.refresh(job)
+        elif mode == 'thread':
+            self.start_threads(app)
+            self._wakeup.set()
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+    @staticmethod
+    def cancel(job: BackgroundJob) -> BackgroundJob:
+        """Queued jobs are cancelled at once, running ones at their next progress report."""
+        if job.status == 'queued':
+            job.status = 'cancelled'
+            job.finished_at = datetime.utcnow()
+        elif job.status == 'running':
+            job.cancel_requested = True
+        db.session.commit()
+        return job
+
+    ## handler side
+    @staticmethod
+    def check_cancelled(job: BackgroundJob):
+        cancel_requested = db.session.query(BackgroundJob.cancel_requested).filter_by(id=job.id).scalar()
+        if cancel_requested:
+            raise JobCancelled(f"Job {job.id} was cancelled")
+
+    def report_progress(self, job: BackgroundJob, done: int, total: int = None):
+        """Update progress / heartbeat and commit, together with any pending writes of the handler."""
+        job.progress_done = done
+        if total is not None:
+            job.progress_total = total
+        job.heartbeat_at = datetime.utcnow()
+        db.session.commit()
+        self.check_cancelled(job)
+
+    ## worker side
+    def claim(self, worker_id: str, job_id: str = None) -> Optional[str]:
+        """Atomically move one due job from queued to running, returns its id."""
+        now = datetime.utcnow()
+        query = BackgroundJob.query.filter(
+            BackgroundJob.status == 'queued',
+            or_(BackgroundJob.run_after.is_(None), BackgroundJob.run_after <= now)
+        )
+        if job_id is not None:
+            query = query.filter(BackgroundJob.id == job_id)
+
+        for (candidate_id,) in query.order_by(BackgroundJob.created_at).with_entities(BackgroundJob.id).limit(5).all():
+            claimed = BackgroundJob.query.filter_by(id=candidate_id, status='queued').update({
+                'status': 'running',
+                'worker_id': worker_id,
+                'started_at': now,
+                'heartbeat_at': now,
+                'attempts': BackgroundJob.attempts + 1,
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                return candidate_id
+        return None
+
+    def run(self, app, job_id: str):
+        """Run a claimed job and record its outcome (succeeded, failed, cancelled or queued for retry)."""
+        with app.app_context():
+            job = db.session.get(BackgroundJob, job_id)
+            if job is None:
+                print(f"Background job {job_id} no longer exists, skipped")
+                return None
+            try:
+                self.check_cancelled(job)
+                # imported lazily, the llm stack is not needed to run the queue
+                from genai.llm_client import llm_priority
+                with llm_priority(self._priorities.get(job.job_type, 'normal')):
+                    result = self._handlers[job.job_type](job, job.get_payload())
+                job.set_result(result)
+                job.status = 'succeeded'
+                job.error = None
+            except Exception as e:
+                db.session.rollback()
+                job = db.session.get(BackgroundJob, job_id)
+                if job is None:
+                    # deleted while running, nothing left to record the outcome on
+                    print(f"Background job {job_id} was deleted while running: {e}")
+                    return None
+                job.error = str(e)
+                if isinstance(e, JobCancelled):
+                    job.status = 'cancelled'
+                elif self.is_final_failure(job, e):
+                    job.status = 'failed'
+                    print(f"❌ Background job {job_id} ({job.job_type}) failed: {str(e)}")
+                else:
+                    delay = self.retry_backoff * (2 ** (job.attempts - 1))
+                    job.status = 'queued'
+                    job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+                    print(f"Background job {job_id} ({job.job_type}) attempt {job.attempts} failed ({e}), retry in {delay:.0f}s")
+
+            if job.status != 'queued':
+                job.finished_at = datetime.utcnow()
+            db.session.commit()
+            return job.status
+
+    @staticmethod
+    def is_final_failure(job: BackgroundJob, error: Exception) -> bool:
+        """
+        True if the failed attempt is not retried: permanent failures, the last
+        attempt, and LLM deadlines (the llm client already retried up to its deadline,
+        another attempt would only multiply the wait).
+        """
+        from genai.llm_client import LLMDeadlineExceeded
+        return (
+            isinstance(error, (JobFailed, JobCancelled, LLMDeadlineExceeded))
+            or job.attempts >= job.max_attempts
+        )
+
+    def run_inline(self, app, job_id: str):
+        """Eager mode: claim and run one job in the calling thread, retrying without waiting."""
+        worker_id = f"eager:{os.getpid()}"
+        with app.app_context():
+            while self.claim(worker_id, job_id):
+                if self.run(app, job_id) != 'queued':
+                    break
+                BackgroundJob.query.filter_by(id=job_id).update({'run_after': None})
+                db.session.commit()
+
+    def requeue_stale(self) -> int:
+        """Put jobs whose worker stopped heart-beating back in the queue (or fail them when out of attempts)."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        stale = BackgroundJob.query.filter(
+            BackgroundJob.status == 'running',
+            or_(BackgroundJob.heartbeat_at.is_(None), BackgroundJob.heartbeat_at < cutoff)
+        ).all()
+        for job in stale:
+            if job.attempts >= job.max_attempts:
+                job.status = 'failed'
+                job.error = f"worker {job.worker_id} stopped responding"
+                job.finished_at = datetime.utcnow()
+            else:
+                job.status = 'queued'
+        db.session.commit()
+        return len(stale)
+
+    def work(self, app, worker_id: str = None, stop_event: threading.Event = None):
+        """Worker loop: claim and run due jobs until `stop_event` is set."""
+        worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        stop_event = stop_event or threading.Event()
+        last_stale_check = 0.0
+
+        while not stop_event.is_set():
+            job_id = None
+            try:
+                with app.app_context():
+                    if time.monotonic() - last_stale_check > self.stale_seconds / 2:
+                        self.requeue_stale()
+                        last_stale_check = time.monotonic()
+                    job_id = self.claim(worker_id)
+                if job_id is not None:
+                    self.run(app, job_id)
+                    continue
+            except OperationalError as e:
+                # another process holds the sqlite write lock
+                print(f"Background worker {worker_id} could not claim or finish job {job_id}: {e}")
+            except Exception as e:
+                # a worker thread must outlive any single job, the stale check requeues the job
+                print(f"❌ Background worker {worker_id} error on job {job_id}: {e}")
+
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def start(self, app):
+        """Thread mode, first request of a serving process: requeue the jobs of a previous process and start the workers."""
+        if self._threads and self._threads_pid == os.getpid():
+            return
+        try:
+            with app.app_context():
+                requeued = self.requeue_stale()
+            if requeued:
+                print(f"Requeued {requeued} stale background jobs")
+        except OperationalError as e:
+            # tables not created yet / database locked, the workers check again
+            print(f"Stale background jobs not checked: {e}")
+        self.start_threads(app)
+
+    def start_threads(self, app):
+        """Thread mode: start the in-process workers once per process."""
+        # threads do not survive a fork (gunicorn --preload), every process starts its own
+        if self._threads and self._threads_pid == os.getpid():
+            return
+        with self._lock:
+            if self._threads and self._threads_pid == os.getpid():
+                return
+            self._threads = []
+            self._threads_pid = os.getpid()
+            for index in range(self.num_threads):
+                thread = threading.Thread(
+                    target=self.work, args=(app, f"{socket.gethostname()}:{os.getpid()}:thread-{index}"),
+                    name=f'background-job-{index}', daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+
+def worker_process_main(worker_index: int):
+    """Entry point of a `flask run-jobs` worker process."""
+    from app import create_app
+
+    app = create_app()
+    job_runner.work(app, f"{socket.gethostname()}:{os.getpid()}:process-{worker_index}")
+
+
+job_runner = BackgroundJobRunner()
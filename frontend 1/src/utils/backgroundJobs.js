@@ -0,0 +1,29 @@
+// src/utils/backgroundJobs.js
+import axios from 'axios'
+
+const TERMINAL_STATUSES = ['succeeded', 'failed', 'cancelled']
+
+/**
+ * Long AI endpoints answer 202 with a background job id; poll the job until it
+ * finishes and return its result. Any other response is returned as is (its data).
+ */
+export async function waitForJob(response, { headers = {}, interval = 1500, timeout = 10 * 60 * 1000 } = {}) {
+  if (response.status !== 202 || !response.data?.job_id) {
+    return response.data
+  }
+
+  const statusUrl = response.data.status_url || `/api/background-jobs/${response.data.job_id}`
+  const startedAt = Date.now()
+
+  while (Date.now() - startedAt < timeout) {
+    const { data: job } = await axios.get(statusUrl, { headers })
+    if (TERMINAL_STATUSES.includes(job.status)) {
+      if (job.status !== 'succeeded') {
+        throw new Error(job.error || `Background job ${job.status}`)
+      }
+      return job.result
+    }
+    await new Promise(resolve => setTimeout(resolve, interval))
+  }
+  throw new Error('Background job did not finish in time')
+}